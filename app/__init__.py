@@ -9,5 +9,11 @@ def create_app():
     
     # Initialisation des routes
     init_routes(app)
+
+    # Polices, styles et logos PDF chargés une fois par worker
+    from app.services.pdf_assets import pdf_assets
+    from app.services.contract_template import get_contract_template
+    pdf_assets.warm()
+    get_contract_template()
     
     return app
@@ -1,6 +1,8 @@
 from datetime import datetime, timedelta
-from decimal import Decimal
+from decimal import Decimal, ROUND_HALF_EVEN
+from fractions import Fraction
 from app import db
+from app.services.money import Money
 from sqlalchemy.dialects.postgresql import UUID, JSONB
 
 class Loan(db.Model):
@@ -18,6 +20,16 @@ class Loan(db.Model):
     disbursement_date = db.Column(db.Date)
     repayment_frequency = db.Column(db.String(10), default='monthly')  # monthly/weekly
     metadata = db.Column(JSONB)  # {collateral: {}, guarantors: []}
+    schedule_rule = db.Column(JSONB)  # {start, step, amount, count, remainder} en centimes
+    paid_principal = db.Column(db.Numeric(12, 2), default=0)  # Totaux maintenus par LoanLedger
+    paid_interest = db.Column(db.Numeric(12, 2), default=0)
+    paid_penalties = db.Column(db.Numeric(12, 2), default=0)
+    outstanding_balance = db.Column(db.Numeric(12, 2))  # Principal + intérêts restant dus
+    credit_balance = db.Column(db.Numeric(12, 2), default=0)  # Trop-perçu au-delà de tous les dus
+    accrued_penalties = db.Column(db.Numeric(12, 2), default=0)  # Total du registre penalty_entries
+    penalties_accrued_until = db.Column(db.Date)  # Dernier jour couvert par PenaltyAccrualEngine
+    days_past_due = db.Column(db.Integer, default=0)  # Maintenu par AgingService
+    aging_bucket = db.Column(db.String(10), index=True)  # current/1_29/30_89/90_plus, NULL hors portefeuille
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
@@ -33,13 +45,15 @@ class Loan(db.Model):
     @property
     def total_interest(self):
         """Calcule l'intérêt total sur la durée du prêt"""
-        monthly_rate = Decimal(self.interest_rate) / Decimal(100) / Decimal(12)
-        return round(self.amount * monthly_rate * self.duration, 2)
+        # Taux mensuel exact: un demi-centime exact est arrondi au pair, alors que l'ancien
+        # calcul Decimal tranchait selon l'arrondi à 28 chiffres de taux / 100 / 12
+        monthly_rate = Fraction(Decimal(self.interest_rate)) / 1200
+        return Money.from_decimal(self.amount).scale(monthly_rate * self.duration, ROUND_HALF_EVEN).to_decimal()
 
     @property
     def total_amount(self):
         """Montant total à rembourser"""
-        return round(self.amount + self.total_interest, 2)
+        return (Money.from_decimal(self.amount) + Money.from_decimal(self.total_interest)).to_decimal()
 
     def generate_repayment_schedule(self):
         """Génère un échéancier de remboursement"""
@@ -61,9 +75,12 @@ class Loan(db.Model):
         return schedule
 
     def get_current_balance(self):
-        """Calcule le solde restant"""
-        paid = sum(p.amount for p in self.payments if p.status == 'completed')
-        return max(self.total_amount - paid, Decimal('0.00'))
+        """Solde restant, maintenu à chaque paiement"""
+        if self.outstanding_balance is None:
+            # Prêt antérieur au registre, pas encore reconstitué par LoanLedger.backfill
+            paid = sum((Money.from_decimal(payment.amount) for payment in self.payments), Money(0))
+            return max((Money.from_decimal(self.total_amount) - paid).to_decimal(), Decimal('0.00'))
+        return max(self.outstanding_balance, Decimal('0.00'))
 
     def to_dict(self):
         """Représentation JSON du prêt"""
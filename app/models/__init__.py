@@ -7,6 +7,11 @@ from .payment import Payment
 from .audit import AuditLog
 from .notification import Notification
 from .settings import AppSettings
+from .penalty_entry import PenaltyEntry
+from .portfolio_aging import PortfolioAging
+from .installment import Installment
+from .webhook_inbox import WebhookInbox
+from .disbursement import Disbursement
 
 # Initialisation des relations
 def setup_relationships():
@@ -42,5 +47,10 @@ __all__ = [
     'Payment',
     'AuditLog',
     'Notification',
-    'AppSettings'
+    'AppSettings',
+    'PenaltyEntry',
+    'PortfolioAging',
+    'Installment',
+    'WebhookInbox',
+    'Disbursement'
 ]
@@ -0,0 +1,31 @@
+from datetime import datetime
+from sqlalchemy.dialects.postgresql import UUID
+from app import db
+import sqlalchemy as sa
+
+class Disbursement(db.Model):
+    """Demande de décaissement d'un prêt auprès d'un fournisseur mobile money"""
+    __tablename__ = 'disbursements'
+
+    id = db.Column(UUID(as_uuid=True), primary_key=True, server_default=sa.text('gen_random_uuid()'))
+    loan_id = db.Column(UUID(as_uuid=True), db.ForeignKey('kredilakay.loans.id', ondelete='CASCADE'), nullable=False)
+    provider = db.Column(db.String(30), nullable=False)  # NATCOM_PAY, DIGICEL_PAY, UNIBANK
+    amount = db.Column(db.Numeric(12, 2), nullable=False)
+    recipient = db.Column(db.String(20), nullable=False)  # Téléphone du client
+    status = db.Column(db.String(10), nullable=False, default='PENDING')  # PENDING/SENT/CONFIRMED/FAILED/REJECTED
+    provider_reference = db.Column(db.String(100))  # Identifiant retourné par le fournisseur
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    sent_at = db.Column(db.DateTime)
+    confirmed_at = db.Column(db.DateTime)  # Confirmation reçue par webhook
+    applied_at = db.Column(db.DateTime)  # Date de décaissement reportée sur le prêt
+
+    __table_args__ = (
+        db.UniqueConstraint('loan_id', name='unique_loan_disbursement'),
+        db.Index('ix_disbursements_status', 'status'),
+        {'schema': 'kredilakay'}
+    )
+
+    def __repr__(self):
+        return f'<Disbursement {self.amount} HTG for Loan {self.loan_id} via {self.provider} {self.status}>'
@@ -0,0 +1,26 @@
+from datetime import datetime
+from sqlalchemy.dialects.postgresql import UUID
+from app import db
+import sqlalchemy as sa
+
+class Installment(db.Model):
+    __tablename__ = 'installments'
+
+    id = db.Column(UUID(as_uuid=True), primary_key=True, server_default=sa.text('gen_random_uuid()'))
+    loan_id = db.Column(UUID(as_uuid=True), db.ForeignKey('kredilakay.loans.id', ondelete='CASCADE'), nullable=False)
+    number = db.Column(db.Integer, nullable=False)  # Numéro d'échéance (1-based)
+    due_date = db.Column(db.Date, nullable=False)
+    amount = db.Column(db.Numeric(12, 2), nullable=False)
+    paid_amount = db.Column(db.Numeric(12, 2), nullable=False, default=0)
+    status = db.Column(db.String(10), nullable=False, default='PENDING')  # PENDING/PARTIAL/PAID
+    paid_at = db.Column(db.DateTime)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.UniqueConstraint('loan_id', 'number', name='unique_loan_installment'),
+        db.Index('ix_installments_due_date_status', 'due_date', 'status'),
+        {'schema': 'kredilakay'}
+    )
+
+    def __repr__(self):
+        return f'<Installment {self.number} {self.amount} HTG for Loan {self.loan_id} due {self.due_date}>'
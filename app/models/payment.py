@@ -0,0 +1,33 @@
+from datetime import datetime
+from sqlalchemy.dialects.postgresql import UUID, JSONB
+from app import db
+import sqlalchemy as sa
+
+class Payment(db.Model):
+    __tablename__ = 'payments'
+
+    id = db.Column(UUID(as_uuid=True), primary_key=True, server_default=sa.text('gen_random_uuid()'))
+    loan_id = db.Column(UUID(as_uuid=True), db.ForeignKey('kredilakay.loans.id'), nullable=False, index=True)
+    amount = db.Column(db.Numeric(12, 2), nullable=False)
+    payment_method = db.Column(db.String(30), nullable=False)  # CASH/MOBILE_MONEY/BANK_TRANSFER/<PROVIDER>_MOBILE
+    receipt_number = db.Column(db.String(100))
+    payment_date = db.Column(db.DateTime, default=datetime.utcnow)
+    provider = db.Column(db.String(30))  # Fournisseur du webhook (NATCOM_PAY, DIGICEL_PAY, UNIBANK)
+    transaction_id = db.Column(db.String(100))  # Identifiant de transaction du fournisseur
+    details = db.Column('metadata', JSONB)  # {provider, raw_data}
+    penalty_part = db.Column(db.Numeric(12, 2))  # Répartition du paiement (AllocationEngine)
+    interest_part = db.Column(db.Numeric(12, 2))
+    principal_part = db.Column(db.Numeric(12, 2))
+    excess_part = db.Column(db.Numeric(12, 2))  # Trop-perçu porté au crédit du prêt
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        # Clé d'idempotence des webhooks: une notification rejouée n'insère rien
+        db.UniqueConstraint('provider', 'transaction_id', name='unique_provider_transaction'),
+        # Rapprochement des paiements antérieurs aux webhooks par numéro de reçu seul
+        db.Index('ix_payments_legacy_receipt', 'receipt_number', postgresql_where=db.text('provider IS NULL')),
+        {'schema': 'kredilakay'}
+    )
+
+    def __repr__(self):
+        return f'<Payment {self.amount} HTG for Loan {self.loan_id}>'
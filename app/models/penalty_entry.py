@@ -0,0 +1,24 @@
+from datetime import datetime
+from sqlalchemy.dialects.postgresql import UUID
+from app import db
+import sqlalchemy as sa
+
+class PenaltyEntry(db.Model):
+    __tablename__ = 'penalty_entries'
+
+    id = db.Column(UUID(as_uuid=True), primary_key=True, server_default=sa.text('gen_random_uuid()'))
+    loan_id = db.Column(UUID(as_uuid=True), db.ForeignKey('kredilakay.loans.id'), nullable=False)
+    accrual_date = db.Column(db.Date, nullable=False)  # Jour de retard couvert par l'écriture
+    days_late = db.Column(db.Integer, nullable=False)  # Jours de retard après délai de grâce
+    base_amount = db.Column(db.Numeric(12, 2), nullable=False)  # Montant soumis à pénalité
+    rate = db.Column(db.Numeric(5, 4), nullable=False)  # Taux journalier appliqué
+    amount = db.Column(db.Numeric(12, 2), nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.UniqueConstraint('loan_id', 'accrual_date', name='unique_loan_penalty_day'),
+        {'schema': 'kredilakay'}
+    )
+
+    def __repr__(self):
+        return f'<PenaltyEntry {self.amount} HTG for Loan {self.loan_id} on {self.accrual_date}>'
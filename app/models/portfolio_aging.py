@@ -0,0 +1,29 @@
+from datetime import datetime
+from sqlalchemy.dialects.postgresql import UUID
+from app import db
+import sqlalchemy as sa
+
+NO_OFFICER = '00000000-0000-0000-0000-000000000000'  # Segment des prêts sans agent
+
+class PortfolioAging(db.Model):
+    """Agrégats du portefeuille à risque, maintenus par AgingService"""
+    __tablename__ = 'portfolio_aging'
+
+    id = db.Column(db.Integer, primary_key=True)
+    bucket = db.Column(db.String(10), nullable=False)  # current/1_29/30_89/90_plus
+    officer_id = db.Column(UUID(as_uuid=True), db.ForeignKey('kredilakay.users.id'))
+    purpose = db.Column(db.String(100), nullable=False, default='')
+    loan_count = db.Column(db.Integer, nullable=False, default=0)
+    outstanding = db.Column(db.Numeric(14, 2), nullable=False, default=0)  # Encours du segment
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index(
+            'unique_aging_segment', 'bucket', sa.text(f"coalesce(officer_id, '{NO_OFFICER}'::uuid)"), 'purpose',
+            unique=True
+        ),
+        {'schema': 'kredilakay'}
+    )
+
+    def __repr__(self):
+        return f'<PortfolioAging {self.bucket} {self.loan_count} loans, {self.outstanding} HTG>'
@@ -0,0 +1,25 @@
+from datetime import datetime
+from app import db
+
+class WebhookInbox(db.Model):
+    """File durable des notifications de paiement en attente de traitement"""
+    __tablename__ = 'webhook_inbox'
+
+    id = db.Column(db.BigInteger, primary_key=True)
+    provider = db.Column(db.String(30), nullable=False)
+    body = db.Column(db.Text, nullable=False)  # Corps brut, tel que signé par le fournisseur
+    ip_address = db.Column(db.String(45))
+    user_agent = db.Column(db.String(200))
+    received_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    locked_until = db.Column(db.DateTime)  # Bail du worker ayant réclamé la notification
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    processed_at = db.Column(db.DateTime)
+    error = db.Column(db.Text)
+
+    __table_args__ = (
+        db.Index('ix_webhook_inbox_pending', 'id', postgresql_where=db.text('processed_at IS NULL')),
+        {'schema': 'kredilakay'}
+    )
+
+    def __repr__(self):
+        return f'<WebhookInbox {self.id} {self.provider} attempts={self.attempts}>'
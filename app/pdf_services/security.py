@@ -5,9 +5,10 @@ from datetime import datetime
 from xhtml2pdf import pisa
 from PyPDF2 import PdfReader, PdfWriter
 from reportlab.lib.pagesizes import letter
-from reportlab.lib.styles import getSampleStyleSheet
 from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Image
 from app import app
+from app.services.pdf_assets import pdf_assets
+from app.services.pdf_render import get_pdf_renderer
 from .watermark import add_watermark
 from .security import apply_security_features
 
@@ -19,8 +20,10 @@ class PDFGenerationError(Exception):
 class PDFGenerator:
     TEMPLATES_DIR = os.path.join(app.root_path, 'templates/pdf')
     
-    def __init__(self):
-        self.styles = getSampleStyleSheet()
+    def __init__(self, renderer=None):
+        self.styles = pdf_assets.stylesheet()
+        # Service de rendu (pdf_render): la conversion HTML vers PDF quitte le worker web
+        self.renderer = renderer or get_pdf_renderer()
     
     def generate_from_html(self, template_name, context, output_path=None):
         """
@@ -33,23 +36,11 @@ class PDFGenerator:
             bytes ou None si output_path est spécifié
         """
         try:
-            # Rendu du template HTML
+            # Rendu du template HTML (contexte applicatif et objets ORM: dans la requête)
             html_content = self._render_template(template_name, context)
             
-            # Conversion en PDF
-            pdf_buffer = BytesIO()
-            pisa_status = pisa.CreatePDF(
-                html_content,
-                dest=pdf_buffer,
-                encoding='UTF-8',
-                link_callback=self._handle_resources
-            )
-            
-            if pisa_status.err:
-                raise PDFGenerationError("Erreur de conversion HTML vers PDF")
-            
-            # Ajout des fonctionnalités de sécurité
-            secured_pdf = self._apply_security(pdf_buffer, context)
+            # Conversion en PDF sécurisé, dans le pool de rendu
+            secured_pdf = self.renderer.render('html', html_content, context.get('status'))
             
             if output_path:
                 with open(output_path, 'wb') as f:
@@ -61,6 +52,29 @@ class PDFGenerator:
             logger.error(f"Erreur génération PDF: {str(e)}")
             raise
 
+    def convert_html(self, html_content, status=None):
+        """
+        Convertit un HTML déjà rendu en PDF sécurisé (exécutable dans le pool de rendu)
+        Args:
+            html_content: HTML du document
+            status: Statut du document ('approved', 'rejected') pour le filigrane
+        Returns:
+            bytes: PDF sécurisé
+        """
+        pdf_buffer = BytesIO()
+        pisa_status = pisa.CreatePDF(
+            html_content,
+            dest=pdf_buffer,
+            encoding='UTF-8',
+            link_callback=self._handle_resources
+        )
+        
+        if pisa_status.err:
+            raise PDFGenerationError("Erreur de conversion HTML vers PDF")
+        
+        # Ajout des fonctionnalités de sécurité
+        return self._apply_security(pdf_buffer, {'status': status})
+
     def generate_from_reportlab(self, elements, output_path=None):
         """
         Génère un PDF avec ReportLab (pour documents complexes)
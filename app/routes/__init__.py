@@ -5,6 +5,8 @@ from .admin import api as admin_ns
 from .client import api as client_ns
 from .auditor import api as auditor_ns
 from app.services.auth import jwt
+from app.services.json_codec import CodecJSONProvider, output_json
+from app.services.pdf_render import PDFRenderBusy, PDFRenderTimeout
 
 # Configuration de l'API principale
 api_v1 = Blueprint('api_v1', __name__, url_prefix='/api/v1')
@@ -24,6 +26,9 @@ api = Api(
     }
 )
 
+# Sérialisation JSON (orjson si disponible): Decimal, UUID et dates natifs
+api.representation('application/json')(output_json)
+
 # Ajout des namespaces
 api.add_namespace(admin_ns)
 api.add_namespace(client_ns)
@@ -38,8 +43,18 @@ def handle_auth_error(e):
 def handle_expired_token(e):
     return {'message': 'Token expiré'}, 401
 
+# Rendu PDF saturé: le client réessaie plutôt que d'occuper un worker
+@api.errorhandler(PDFRenderBusy)
+def handle_render_busy(e):
+    return {'message': 'Génération de documents saturée, réessayez'}, 503, {'Retry-After': '5'}
+
+@api.errorhandler(PDFRenderTimeout)
+def handle_render_timeout(e):
+    return {'message': str(e)}, 504
+
 def init_app(app):
     """Initialisation des routes"""
+    app.json = CodecJSONProvider(app)
     app.register_blueprint(api_v1)
     
     # Enregistrement des erreurs custom
@@ -1,6 +1,10 @@
-from flask_restx import Namespace, Resource, fields
+from flask_restx import Namespace, Resource, fields, inputs
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from app.services.auth import admin_required
+from app.services.aging import AgingService
+from app.services.simulation import PortfolioSimulator
+from app.services.tasks import get_task_queue
+from config import settings
 
 api = Namespace('admin', description='Opérations administratives pour KrediLakay')
 
@@ -45,6 +49,47 @@ class AdminById(Resource):
             api.abort(404, f"Administrateur {id} introuvable")
         return admin
 
+@api.route('/portfolio/aging')
+class PortfolioAging(Resource):
+    @jwt_required()
+    @admin_required
+    def get(self):
+        """Portefeuille à risque (PAR1/PAR30/PAR90) par tranche, agent et motif"""
+        return AgingService.summary()
+
+simulation_parser = api.parser()
+simulation_parser.add_argument('paths', type=inputs.int_range(100, settings.SIMULATION_MAX_PATHS), default=10000, location='args')
+simulation_parser.add_argument('weeks', type=inputs.int_range(1, 52), default=12, location='args')
+simulation_parser.add_argument('seed', type=int, location='args')
+
+@api.route('/portfolio/simulations')
+class PortfolioSimulations(Resource):
+    @jwt_required()
+    @admin_required
+    @api.expect(simulation_parser)
+    def post(self):
+        """Lance une simulation Monte Carlo du portefeuille en tâche de fond"""
+        queue = get_task_queue()
+        if queue is None:
+            return {'message': 'Tâches de fond désactivées'}, 503
+
+        args = simulation_parser.parse_args()
+        simulator = PortfolioSimulator(paths=args['paths'], horizon_weeks=args['weeks'], seed=args['seed'])
+        job_id = queue.submit('portfolio_simulation', simulator.run)
+        return {'job_id': job_id, 'status': 'PENDING'}, 202
+
+@api.route('/portfolio/simulations/<string:job_id>')
+class PortfolioSimulationResult(Resource):
+    @jwt_required()
+    @admin_required
+    def get(self, job_id):
+        """État et résultat d'une simulation"""
+        queue = get_task_queue()
+        job = queue.status(job_id) if queue else None
+        if not job:
+            api.abort(404, f"Simulation {job_id} introuvable")
+        return job
+
 @api.route('/healthcheck')
 class AdminHealth(Resource):
     @jwt_required()
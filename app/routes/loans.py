@@ -1,8 +1,9 @@
 # KREDILAKAY/app/routes/loans.py
 from flask import request
-from flask_restx import Namespace, Resource, fields
+from flask_restx import Namespace, Resource, fields, inputs
 from datetime import datetime, timedelta
 from decimal import Decimal
+import math
 import uuid
 from app.database import get_db
 from app.models import Loan, Client, Payment
@@ -10,6 +11,11 @@ from app.schemas.loans import LoanSchema, PaymentSchema
 from config import settings
 from .auth import roles_required
 from app.services.penalty import PenaltyCalculator
+from app.services.schedule import ScheduleRule
+from app.services.loan_ledger import LoanLedger
+from app.services.loan_service import ClientNotFound, InvalidCursor, LoanService
+from app.services.aging import AgingService
+from app.services.installments import InstallmentService
 
 api = Namespace('loans', description='Gestion des prêts et échéances')
 
@@ -27,6 +33,26 @@ payment_model = api.model('Payment', {
     'receipt_number': fields.String()
 })
 
+schedule_parser = api.parser()
+schedule_parser.add_argument('from', type=inputs.date, location='args', help='Première date incluse (YYYY-MM-DD)')
+schedule_parser.add_argument('to', type=inputs.date, location='args', help='Dernière date incluse (YYYY-MM-DD)')
+schedule_parser.add_argument('limit', type=inputs.int_range(1, 366), location='args',
+                             help="Nombre maximal d'échéances (par défaut: toute la fenêtre)")
+
+quote_parser = api.parser()
+quote_parser.add_argument('risk_score', type=float, required=True, location='args', help='Score de risque client (0-1)')
+quote_parser.add_argument('amounts', type=str, required=True, location='args', help='Montants séparés par des virgules')
+quote_parser.add_argument('durations', type=str, required=True, location='args', help='Durées en jours séparées par des virgules')
+
+history_parser = api.parser()
+history_parser.add_argument('limit', type=inputs.int_range(1, 100), default=20, location='args')
+history_parser.add_argument('cursor', type=str, location='args', help='Curseur next_cursor de la page précédente')
+
+due_parser = api.parser()
+due_parser.add_argument('from', type=inputs.date, required=True, location='args', help='Première date incluse (YYYY-MM-DD)')
+due_parser.add_argument('to', type=inputs.date, required=True, location='args', help='Dernière date incluse (YYYY-MM-DD)')
+due_parser.add_argument('limit', type=inputs.int_range(1, 5000), default=1000, location='args')
+
 @api.route('/request')
 class LoanRequest(Resource):
     @api.expect(loan_model)
@@ -57,6 +83,7 @@ class LoanRequest(Resource):
                 status='PENDING',
                 request_date=datetime.utcnow()
             )
+            LoanLedger.open(new_loan)
             
             db.add(new_loan)
             db.commit()
@@ -75,39 +102,123 @@ class LoanRequest(Resource):
         risk_adjustment = (Decimal('1') - credit_score) * Decimal('0.1')
         return max(base_rate + risk_adjustment, Decimal('0.05'))  # Minimum 5%
 
+@api.route('/quotes')
+class LoanQuotes(Resource):
+    @api.expect(quote_parser)
+    @roles_required('admin', 'agent')
+    def get(self):
+        """Grille d'offres montants x durées au taux du client"""
+        args = quote_parser.parse_args()
+        try:
+            amounts = [Decimal(a) for a in args['amounts'].split(',') if a.strip()]
+            durations = [int(d) for d in args['durations'].split(',') if d.strip()]
+        except (ArithmeticError, ValueError):
+            return {'message': 'Montants ou durées invalides'}, 400
+
+        max_size = settings.QUOTE_MAX_GRID_SIZE
+        if not amounts or not durations or len(amounts) > max_size or len(durations) > max_size:
+            return {'message': f'Entre 1 et {max_size} montants et durées requis'}, 400
+        if not all(a.is_finite() for a in amounts) or not math.isfinite(args['risk_score']):
+            return {'message': 'Montants et score de risque doivent être des nombres finis'}, 400
+        if min(amounts) <= 0 or min(durations) <= 0:
+            return {'message': 'Montants et durées doivent être positifs'}, 400
+
+        grid = LoanService().quote_grid(amounts, durations, Decimal(str(args['risk_score'])))
+        return grid, 200, {'Cache-Control': f'private, max-age={settings.QUOTE_CACHE_SECONDS}'}
+
+@api.route('/client/<string:client_id>/history')
+class ClientLoanHistory(Resource):
+    @api.expect(history_parser)
+    @roles_required('admin', 'agent', 'auditor')
+    def get(self, client_id):
+        """Historique paginé des prêts d'un client"""
+        args = history_parser.parse_args()
+        try:
+            return LoanService().client_loan_history(client_id, limit=args['limit'], cursor=args['cursor']), 200
+        except ClientNotFound as e:
+            return {'message': str(e)}, 404
+        except InvalidCursor as e:
+            return {'message': str(e)}, 400
+
+@api.route('/installments/due')
+class DueInstallments(Resource):
+    @api.expect(due_parser)
+    @roles_required('admin', 'agent')
+    def get(self):
+        """Échéances non soldées d'une plage de dates (rappels, recouvrement)"""
+        args = due_parser.parse_args()
+        if args['from'] > args['to']:
+            return {'message': 'Plage de dates invalide'}, 400
+
+        installments = InstallmentService.due_between(args['from'], args['to'], limit=args['limit'])
+        return {'installments': installments, 'count': len(installments)}, 200
+
 @api.route('/<string:loan_id>')
 class LoanDetail(Resource):
+    @api.expect(schedule_parser)
     @roles_required('admin', 'client', 'auditor')
     def get(self, loan_id):
         """Obtenir les détails d'un prêt spécifique"""
+        args = schedule_parser.parse_args()
+
         with get_db() as db:
             loan = db.query(Loan).filter_by(id=loan_id).first()
             if not loan:
                 return {'message': 'Prêt non trouvé'}, 404
             
-            payment_schedule = self._generate_payment_schedule(loan)
+            rule = self._schedule_rule(loan)
+            installments = InstallmentService.for_loan(
+                db, loan.id, args['from'], args['to'], args['limit']
+            )
+            if installments:
+                payment_schedule = self._serialize_installments(installments, rule)
+            else:
+                payment_schedule = self._generate_payment_schedule(
+                    rule, args['from'], args['to'], args['limit']
+                )
             
             return {
                 'loan': self._serialize_loan(loan),
+                'schedule': {
+                    'start_date': rule.start.isoformat(),
+                    'end_date': rule.end_date.isoformat(),
+                    'step_days': rule.step,
+                    'installments': rule.count,
+                    'installment_amount': float(rule.amount)
+                },
                 'payment_schedule': payment_schedule,
                 'penalties': self._calculate_penalties(loan)
             }, 200
 
-    def _generate_payment_schedule(self, loan):
-        """Génère le calendrier de remboursement"""
-        schedule = []
-        daily_payment = loan.total_due / loan.duration_days
-        current_date = loan.start_date if loan.start_date else datetime.utcnow().date()
-        
-        for day in range(1, loan.duration_days + 1):
-            due_date = current_date + timedelta(days=day)
-            schedule.append({
-                'day': day,
+    def _schedule_rule(self, loan):
+        """Règle d'échéancier stockée à l'approbation, ou dérivée du prêt"""
+        if loan.schedule_rule:
+            return ScheduleRule.from_dict(loan.schedule_rule)
+        return ScheduleRule.from_loan(loan)
+
+    def _serialize_installments(self, installments, rule):
+        """Échéances persistées, avec montant payé et statut"""
+        return [
+            {
+                'day': installment.number * rule.step,
+                'due_date': installment.due_date.isoformat(),
+                'amount_due': float(installment.amount),
+                'paid_amount': float(installment.paid_amount),
+                'status': installment.status
+            }
+            for installment in installments
+        ]
+
+    def _generate_payment_schedule(self, rule, date_from=None, date_to=None, limit=None):
+        """Déroule uniquement les échéances de la fenêtre demandée"""
+        return [
+            {
+                'day': number * rule.step,
                 'due_date': due_date.isoformat(),
-                'amount_due': float(daily_payment)
-            })
-        
-        return schedule
+                'amount_due': float(amount)
+            }
+            for number, due_date, amount in rule.expand(date_from, date_to, limit)
+        ]
 
     def _calculate_penalties(self, loan):
         """Calcule les pénalités en cas de retard"""
@@ -145,20 +256,23 @@ class LoanPayments(Resource):
             return {'message': 'Données invalides', 'errors': errors}, 400
 
         with get_db() as db:
-            loan = db.query(Loan).filter_by(id=loan_id).first()
+            loan = LoanLedger.lock(db, loan_id)
             if not loan:
                 return {'message': 'Prêt non trouvé'}, 404
                 
             if loan.status != 'APPROVED':
                 return {'message': 'Prêt non approuvé'}, 400
                 
+            amount = Decimal(str(data['amount']))
+            allocation, = LoanLedger.post_payments(db, loan, [amount])
             payment = Payment(
                 id=str(uuid.uuid4()),
                 loan_id=loan.id,
-                amount=Decimal(str(data['amount'])),
+                amount=amount,
                 payment_method=data['payment_method'],
                 receipt_number=data.get('receipt_number'),
-                payment_date=datetime.utcnow()
+                payment_date=datetime.utcnow(),
+                **allocation.as_columns()
             )
             
             db.add(payment)
@@ -168,13 +282,13 @@ class LoanPayments(Resource):
             return {
                 'payment_id': payment.id,
                 'amount': float(payment.amount),
+                'allocation': {k: float(v) for k, v in allocation.as_columns().items()},
                 'remaining_balance': float(self._calculate_remaining_balance(loan))
             }, 201
 
     def _calculate_remaining_balance(self, loan):
-        """Calcule le solde restant après paiement"""
-        total_paid = sum(p.amount for p in loan.payments)
-        return max(loan.total_due - total_paid, Decimal('0'))
+        """Solde restant après paiement, lu depuis les totaux du prêt (repli si non encore calculés)"""
+        return loan.get_current_balance()
 
 @api.route('/<string:loan_id>/status')
 class LoanStatus(Resource):
@@ -188,15 +302,25 @@ class LoanStatus(Resource):
             return {'message': 'Statut invalide'}, 400
             
         with get_db() as db:
-            loan = db.query(Loan).filter_by(id=loan_id).first()
+            loan = LoanLedger.lock(db, loan_id)
             if not loan:
                 return {'message': 'Prêt non trouvé'}, 404
                 
+            previous = AgingService.position(loan)
+            # Échéancier créé à la première approbation seulement (pas de ré-approbation
+            # d'un prêt déjà approuvé, ni après un passage en défaut)
+            first_approval = (
+                data['status'] == 'APPROVED' and loan.status != 'APPROVED' and loan.schedule_rule is None
+            )
             loan.status = data['status']
-            if data['status'] == 'APPROVED':
+            if first_approval:
                 loan.start_date = datetime.utcnow().date()
+                rule = ScheduleRule.from_loan(loan)
+                loan.schedule_rule = rule.to_dict()
+                InstallmentService.create(db, loan, rule)
             elif data['status'] == 'PAID':
                 loan.end_date = datetime.utcnow()
+            AgingService.update(db, loan, previous)
                 
             db.commit()
             
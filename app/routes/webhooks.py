@@ -3,9 +3,17 @@ from flask import request, jsonify
 from flask_restx import Namespace, Resource
 import hmac
 import hashlib
+import uuid
 from datetime import datetime
+from decimal import Decimal
+from sqlalchemy import update
+from sqlalchemy.dialects.postgresql import insert
 from app.database import get_db
-from app.models import Payment, AuditLog
+from app.models import Payment
+from app.services.webhook_queue import enqueue_webhook, normalize_payment_data, post_loan_payments
+from app.services import json_codec
+from app.services.audit_sink import get_audit_sink
+from app.services.disbursement import DisbursementEngine
 from config import settings
 
 api = Namespace('webhooks', description='Endpoints pour les intégrations tierces')
@@ -33,32 +41,65 @@ class PaymentWebhook(Resource):
         if provider not in PROVIDERS:
             return {'message': 'Fournisseur non supporté'}, 400
 
-        # Vérification de la signature
+        # Vérification de la signature sur le corps brut, lu une seule fois
+        body = request.get_data()
         if not self._verify_signature(provider, request):
-            self._log_attempt(provider, 'Signature invalide', request)
+            self._log_attempt(provider, 'Signature invalide', {'body': body[:2000].decode('utf-8', 'replace')})
             return {'message': 'Signature invalide'}, 403
 
-        data = request.get_json()
-        payment_data = self._normalize_payment_data(provider, data)
+        if settings.WEBHOOK_ASYNC:
+            # Mode asynchrone: le corps signé est mis en file, le worker poste les paiements par lot
+            try:
+                enqueue_webhook(
+                    provider,
+                    body.decode('utf-8'),
+                    ip_address=request.remote_addr,
+                    user_agent=request.user_agent.string
+                )
+            except OSError:
+                return {'message': 'Service temporairement indisponible'}, 503
+            return {'message': 'Notification acceptée'}, 202
+
+        try:
+            data = json_codec.loads(body)
+            payment_data = normalize_payment_data(provider, data)
+        except (ValueError, KeyError, TypeError, AttributeError) as e:
+            self._log_attempt(provider, f"Notification invalide: {e}", {'body': body[:2000].decode('utf-8', 'replace')})
+            return {'message': 'Données invalides'}, 400
 
         with get_db() as db:
             try:
-                payment = Payment(
-                    id=str(uuid.uuid4()),
-                    loan_id=payment_data['loan_id'],
-                    amount=Decimal(str(payment_data['amount'])),
-                    payment_method=f"{provider}_MOBILE",
-                    receipt_number=payment_data['transaction_id'],
-                    payment_date=datetime.utcnow(),
-                    metadata={
-                        'provider': provider,
-                        'raw_data': data
-                    }
-                )
-                db.add(payment)
+                amount = Decimal(str(payment_data['amount']))
+                # Insertion idempotente: une notification rejouée ne renvoie aucune ligne
+                payment_id = db.execute(
+                    insert(Payment)
+                    .values(
+                        id=str(uuid.uuid4()),
+                        loan_id=payment_data['loan_id'],
+                        amount=amount,
+                        payment_method=f"{provider}_MOBILE",
+                        receipt_number=payment_data['transaction_id'],
+                        payment_date=datetime.utcnow(),
+                        provider=provider,
+                        transaction_id=str(payment_data['transaction_id']),
+                        details={
+                            'provider': provider,
+                            'raw_data': data
+                        }
+                    )
+                    .on_conflict_do_nothing(constraint='unique_provider_transaction')
+                    .returning(Payment.id)
+                ).scalar()
+
+                if payment_id is None:
+                    db.rollback()
+                    return {'message': 'Paiement déjà enregistré'}, 200
                 
-                # Mise à jour du statut du prêt si complètement payé
-                self._update_loan_status(db, payment.loan_id)
+                # Imputation (pénalités, intérêts, principal), statut du prêt si complètement payé
+                for allocation in post_loan_payments(db, payment_data['loan_id'], [amount]):
+                    db.execute(
+                        update(Payment).where(Payment.id == payment_id).values(**allocation.as_columns())
+                    )
                 
                 db.commit()
                 
@@ -87,63 +128,53 @@ class PaymentWebhook(Resource):
         
         return hmac.compare_digest(received_sign, expected_sign)
 
-    def _normalize_payment_data(self, provider, data):
-        """Normalise les données de paiement selon le fournisseur"""
-        # Adapté aux formats spécifiques des providers haïtiens
-        if provider == 'NATCOM_PAY':
-            return {
-                'transaction_id': data['transactionId'],
-                'amount': data['amount']['value'],
-                'loan_id': data['reference'].split('_')[-1],
-                'currency': data['amount']['currency']
-            }
-        elif provider == 'DIGICEL_PAY':
-            return {
-                'transaction_id': data['txn_id'],
-                'amount': data['amount'],
-                'loan_id': data['client_ref'],
-                'currency': 'HTG'
-            }
-        else:  # UNIBANK
-            return {
-                'transaction_id': data['payment']['id'],
-                'amount': data['payment']['amount'],
-                'loan_id': data['payment']['reference'],
-                'currency': data['payment']['currency']
-            }
-
-    def _update_loan_status(self, db, loan_id):
-        """Met à jour le statut du prêt si totalement payé"""
-        loan = db.query(Loan).filter_by(id=loan_id).first()
-        if not loan:
-            return
-            
-        total_paid = sum(p.amount for p in loan.payments)
-        if total_paid >= loan.total_due:
-            loan.status = 'PAID'
-            loan.end_date = datetime.utcnow()
-
     def _log_attempt(self, provider, status, data):
-        """Journalise les tentatives de webhook"""
-        with get_db() as db:
-            log = AuditLog(
-                id=str(uuid.uuid4()),
-                event_type='WEBHOOK',
-                provider=provider,
-                status=status,
-                ip_address=request.remote_addr,
-                user_agent=request.user_agent.string,
-                metadata={
-                    'data': data,
-                    'headers': dict(request.headers)
-                }
-            )
-            db.add(log)
-            db.commit()
+        """Journalise les tentatives de webhook (écriture différée, par lot)"""
+        get_audit_sink().record(
+            event_type='WEBHOOK',
+            provider=provider,
+            status=status,
+            ip_address=request.remote_addr,
+            user_agent=request.user_agent.string,
+            metadata={
+                'data': data,
+                'headers': dict(request.headers)
+            }
+        )
 
 @api.route('/disbursement/<string:provider>')
-class DisbursementWebhook(Resource):
+class DisbursementWebhook(PaymentWebhook):
     def post(self, provider):
         """Webhook pour les confirmations de décaissement"""
-        # Implémentation similaire avec validation spécifique
-        pass
+        if provider not in PROVIDERS:
+            return {'message': 'Fournisseur non supporté'}, 400
+
+        body = request.get_data()
+        if not self._verify_signature(provider, request):
+            self._log_attempt(provider, 'Signature invalide', {'body': body[:2000].decode('utf-8', 'replace')})
+            return {'message': 'Signature invalide'}, 403
+
+        # Décodé avant la transaction: `data` est toujours défini pour la journalisation
+        try:
+            data = json_codec.loads(body)
+        except ValueError as e:
+            self._log_attempt(provider, f"Confirmation invalide: {e}", {'body': body[:2000].decode('utf-8', 'replace')})
+            return {'message': 'Données invalides'}, 400
+
+        with get_db() as db:
+            try:
+                # La date de décaissement est reportée sur les prêts par lot (DisbursementEngine.apply_confirmations)
+                recorded = DisbursementEngine.confirm(db, provider, data)
+                db.commit()
+            except (KeyError, TypeError, ValueError) as e:
+                db.rollback()
+                self._log_attempt(provider, f"Confirmation invalide: {e}", {'body': body[:2000].decode('utf-8', 'replace')})
+                return {'message': 'Données invalides'}, 400
+            except Exception as e:
+                db.rollback()
+                self._log_attempt(provider, str(e), data)
+                return {'message': 'Erreur de traitement'}, 500
+
+        status = 'Décaissement enregistré' if recorded else 'Décaissement inconnu ou déjà confirmé'
+        self._log_attempt(provider, status, data)
+        return {'message': status}, 200
@@ -0,0 +1,252 @@
+# KREDILAKAY/app/services/aging.py
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Dict, NamedTuple, Optional
+from sqlalchemy import bindparam, delete, func, literal, literal_column, select, text, update
+from sqlalchemy.dialects.postgresql import insert
+from app.database import get_db
+from app.models import Loan, PortfolioAging
+from app.models.portfolio_aging import NO_OFFICER
+from app.services.money import Money
+from app.services.schedule import ScheduleRule
+import logging
+
+# Tranches d'ancienneté, de la plus ancienne à la plus récente (borne inférieure en jours)
+AGING_BUCKETS = (('90_plus', 90), ('30_89', 30), ('1_29', 1), ('current', 0))
+PAR_THRESHOLDS = {'par1': 1, 'par30': 30, 'par90': 90}
+PORTFOLIO_STATUSES = ('APPROVED', 'DEFAULTED')
+
+
+def bucket_for(days_past_due: int) -> str:
+    """Tranche d'ancienneté correspondant au nombre de jours de retard"""
+    for bucket, lower in AGING_BUCKETS:
+        if days_past_due >= lower:
+            return bucket
+    return 'current'
+
+
+class AgingPosition(NamedTuple):
+    """Segment d'agrégat auquel un prêt contribue (bucket None: hors portefeuille)"""
+    bucket: Optional[str]
+    officer_id: Optional[str]
+    purpose: str
+    outstanding: Money
+
+
+class AgingService:
+    """
+    Portefeuille à risque (PAR1/PAR30/PAR90): chaque prêt porte ses jours de retard
+    et sa tranche, et la table portfolio_aging garde les agrégats par
+    tranche / agent / motif. Les paiements appliquent un delta à l'agrégat,
+    le recalcul quotidien fait vieillir les prêts et reconstruit les agrégats.
+    La lecture du tableau de bord ne dépend pas du nombre de prêts.
+    """
+
+    @staticmethod
+    def position(loan) -> AgingPosition:
+        """Segment actuellement enregistré pour le prêt"""
+        return AgingPosition(
+            bucket=loan.aging_bucket,
+            officer_id=loan.officer_id,
+            purpose=loan.purpose or '',
+            outstanding=Money.from_decimal(loan.outstanding_balance or 0)
+        )
+
+    @staticmethod
+    def days_past_due(loan, as_of: Optional[date] = None) -> int:
+        """Jours écoulés depuis la plus ancienne échéance impayée, en O(1)"""
+        if not loan.start_date or loan.status not in PORTFOLIO_STATUSES:
+            return 0
+        as_of = as_of or datetime.utcnow().date()
+
+        rule = ScheduleRule.from_dict(loan.schedule_rule) if loan.schedule_rule else ScheduleRule.from_loan(loan)
+        outstanding = rule.total if loan.outstanding_balance is None else Money.from_decimal(loan.outstanding_balance)
+        covered = rule.installments_covered(rule.total - outstanding)
+        if covered >= rule.count:
+            return 0
+        return max((as_of - rule.due_date(covered + 1)).days, 0)
+
+    @classmethod
+    def update(cls, db, loan: Loan, previous: AgingPosition, as_of: Optional[date] = None) -> Loan:
+        """
+        Met à jour le retard du prêt et reporte la différence sur les agrégats,
+        dans la transaction courante
+        Args:
+            db: Session SQLAlchemy
+            loan: Prêt modifié (paiement, changement de statut)
+            previous: Position relevée avant la modification
+            as_of: Date de calcul (par défaut aujourd'hui)
+        """
+        in_portfolio = loan.status in PORTFOLIO_STATUSES and (loan.outstanding_balance or 0) > 0
+        loan.days_past_due = cls.days_past_due(loan, as_of) if in_portfolio else 0
+        loan.aging_bucket = bucket_for(loan.days_past_due) if in_portfolio else None
+
+        current = cls.position(loan)
+        if current == previous:
+            return loan
+
+        if previous.bucket and current.bucket and previous[:3] == current[:3]:
+            cls._add(db, current, 0, current.outstanding - previous.outstanding)
+        else:
+            if previous.bucket:
+                cls._add(db, previous, -1, -previous.outstanding)
+            if current.bucket:
+                cls._add(db, current, 1, current.outstanding)
+        return loan
+
+    @staticmethod
+    def _add(db, segment: AgingPosition, loans: int, outstanding: Money):
+        """Ajoute un delta au segment (insert ... on conflict do update)"""
+        stmt = insert(PortfolioAging).values(
+            bucket=segment.bucket,
+            officer_id=segment.officer_id,
+            purpose=segment.purpose,
+            loan_count=loans,
+            outstanding=outstanding.to_decimal()
+        )
+        db.execute(stmt.on_conflict_do_update(
+            index_elements=[
+                PortfolioAging.bucket,
+                func.coalesce(PortfolioAging.officer_id, literal_column(f"'{NO_OFFICER}'::uuid")),
+                PortfolioAging.purpose
+            ],
+            set_={
+                'loan_count': PortfolioAging.loan_count + stmt.excluded.loan_count,
+                'outstanding': PortfolioAging.outstanding + stmt.excluded.outstanding,
+                'updated_at': datetime.utcnow()
+            }
+        ))
+
+    @classmethod
+    def refresh(cls, as_of: Optional[date] = None, batch_size: int = 1000) -> Dict:
+        """
+        Recalcul quotidien: fait vieillir les prêts puis reconstruit les agrégats
+        Args:
+            as_of: Date de calcul (par défaut aujourd'hui)
+            batch_size: Nombre de prêts mis à jour par transaction
+        Returns:
+            Dict: Nombre de prêts examinés et de prêts ayant changé de retard
+        """
+        from app.services.loan_ledger import LoanLedger  # loan_ledger importe AgingService
+
+        as_of = as_of or datetime.utcnow().date()
+        scanned, changed = 0, 0
+        loans = Loan.__table__
+        # Les prêts antérieurs au registre (solde NULL) sortiraient sinon du portefeuille
+        LoanLedger.rebuild(missing_only=True)
+        # Écriture conditionnée aux valeurs lues: un paiement ou un changement de statut
+        # concurrent a déjà recalculé le retard du prêt (AgingService.update)
+        write = update(loans).where(
+            loans.c.id == bindparam('loan_id'),
+            loans.c.status == bindparam('read_status'),
+            loans.c.outstanding_balance.is_not_distinct_from(bindparam('read_balance'))
+        ).values(
+            days_past_due=bindparam('new_days'),
+            aging_bucket=bindparam('new_bucket')
+        )
+
+        with get_db() as db:
+            rows = db.execute(
+                select(
+                    Loan.id, Loan.status, Loan.start_date, Loan.duration_days, Loan.total_due,
+                    Loan.repayment_frequency, Loan.schedule_rule, Loan.outstanding_balance,
+                    Loan.days_past_due, Loan.aging_bucket
+                ).where(
+                    Loan.status.in_(PORTFOLIO_STATUSES) | Loan.aging_bucket.isnot(None)
+                ).execution_options(yield_per=batch_size)
+            )
+
+            for batch in rows.partitions():
+                mappings = []
+                for row in batch:
+                    in_portfolio = row.status in PORTFOLIO_STATUSES and (row.outstanding_balance or 0) > 0
+                    days = cls.days_past_due(row, as_of) if in_portfolio else 0
+                    bucket = bucket_for(days) if in_portfolio else None
+                    if (days, bucket) != (row.days_past_due, row.aging_bucket):
+                        mappings.append({
+                            'loan_id': row.id,
+                            'read_status': row.status,
+                            'read_balance': row.outstanding_balance,
+                            'new_days': days,
+                            'new_bucket': bucket
+                        })
+                scanned += len(batch)
+                if mappings:
+                    with get_db() as writer:
+                        changed += writer.execute(write, mappings).rowcount
+                        writer.commit()
+
+            cls._rebuild_aggregates(db)
+            db.commit()
+
+        logging.info(f"Vieillissement du portefeuille au {as_of}: {changed}/{scanned} prêts modifiés")
+        return {'as_of': as_of.isoformat(), 'loans': scanned, 'changed': changed}
+
+    @staticmethod
+    def _rebuild_aggregates(db):
+        """
+        Reconstruit portfolio_aging depuis les prêts. Le verrou de table met en attente
+        les deltas des paiements concurrents jusqu'au commit, qui s'appliquent
+        ensuite sur les agrégats reconstruits.
+        """
+        db.execute(text('LOCK TABLE kredilakay.portfolio_aging IN EXCLUSIVE MODE'))
+        db.execute(delete(PortfolioAging))
+        purpose = func.coalesce(Loan.purpose, literal(''))
+        db.execute(
+            insert(PortfolioAging).from_select(
+                ['bucket', 'officer_id', 'purpose', 'loan_count', 'outstanding'],
+                select(
+                    Loan.aging_bucket,
+                    Loan.officer_id,
+                    purpose,
+                    func.count(),
+                    func.sum(Loan.outstanding_balance)
+                ).where(
+                    Loan.aging_bucket.isnot(None)
+                ).group_by(Loan.aging_bucket, Loan.officer_id, purpose)
+            )
+        )
+
+    @staticmethod
+    def summary() -> Dict:
+        """
+        Tableau de bord PAR lu depuis les agrégats
+        Returns:
+            Dict: Encours et nombre de prêts par tranche, agent et motif, ratios PAR
+        """
+        with get_db() as db:
+            segments = db.query(PortfolioAging).filter(PortfolioAging.loan_count > 0).all()
+
+        lower_bounds = dict(AGING_BUCKETS)
+        by_bucket = {bucket: {'loans': 0, 'outstanding': Decimal('0')} for bucket, _ in reversed(AGING_BUCKETS)}
+        by_officer, by_purpose = {}, {}
+
+        for segment in segments:
+            for groups, key in (
+                (by_bucket, segment.bucket),
+                (by_officer.setdefault(str(segment.officer_id) if segment.officer_id else 'unassigned', {}), segment.bucket),
+                (by_purpose.setdefault(segment.purpose or 'UNSPECIFIED', {}), segment.bucket)
+            ):
+                totals = groups.setdefault(key, {'loans': 0, 'outstanding': Decimal('0')})
+                totals['loans'] += segment.loan_count
+                totals['outstanding'] += segment.outstanding
+
+        total_outstanding = sum(b['outstanding'] for b in by_bucket.values())
+        par = {
+            name: float(sum(
+                totals['outstanding'] for bucket, totals in by_bucket.items() if lower_bounds[bucket] >= threshold
+            ) / total_outstanding) if total_outstanding else 0.0
+            for name, threshold in PAR_THRESHOLDS.items()
+        }
+
+        def serialize(groups):
+            return {bucket: {'loans': t['loans'], 'outstanding': float(t['outstanding'])} for bucket, t in groups.items()}
+
+        return {
+            'total_loans': sum(b['loans'] for b in by_bucket.values()),
+            'total_outstanding': float(total_outstanding),
+            'par': par,
+            'by_bucket': serialize(by_bucket),
+            'by_officer': {officer: serialize(groups) for officer, groups in by_officer.items()},
+            'by_purpose': {purpose: serialize(groups) for purpose, groups in by_purpose.items()}
+        }
@@ -0,0 +1,86 @@
+# KREDILAKAY/app/services/allocation.py
+from decimal import Decimal
+from typing import Dict, NamedTuple, Optional, Sequence, Tuple
+from app.services.money import Money
+from config import settings
+
+ALLOCATION_BUCKETS = ('penalties', 'interest', 'principal')
+PAID_FIELDS = {'penalties': 'paid_penalties', 'interest': 'paid_interest', 'principal': 'paid_principal'}
+
+
+def allocation_order(value: Optional[str] = None) -> Tuple[str, ...]:
+    """Ordre de la cascade, ex. 'penalties,interest,principal'"""
+    order = tuple(part.strip() for part in (value or settings.PAYMENT_ALLOCATION_ORDER).split(','))
+    if sorted(order) != sorted(ALLOCATION_BUCKETS):
+        raise ValueError(f"Ordre d'imputation invalide: {value}")
+    return order
+
+
+class Allocation(NamedTuple):
+    """Répartition d'un paiement, en centimes"""
+    penalties: Money
+    interest: Money
+    principal: Money
+    excess: Money
+
+    def as_columns(self) -> Dict[str, Decimal]:
+        """Colonnes de répartition du paiement (Payment.*_part)"""
+        return {
+            'penalty_part': self.penalties.to_decimal(),
+            'interest_part': self.interest.to_decimal(),
+            'principal_part': self.principal.to_decimal(),
+            'excess_part': self.excess.to_decimal()
+        }
+
+
+class AllocationEngine:
+    """
+    Imputation des paiements en cascade (pénalités, intérêts, principal dans l'ordre
+    configuré). L'état d'imputation est celui des totaux du prêt (paid_*), un paiement
+    s'impute donc en O(1) sans relire l'historique; l'excédent va au crédit du prêt.
+    """
+
+    def __init__(self, order: Optional[str] = None):
+        self.order = allocation_order(order)
+
+    @staticmethod
+    def dues(loan) -> Dict[str, Money]:
+        """Restant dû par poste, d'après les totaux du prêt"""
+        principal = Money.from_decimal(loan.amount)
+        owed = {
+            'penalties': Money.from_decimal(loan.accrued_penalties or 0),
+            'interest': Money.from_decimal(loan.total_due) - principal,
+            'principal': principal
+        }
+        return {
+            bucket: max(owed[bucket] - Money.from_decimal(getattr(loan, PAID_FIELDS[bucket]) or 0), Money(0))
+            for bucket in ALLOCATION_BUCKETS
+        }
+
+    def allocate(self, loan, amount: Money) -> Allocation:
+        """Répartit un montant sans modifier le prêt"""
+        dues = self.dues(loan)
+        parts, left = {}, amount
+        for bucket in self.order:
+            parts[bucket] = min(left, dues[bucket])
+            left -= parts[bucket]
+        return Allocation(excess=left, **parts)
+
+    def apply(self, loan, amount: Money) -> Allocation:
+        """Répartit un montant et met à jour les totaux du prêt"""
+        allocation = self.allocate(loan, amount)
+        for bucket in ALLOCATION_BUCKETS:
+            field = PAID_FIELDS[bucket]
+            paid = Money.from_decimal(getattr(loan, field) or 0) + getattr(allocation, bucket)
+            setattr(loan, field, paid.to_decimal())
+        loan.credit_balance = (Money.from_decimal(loan.credit_balance or 0) + allocation.excess).to_decimal()
+        loan.outstanding_balance = (
+            Money.from_decimal(loan.total_due)
+            - Money.from_decimal(loan.paid_principal)
+            - Money.from_decimal(loan.paid_interest)
+        ).to_decimal()
+        return allocation
+
+    def apply_many(self, loan, amounts: Sequence[Money]) -> Tuple[Allocation, ...]:
+        """Impute plusieurs paiements d'un même prêt, dans l'ordre donné"""
+        return tuple(self.apply(loan, amount) for amount in amounts)
@@ -0,0 +1,184 @@
+# KREDILAKAY/app/services/audit_sink.py
+import atexit
+import glob
+import json
+import os
+import threading
+import uuid
+from datetime import datetime
+from typing import Dict, List, Optional
+from sqlalchemy import insert
+from app.database import get_db
+from app.models import AuditLog
+from config import settings
+import logging
+
+
+class AuditSink:
+    """
+    Journal d'audit en écriture différée: les entrées sont mises en mémoire et
+    écrites par INSERT multi-lignes quand le lot est plein ou que l'intervalle
+    est écoulé, ainsi qu'à l'arrêt du processus. Si la base est indisponible,
+    le lot est ajouté à un fichier spool local, repris au flush suivant par le
+    premier processus qui le réclame (renommage atomique). Au démarrage, les
+    spools réclamés par un processus mort avant de les rejouer sont repris.
+    """
+
+    def __init__(self, max_batch: int = 200, flush_interval: float = 2.0, spool_dir: Optional[str] = None):
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self.spool_path = os.path.join(spool_dir or settings.AUDIT_SPOOL_DIR, 'audit.jsonl')
+        self._buffer: List[Dict] = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = False
+        self._orphans = self._adopt_orphans()
+        self._thread = threading.Thread(target=self._loop, name='kredilakay-audit', daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def record(self, event_type: str, provider: str = None, status: str = None,
+               ip_address: str = None, user_agent: str = None, metadata: Dict = None):
+        """Ajoute une entrée au tampon (aucun accès base dans la requête)"""
+        entry = {
+            'id': str(uuid.uuid4()),
+            'event_type': event_type,
+            'provider': provider,
+            'status': (status or '')[:100],
+            'ip_address': ip_address,
+            'user_agent': (user_agent or '')[:200],
+            'created_at': datetime.utcnow(),
+            'metadata': metadata
+        }
+        with self._lock:
+            self._buffer.append(entry)
+            full = len(self._buffer) >= self.max_batch
+        if full:
+            self._wakeup.set()
+
+    def flush(self) -> int:
+        """
+        Écrit le tampon (et le spool éventuel) en une transaction
+        Returns:
+            int: Nombre d'entrées écrites en base
+        """
+        with self._flush_lock:
+            with self._lock:
+                batch, self._buffer = self._buffer, []
+            claimed = self._orphans + [path for path in [self._claim_spool()] if path]
+            self._orphans = []
+            pending = [entry for path in claimed for entry in self._read(path)] + batch
+            if not pending:
+                return 0
+
+            try:
+                with get_db() as db:
+                    for i in range(0, len(pending), self.max_batch):
+                        db.execute(insert(AuditLog.__table__).values(pending[i:i + self.max_batch]))
+                    db.commit()
+            except Exception:
+                logging.exception(f"Base indisponible, {len(pending)} entrées d'audit mises en spool")
+                self._append_spool(pending)
+                for path in claimed:
+                    os.remove(path)
+                return 0
+
+            for path in claimed:
+                os.remove(path)
+            return len(pending)
+
+    def close(self):
+        """Arrête le thread d'écriture et vide le tampon"""
+        if self._stopped:
+            return
+        self._stopped = True
+        self._wakeup.set()
+        self._thread.join(timeout=self.flush_interval + 5)
+        self.flush()
+
+    def _loop(self):
+        while not self._stopped:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception:
+                logging.exception("Échec du flush du journal d'audit")
+
+    def _claim_spool(self) -> Optional[str]:
+        """Réserve le spool pour ce processus; None s'il est vide ou déjà réclamé"""
+        claimed = f"{self.spool_path}.{os.getpid()}.claimed"
+        try:
+            os.replace(self.spool_path, claimed)
+        except FileNotFoundError:
+            return None
+        return claimed
+
+    def _adopt_orphans(self) -> List[str]:
+        """
+        Réserve les spools réclamés par un processus qui n'existe plus (arrêt brutal
+        entre la réclamation et l'écriture en base). Un spool au PID de ce processus
+        date d'une exécution précédente: il est repris lui aussi.
+        """
+        adopted = []
+        prefix = f"{self.spool_path}."
+        for path in glob.glob(f"{glob.escape(self.spool_path)}.*.claimed"):
+            owner = path[len(prefix):].split('.', 1)[0]
+            if not owner.isdigit() or (int(owner) != os.getpid() and self._alive(int(owner))):
+                continue
+            target = f"{self.spool_path}.{os.getpid()}.{uuid.uuid4().hex}.claimed"
+            try:
+                os.replace(path, target)
+            except FileNotFoundError:
+                continue  # Repris par un autre processus
+            logging.warning(f"Spool d'audit du processus {owner} repris: {path}")
+            adopted.append(target)
+        return adopted
+
+    @staticmethod
+    def _alive(pid: int) -> bool:
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            return True  # Processus d'un autre utilisateur
+        return True
+
+    @staticmethod
+    def _read(path: str) -> List[Dict]:
+        entries = []
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    entry['created_at'] = datetime.fromisoformat(entry['created_at'])
+                    entries.append(entry)
+        return entries
+
+    def _append_spool(self, entries: List[Dict]):
+        """Ajoute les entrées non persistées au spool, en une écriture synchronisée"""
+        os.makedirs(os.path.dirname(self.spool_path), exist_ok=True)
+        lines = ''.join(json.dumps(entry, default=str) + '\n' for entry in entries)
+        with open(self.spool_path, 'a', encoding='utf-8') as f:
+            f.write(lines)
+            f.flush()
+            os.fsync(f.fileno())
+
+
+_sink = None
+_sink_lock = threading.Lock()
+
+
+def get_audit_sink() -> AuditSink:
+    """Journal d'audit du processus, créé au premier usage (après le fork des workers)"""
+    global _sink
+    if _sink is None:
+        with _sink_lock:
+            if _sink is None:
+                _sink = AuditSink(
+                    max_batch=settings.AUDIT_BATCH_SIZE,
+                    flush_interval=settings.AUDIT_FLUSH_SECONDS
+                )
+    return _sink
@@ -0,0 +1,271 @@
+# KREDILAKAY/app/services/contract_batch.py
+import os
+import time
+import uuid
+import zipfile
+from collections import deque
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+from sqlalchemy import select
+from app.database import get_db
+from app.models import Client, Document, Loan
+from app.models.client_photos import ClientPhoto
+from app.services.pdf_render import PDFRenderService
+from config import settings
+import logging
+
+
+class Checkpoint:
+    """
+    Prêts dont le contrat est déjà écrit durablement, un identifiant par ligne.
+    Le fichier n'est complété qu'après validation par le support de sortie:
+    une reprise régénère au plus les contrats d'une archive interrompue.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def load(self) -> Set[str]:
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                return {line.strip() for line in f if line.strip()}
+        except FileNotFoundError:
+            return set()
+
+    def record(self, loan_ids: List[str]):
+        if not loan_ids:
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(''.join(f"{loan_id}\n" for loan_id in loan_ids))
+            f.flush()
+            os.fsync(f.fileno())
+
+    def clear(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class ZipPackSink:
+    """
+    Contrats écrits au fil de l'eau dans des archives ZIP de `per_archive`
+    documents (paquets à imprimer). Chaque archive est écrite sous un nom
+    temporaire et renommée une fois fermée: seules ses entrées sont alors validées.
+    """
+
+    def __init__(self, path: str, per_archive: int = 500):
+        base, ext = os.path.splitext(path)
+        self.pattern = f"{base}-{{:03d}}{ext or '.zip'}"
+        self.per_archive = per_archive
+        self.index = 1
+        while os.path.exists(self.pattern.format(self.index)):
+            self.index += 1  # Reprise: les archives complètes sont conservées
+        self.archives: List[str] = []
+        self._zip: Optional[zipfile.ZipFile] = None
+        self._entries: List[str] = []
+
+    def write(self, loan_id: str, client_id: str, pdf: bytes) -> List[str]:
+        """Ajoute un contrat; retourne les prêts validés (archive fermée), sinon []"""
+        if self._zip is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.pattern)), exist_ok=True)
+            # Les PDF sont déjà compressés: stockage sans recompression
+            self._zip = zipfile.ZipFile(self._partial, 'w', compression=zipfile.ZIP_STORED)
+        with self._zip.open(f"contrat_{loan_id}.pdf", 'w') as entry:
+            entry.write(pdf)
+        self._entries.append(loan_id)
+        if len(self._entries) >= self.per_archive:
+            return self.flush()
+        return []
+
+    @property
+    def _partial(self) -> str:
+        return self.pattern.format(self.index) + '.partial'
+
+    def flush(self) -> List[str]:
+        """Ferme l'archive en cours et la publie"""
+        if self._zip is None:
+            return []
+        self._zip.close()
+        final = self.pattern.format(self.index)
+        os.replace(self._partial, final)
+        self.archives.append(final)
+        committed, self._zip, self._entries = self._entries, None, []
+        self.index += 1
+        return committed
+
+
+class StorageSink:
+    """Contrats chiffrés dans le stockage documentaire (PDFStorage) et référencés en base par lots"""
+
+    def __init__(self, batch_size: int = 100):
+        from app.pdf_services.storage import PDFStorage
+
+        self.storage = PDFStorage()
+        self.batch_size = batch_size
+        self._documents: List[Dict] = []
+
+    def write(self, loan_id: str, client_id: str, pdf: bytes) -> List[str]:
+        meta = self.storage.save_contract(pdf, loan_id)  # Nom de fichier par prêt, comme routes/documents.py
+        self._documents.append({
+            'id': str(uuid.uuid4()),
+            'loan_id': loan_id,
+            'document_type': 'CONTRACT',
+            'content': meta['filepath'],
+            'is_signed': False
+        })
+        if len(self._documents) >= self.batch_size:
+            return self.flush()
+        return []
+
+    def flush(self) -> List[str]:
+        if not self._documents:
+            return []
+        with get_db() as db:
+            db.bulk_insert_mappings(Document, self._documents)
+            db.commit()
+        committed = [document['loan_id'] for document in self._documents]
+        self._documents = []
+        return committed
+
+
+class ContractBatch:
+    """
+    Génération des contrats d'une cohorte de prêts: données chargées par lots,
+    rendu en parallèle par le pool de pdf_render, résultats écrits dans l'ordre
+    au fur et à mesure. Au plus `window` contrats sont en mémoire à la fois.
+    """
+
+    def __init__(self, sink, checkpoint: Checkpoint, workers: Optional[int] = None,
+                 window: Optional[int] = None, chunk_size: int = 200):
+        self.sink = sink
+        self.checkpoint = checkpoint
+        self.workers = workers if workers is not None else os.cpu_count() or 1
+        self.window = window or max(self.workers, 1) * 2
+        self.chunk_size = chunk_size
+
+    @staticmethod
+    def cohort(approved_on: Optional[date] = None, loan_ids: Optional[Iterable[str]] = None) -> List[str]:
+        """Prêts approuvés à la date donnée (ou listés), dans un ordre stable pour la reprise"""
+        query = select(Loan.id).where(Loan.status == 'APPROVED').order_by(Loan.id)
+        if loan_ids is not None:
+            query = query.where(Loan.id.in_(list(loan_ids)))
+        else:
+            query = query.where(Loan.start_date == (approved_on or datetime.utcnow().date()))
+        with get_db() as db:
+            return [str(loan_id) for loan_id in db.execute(query).scalars()]
+
+    @staticmethod
+    def load(loan_ids: List[str]) -> List[Tuple[Dict, Dict]]:
+        """Données du contrat (prêt, client, dernière photo) pour un lot de prêts"""
+        photo = (
+            select(ClientPhoto.filepath)
+            .where(ClientPhoto.client_id == Client.id)
+            .order_by(ClientPhoto.created_at.desc())
+            .limit(1)
+            .correlate(Client)
+            .scalar_subquery()
+        )
+        with get_db() as db:
+            rows = db.execute(
+                select(
+                    Loan.id, Loan.amount, Loan.duration_days, Loan.interest_rate,
+                    Client.id.label('client_id'), Client.first_name, Client.last_name,
+                    Client.phone, Client.address, photo.label('photo_path')
+                )
+                .join(Client, Client.id == Loan.client_id)
+                .where(Loan.id.in_(loan_ids))
+            ).all()
+
+        by_id = {str(row.id): row for row in rows}
+        contracts = []
+        for loan_id in loan_ids:
+            row = by_id.get(loan_id)
+            if row is None:
+                continue
+            daily_rate = (Decimal(row.interest_rate) / 365).quantize(Decimal('0.000001')).normalize()
+            contracts.append((
+                {
+                    'id': loan_id,
+                    'amount': row.amount,
+                    'duration_days': row.duration_days,
+                    'daily_interest_rate': daily_rate
+                },
+                {
+                    'id': str(row.client_id),
+                    'full_name': f"{row.first_name} {row.last_name}",
+                    'phone': row.phone,
+                    'address': row.address or '',
+                    'photo_path': row.photo_path if row.photo_path and os.path.exists(row.photo_path) else None
+                }
+            ))
+        return contracts
+
+    def _contracts(self, loan_ids: List[str]) -> Iterator[Tuple[Dict, Dict]]:
+        for i in range(0, len(loan_ids), self.chunk_size):
+            yield from self.load(loan_ids[i:i + self.chunk_size])
+
+    def run(
+        self,
+        approved_on: Optional[date] = None,
+        loan_ids: Optional[Iterable[str]] = None,
+        progress: Optional[Callable[[int], None]] = None
+    ) -> Dict:
+        """
+        Génère les contrats de la cohorte non encore couverts par le point de reprise
+        Args:
+            approved_on: Date d'approbation des prêts (par défaut aujourd'hui)
+            loan_ids: Prêts à traiter (remplace la sélection par date)
+            progress: Appelé avec le nombre de contrats traités depuis l'appel précédent
+        Returns:
+            Dict: Compteurs (cohorte, déjà faits, générés, échecs) et durée
+        """
+        started = time.monotonic()
+        cohort = self.cohort(approved_on, loan_ids)
+        done = self.checkpoint.load()
+        todo = [loan_id for loan_id in cohort if loan_id not in done]
+        stats = {'loans': len(cohort), 'skipped': len(cohort) - len(todo), 'generated': 0, 'failed': 0}
+        if not todo:
+            stats['seconds'] = round(time.monotonic() - started, 2)
+            return stats
+
+        renderer = PDFRenderService(
+            workers=self.workers,
+            max_pending=self.window,
+            timeout=settings.PDF_RENDER_TIMEOUT,
+            queue_timeout=None  # Pas de refus en traitement par lots: on attend une place
+        )
+        renderer.start()
+        inflight = deque()
+        try:
+            for loan_data, client_data in self._contracts(todo):
+                if len(inflight) >= self.window:
+                    self._collect(inflight.popleft(), stats, progress)
+                future = renderer.submit('contract', loan_data, client_data)
+                inflight.append((loan_data['id'], client_data['id'], future))
+            while inflight:
+                self._collect(inflight.popleft(), stats, progress)
+        finally:
+            renderer.shutdown()
+            self.checkpoint.record(self.sink.flush())
+
+        stats['seconds'] = round(time.monotonic() - started, 2)
+        logging.info(
+            f"Contrats: {stats['generated']} générés, {stats['failed']} échecs, "
+            f"{stats['skipped']} déjà faits sur {stats['loans']} prêts en {stats['seconds']}s"
+        )
+        return stats
+
+    def _collect(self, item, stats: Dict, progress: Optional[Callable[[int], None]]):
+        """Attend le plus ancien rendu en cours et l'écrit aussitôt"""
+        loan_id, client_id, future = item
+        try:
+            pdf = future.result()
+        except Exception as e:
+            logging.error(f"Contrat du prêt {loan_id} non généré: {e}")
+            stats['failed'] += 1
+        else:
+            self.checkpoint.record(self.sink.write(loan_id, client_id, pdf))
+            stats['generated'] += 1
+        if progress:
+            progress(1)
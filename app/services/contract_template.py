@@ -0,0 +1,271 @@
+# KREDILAKAY/app/services/contract_template.py
+import threading
+from datetime import datetime
+from io import BytesIO
+from typing import Callable, Dict, List, Optional, Tuple
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.units import inch
+from reportlab.lib.utils import ImageReader, simpleSplit
+from reportlab.pdfbase.pdfmetrics import stringWidth
+from reportlab.pdfgen import canvas
+from app.services.pdf_assets import pdf_assets
+import logging
+
+# À incrémenter à chaque modification du texte ou de la mise en page du contrat
+CONTRACT_TEMPLATE_VERSION = '2026.2'
+
+PAGE_WIDTH, PAGE_HEIGHT = letter
+MARGIN = inch
+TEXT_WIDTH = PAGE_WIDTH - 2 * MARGIN
+LINE = 18  # Interligne du style 'Kreyol' (leading 12 + spaceAfter 6)
+CLAUSE_GAP = 0.2 * inch
+
+FONT = 'Helvetica'
+FONT_BOLD = 'Helvetica-Bold'
+FONT_ITALIC = 'Helvetica-Oblique'
+FONT_SIZE = 10
+MIN_FONT_SIZE = 7
+LEADING = 1.2  # Interligne des valeurs sur plusieurs lignes, en multiple de la taille
+TITLE_SIZE = 14
+
+TEMPLATE_FORM = 'kredi_tpl_{}'
+
+COVER_TITLE_Y = PAGE_HEIGHT - MARGIN - inch - 0.5 * inch - TITLE_SIZE
+PHOTO_BOX = (PAGE_WIDTH - MARGIN - 1.5 * inch, COVER_TITLE_Y - 0.3 * inch - 1.5 * inch, 1.5 * inch, 1.5 * inch)
+# (champ, libellé, lignes réservées à la valeur)
+CLIENT_FIELDS = [
+    ('full_name', 'Client:', 2),
+    ('id', 'ID:', 1),
+    ('phone', 'Téléphone:', 1),
+    ('address', 'Adresse:', 3)
+]
+LOAN_FIELDS = [
+    ('amount', 'Montant:', 1),
+    ('duration_days', 'Durée:', 1),
+    ('daily_interest_rate', 'Taux journalier:', 1),
+    ('date', 'Date:', 1)
+]
+CLAUSES = [
+    ('amount', '1. Montant du Prêt:'),
+    ('duration_days', '2. Durée:'),
+    ('daily_interest_rate', '3. Intérêts:'),
+    (None, '4. Pénalités:', "En cas de retard, une pénalité de 2% par jour sera appliquée."),
+    (None, '5. Droit Haïtien:', "Ce contrat est régi par les lois de la République d'Haïti.")
+]
+SIGNATURE_BOX = (MARGIN, PAGE_HEIGHT - MARGIN - 30 - 0.5 * inch - inch, 3 * inch, inch)
+
+
+def _split(text: str, font: str, size: float, width: float) -> List[str]:
+    """Lignes de `text` d'au plus `width` points; un mot plus large que la boîte est coupé"""
+    lines = []
+    for line in simpleSplit(text, font, size, width):
+        while stringWidth(line, font, size) > width and len(line) > 1:
+            cut = len(line) - 1
+            while cut > 1 and stringWidth(line[:cut], font, size) > width:
+                cut -= 1
+            lines.append(line[:cut])
+            line = line[cut:]
+        lines.append(line)
+    return lines or ['']
+
+
+def _fit(text: str, font: str, size: float, width: float, room: float) -> Tuple[List[str], float]:
+    """
+    Découpe le texte pour tenir dans sa boîte: `width` points de large et `room` points
+    sous la première ligne, en réduisant la taille jusqu'à MIN_FONT_SIZE. Le texte n'est
+    jamais tronqué (contrat signé): au-delà, les dernières lignes débordent sous la boîte.
+    """
+    while True:
+        lines = _split(text, font, size, width)
+        if (len(lines) - 1) * size * LEADING <= room or size <= MIN_FONT_SIZE:
+            return lines, size
+        size -= 0.5
+
+
+def contract_fields(loan_data: dict, client_data: dict) -> Dict[str, str]:
+    """Valeurs variables du contrat, formatées comme dans le texte du contrat"""
+    rate = loan_data['daily_interest_rate'] * 100
+    return {
+        'full_name': str(client_data['full_name']),
+        'id': str(client_data['id']),
+        'phone': str(client_data['phone']),
+        'address': str(client_data['address']),
+        'amount': f"{loan_data['amount']} HTG",
+        'duration_days': f"{loan_data['duration_days']} jours",
+        'daily_interest_rate': f"{rate:.2f}%",
+        'date': datetime.now().strftime('%d/%m/%Y'),
+        'clause_amount': f"Le prêteur accorde un prêt de {loan_data['amount']} HTG au client.",
+        'clause_duration_days': f"Le prêt doit être remboursé dans un délai de {loan_data['duration_days']} jours.",
+        'clause_daily_interest_rate': f"Taux d'intérêt journalier de {rate}%."
+    }
+
+
+class ContractTemplate:
+    """
+    Contrat de prêt précompilé: les pages statiques (titre, libellés, clauses,
+    bloc de signature) sont dessinées une fois par version et conservées sous
+    forme d'opérateurs PDF. Chaque contrat les déclare comme Form XObjects de
+    son propre canvas, puis n'y dessine que ses champs variables: le document
+    est écrit en une seule passe ReportLab, sans relecture ni fusion.
+    """
+
+    def __init__(self, version: str = CONTRACT_TEMPLATE_VERSION):
+        self.version = version
+        self._positions: Dict[str, Tuple[float, float, float, float]] = {}
+        self._fonts: Dict[str, str] = {}
+        logo = pdf_assets.logo()
+        self._logo = ImageReader(BytesIO(logo)) if logo else None
+        self._pages: List[List[str]] = self._compile()
+
+    def _field(self, c: canvas.Canvas, name: str, label: str, x: float, y: float,
+               right: float = PAGE_WIDTH - MARGIN, height: float = LINE):
+        """
+        Libellé en gras; la valeur sera dessinée à sa suite, sur autant de lignes que
+        le permet la hauteur réservée (x, y, largeur, espace sous la première ligne)
+        """
+        c.setFont(FONT_BOLD, FONT_SIZE)
+        c.drawString(x, y, label)
+        start = x + stringWidth(label + ' ', FONT_BOLD, FONT_SIZE)
+        self._positions[name] = (start, y, right - start, height - FONT_SIZE)
+
+    def _compile(self) -> List[List[str]]:
+        """
+        Dessine les pages statiques du modèle (couverture, clauses, signature)
+        Returns:
+            List: Opérateurs PDF de chaque page; le logo, image propre à chaque
+            document, est ajouté lors du rendu
+        """
+        c = canvas.Canvas(BytesIO(), pagesize=letter, invariant=1)
+        pages = []
+
+        def end_page():
+            pages.append(list(c._code))
+            c.showPage()
+
+        # Couverture: titre, libellés des informations client et prêt
+        top = PAGE_HEIGHT - MARGIN
+        c.setFont(FONT_BOLD, TITLE_SIZE)
+        c.drawCentredString(PAGE_WIDTH / 2, COVER_TITLE_Y, "CONTRAT DE PRÊT")
+
+        y = PHOTO_BOX[1] + PHOTO_BOX[3] - FONT_SIZE
+        for name, label, lines in CLIENT_FIELDS:
+            self._field(c, name, label, MARGIN, y, right=PHOTO_BOX[0] - 12, height=lines * LINE)
+            y -= lines * LINE
+        y -= 0.3 * inch
+        for name, label, lines in LOAN_FIELDS:
+            self._field(c, name, label, MARGIN, y, height=lines * LINE)
+            y -= lines * LINE
+        c.setFont(FONT_ITALIC, FONT_SIZE)
+        c.drawString(MARGIN, y - 0.5 * inch, "Veuillez lire attentivement les termes ci-dessous")
+        end_page()
+
+        # Termes: les clauses 1 à 3 reprennent les valeurs du prêt
+        y = top - FONT_SIZE
+        for clause in CLAUSES:
+            name, label = clause[0], clause[1]
+            if name:
+                self._field(c, f"clause_{name}", label, MARGIN, y, height=LINE + CLAUSE_GAP)
+            else:
+                c.setFont(FONT_BOLD, FONT_SIZE)
+                c.drawString(MARGIN, y, label)
+                c.setFont(FONT, FONT_SIZE)
+                c.drawString(MARGIN + stringWidth(label + ' ', FONT_BOLD, FONT_SIZE), y, clause[2])
+            y -= LINE + CLAUSE_GAP
+        end_page()
+
+        # Signature
+        c.setFont(FONT_BOLD, TITLE_SIZE)
+        c.drawCentredString(PAGE_WIDTH / 2, top - TITLE_SIZE, "Signature du Client")
+        y = SIGNATURE_BOX[1] - 0.2 * inch - FONT_SIZE
+        c.setFont(FONT, FONT_SIZE)
+        c.drawString(MARGIN, y, "_" * 50)
+        c.setFont(FONT_ITALIC, FONT_SIZE)
+        c.drawString(MARGIN, y - LINE, "Signature du client")
+        end_page()
+
+        # Noms internes (/F1, /F2...) des polices référencées par les opérateurs
+        self._fonts = dict(c._doc.fontMapping)
+        return pages
+
+    def _declare_forms(self, c: canvas.Canvas):
+        """Déclare les pages du modèle comme Form XObjects du document en cours"""
+        fonts = {font: c._doc.getInternalFontName(font) for font in self._fonts}
+        if fonts != self._fonts:
+            raise ValueError("Le contrat doit être rendu sur un canvas neuf (polices déjà enregistrées)")
+        for number, code in enumerate(self._pages):
+            c.beginForm(TEMPLATE_FORM.format(number))
+            if number == 0 and self._logo:
+                c.drawImage(self._logo, (PAGE_WIDTH - 2 * inch) / 2, PAGE_HEIGHT - MARGIN - inch,
+                            width=2 * inch, height=inch)
+            c._code.extend(code)
+            c.endForm()
+
+    def _draw_value(self, c: canvas.Canvas, name: str, value: str):
+        x, y, width, room = self._positions[name]
+        lines, size = _fit(value, FONT, FONT_SIZE, width, room)
+        if (len(lines) - 1) * size * LEADING > room:
+            logging.warning(f"Contrat: la valeur du champ {name} déborde de sa zone ({len(lines)} lignes)")
+        text = c.beginText(x, y)
+        text.setFont(FONT, size, leading=size * LEADING)
+        text.textLines(lines)
+        c.drawText(text)
+
+    def render(self, c: canvas.Canvas, loan_data: dict, client_data: dict, signature_img: Optional[bytes] = None,
+               on_page: Optional[Callable[[canvas.Canvas], None]] = None):
+        """
+        Dessine un contrat sur un canvas neuf: chaque page peint le modèle, puis ses champs
+        variables. L'appelant pose les métadonnées et écrit le document (c.save())
+        Args:
+            c: Canvas ReportLab du document (format letter), encore vierge
+            loan_data: Données du prêt (id, amount, duration_days, daily_interest_rate)
+            client_data: Info client (full_name, id, phone, address, photo_path)
+            signature_img: Signature numérique (bytes); sans elle, pas de page de signature
+            on_page: Appelé avec le canvas à la fin de chaque page (QR code, mentions)
+        """
+        self._declare_forms(c)
+        fields = contract_fields(loan_data, client_data)
+
+        def page(number: int):
+            c.doForm(TEMPLATE_FORM.format(number))
+
+        def end_page():
+            if on_page:
+                on_page(c)
+            c.showPage()
+
+        page(0)
+        for name, _, _ in CLIENT_FIELDS + LOAN_FIELDS:
+            self._draw_value(c, name, fields[name])
+        photo_path = client_data.get('photo_path')
+        if photo_path:
+            x, y, width, height = PHOTO_BOX
+            c.drawImage(photo_path, x, y, width=width, height=height, preserveAspectRatio=True, anchor='ne')
+        end_page()
+
+        page(1)
+        for clause in CLAUSES:
+            if clause[0]:
+                self._draw_value(c, f"clause_{clause[0]}", fields[f"clause_{clause[0]}"])
+        end_page()
+
+        if signature_img:
+            page(2)
+            x, y, width, height = SIGNATURE_BOX
+            c.drawImage(ImageReader(BytesIO(signature_img)), x, y, width=width, height=height)
+            end_page()
+
+
+_templates: Dict[str, ContractTemplate] = {}
+_lock = threading.Lock()
+
+
+def get_contract_template(version: str = CONTRACT_TEMPLATE_VERSION) -> ContractTemplate:
+    """Modèle compilé une fois par processus et par version"""
+    template = _templates.get(version)
+    if template is None:
+        with _lock:
+            template = _templates.get(version)
+            if template is None:
+                template = _templates[version] = ContractTemplate(version)
+                logging.info(f"Modèle de contrat {version} compilé")
+    return template
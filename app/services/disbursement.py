@@ -0,0 +1,377 @@
+# KREDILAKAY/app/services/disbursement.py
+import hashlib
+import hmac
+import json
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional
+import requests
+from sqlalchemy import bindparam, case, func, literal, select, update
+from sqlalchemy.dialects.postgresql import insert
+from app.database import get_db
+from app.models import Client, Disbursement, Loan
+from config import settings
+import logging
+
+PROVIDER_SECRETS = {
+    'NATCOM_PAY': ('X-Natcom-Signature', lambda: settings.NATCOM_SECRET),
+    'DIGICEL_PAY': ('X-Digicel-Signature', lambda: settings.DIGICEL_SECRET),
+    'UNIBANK': ('X-Unibank-Signature', lambda: settings.UNIBANK_SECRET)
+}
+CLAIMABLE_STATUSES = ('PENDING', 'FAILED')
+MISSING_PHONE = 'Téléphone du client manquant'
+
+
+def payout_request(provider: str, row) -> Dict:
+    """Demande de décaissement au format du fournisseur; l'id du décaissement sert de clé d'idempotence"""
+    if provider == 'NATCOM_PAY':
+        return {
+            'requestId': str(row.id),
+            'reference': f"KREDI_{row.loan_id}",
+            'msisdn': row.recipient,
+            'amount': {'value': str(row.amount), 'currency': 'HTG'}
+        }
+    elif provider == 'DIGICEL_PAY':
+        return {
+            'txn_ref': str(row.id),
+            'client_ref': str(row.loan_id),
+            'wallet': row.recipient,
+            'amount': str(row.amount)
+        }
+    else:  # UNIBANK
+        return {
+            'payout': {
+                'id': str(row.id),
+                'reference': str(row.loan_id),
+                'beneficiary': row.recipient,
+                'amount': str(row.amount),
+                'currency': 'HTG'
+            }
+        }
+
+
+def normalize_disbursement_data(provider: str, data: Dict) -> Dict:
+    """Normalise une confirmation de décaissement selon le fournisseur"""
+    if provider == 'NATCOM_PAY':
+        return {
+            'disbursement_id': data['requestId'],
+            'reference': data.get('transactionId'),
+            'confirmed': data['status'] == 'SUCCESS',
+            'error': data.get('reason')
+        }
+    elif provider == 'DIGICEL_PAY':
+        return {
+            'disbursement_id': data['txn_ref'],
+            'reference': data.get('txn_id'),
+            'confirmed': data['status'] == 'COMPLETED',
+            'error': data.get('reason')
+        }
+    else:  # UNIBANK
+        return {
+            'disbursement_id': data['payout']['id'],
+            'reference': data['payout'].get('transfer_id'),
+            'confirmed': data['event'] == 'payout.completed',
+            'error': data['payout'].get('failure_reason')
+        }
+
+
+class RateLimiter:
+    """Seau à jetons partagé entre threads: au plus `rate` demandes par seconde, rafale `burst`"""
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.interval = 1.0 / rate
+        self.burst = burst
+        self._next = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        with self._lock:
+            now = time.monotonic()
+            self._next = max(self._next, now - (self.burst - 1) * self.interval)
+            wait = self._next - now
+            self._next += self.interval
+        if wait > 0:
+            time.sleep(wait)
+
+    def penalize(self, seconds: float):
+        """Décale les prochains envois (réponse 429 du fournisseur)"""
+        with self._lock:
+            self._next = max(self._next, time.monotonic() + seconds)
+
+
+class DisbursementEngine:
+    """
+    Décaissement en lot des prêts approuvés: les demandes sont créées en une instruction,
+    réclamées par bail (FOR UPDATE SKIP LOCKED), envoyées en parallèle aux fournisseurs
+    sous leur limite de débit, et leur résultat enregistré en une instruction. Les
+    confirmations arrivent par DisbursementWebhook; apply_confirmations reporte ensuite
+    la date de décaissement sur les prêts en une seule mise à jour. Une demande réémise
+    garde son identifiant, que les fournisseurs utilisent comme clé d'idempotence.
+    """
+
+    def __init__(
+        self,
+        provider: Optional[str] = None,
+        endpoints: Optional[Dict[str, str]] = None,
+        workers: Optional[int] = None,
+        timeout: float = 15.0
+    ):
+        self.provider = provider or settings.DISBURSEMENT_PROVIDER
+        if self.provider not in PROVIDER_SECRETS:
+            raise ValueError(f"Fournisseur non supporté: {self.provider}")
+        self.endpoints = endpoints or settings.DISBURSEMENT_ENDPOINTS
+        self.workers = workers or settings.DISBURSEMENT_WORKERS
+        self.timeout = timeout
+        self.max_attempts = settings.DISBURSEMENT_MAX_ATTEMPTS
+        self.lease = timedelta(seconds=settings.DISBURSEMENT_LEASE_SECONDS)
+        self.limiters = {name: RateLimiter(rate) for name, rate in settings.DISBURSEMENT_RATE_LIMITS.items()}
+        self._local = threading.local()
+
+    def run(self, loan_ids: Optional[Iterable[str]] = None, limit: int = 1000) -> Dict:
+        """
+        Crée et envoie les demandes de décaissement
+        Args:
+            loan_ids: Prêts à décaisser (tous les prêts approuvés non décaissés si None)
+            limit: Nombre maximal de demandes envoyées par appel
+        Returns:
+            Dict: Compteurs (créées, envoyées, échecs) et durée d'envoi
+        """
+        prepared = self.prepare(loan_ids)
+        created = prepared['created']
+        batch = self.claim(limit, loan_ids)
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            results = list(pool.map(self._send, batch))
+        elapsed = time.perf_counter() - started
+
+        self._record(results)
+        counts = Counter(result['b_status'] for result in results)
+        logging.info(
+            f"Décaissements: {created} créés, {prepared['rejected']} rejetés, {counts['SENT']} envoyés, "
+            f"{counts['FAILED']} échecs en {elapsed:.1f}s"
+        )
+        return {
+            'created': created,
+            'rejected': prepared['rejected'],
+            'sent': counts['SENT'],
+            'failed': counts['FAILED'],
+            'seconds': round(elapsed, 2)
+        }
+
+    def prepare(self, loan_ids: Optional[Iterable[str]] = None) -> Dict:
+        """
+        Crée en une instruction les demandes des prêts approuvés non encore décaissés.
+        Un client sans téléphone ne bloque pas le lot: sa demande est créée REJECTED, puis
+        remise en attente (PENDING) au prochain appel une fois le téléphone renseigné.
+        Returns:
+            Dict: Nombre de demandes créées (ou remises en attente) et rejetées
+        """
+        missing_phone = func.coalesce(func.trim(Client.phone), '') == ''
+        eligible = (
+            select(
+                Loan.id,
+                literal(self.provider),
+                Loan.amount,
+                func.coalesce(Client.phone, ''),
+                case((missing_phone, 'REJECTED'), else_='PENDING'),
+                literal(0),
+                case((missing_phone, MISSING_PHONE))
+            )
+            .join(Client, Client.id == Loan.client_id)
+            .where(
+                Loan.status == 'APPROVED',
+                Loan.disbursement_date.is_(None),
+                ~select(Disbursement.id).where(Disbursement.loan_id == Loan.id).exists()
+            )
+        )
+        rearm = (
+            update(Disbursement)
+            .where(
+                Disbursement.status == 'REJECTED',
+                Disbursement.loan_id == Loan.id,
+                Loan.client_id == Client.id,
+                Loan.status == 'APPROVED',
+                Loan.disbursement_date.is_(None),
+                ~missing_phone
+            )
+            .values(status='PENDING', recipient=Client.phone, error=None)
+            .execution_options(synchronize_session=False)
+        )
+        if loan_ids is not None:
+            eligible = eligible.where(Loan.id.in_(list(loan_ids)))
+            rearm = rearm.where(Loan.id.in_(list(loan_ids)))
+
+        with get_db() as db:
+            rearmed = db.execute(rearm).rowcount
+            statuses = Counter(db.execute(
+                insert(Disbursement)
+                .from_select(['loan_id', 'provider', 'amount', 'recipient', 'status', 'attempts', 'error'], eligible)
+                .on_conflict_do_nothing(constraint='unique_loan_disbursement')
+                .returning(Disbursement.status)
+            ).scalars())
+            db.commit()
+
+        if statuses['REJECTED']:
+            logging.warning(f"Décaissements rejetés ({MISSING_PHONE}): {statuses['REJECTED']}")
+        return {'created': statuses['PENDING'] + rearmed, 'rejected': statuses['REJECTED']}
+
+    def claim(self, limit: int, loan_ids: Optional[Iterable[str]] = None) -> List:
+        """Réserve les demandes à envoyer (nouvelles, échouées ou dont le bail a expiré)"""
+        now = datetime.utcnow()
+        claimable = (
+            select(Disbursement.id)
+            .where(
+                Disbursement.attempts < self.max_attempts,
+                Disbursement.status.in_(CLAIMABLE_STATUSES)
+                | ((Disbursement.status == 'SENDING') & (Disbursement.sent_at < now - self.lease))
+            )
+            .order_by(Disbursement.created_at)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        )
+        if loan_ids is not None:
+            claimable = claimable.where(Disbursement.loan_id.in_(list(loan_ids)))
+
+        with get_db() as db:
+            rows = db.execute(
+                update(Disbursement)
+                .where(Disbursement.id.in_(claimable.scalar_subquery()))
+                .values(status='SENDING', sent_at=now, attempts=Disbursement.attempts + 1)
+                .returning(
+                    Disbursement.id, Disbursement.loan_id, Disbursement.provider,
+                    Disbursement.amount, Disbursement.recipient
+                )
+                .execution_options(synchronize_session=False)
+            ).all()
+            db.commit()
+        return rows
+
+    def _session(self) -> requests.Session:
+        """Une session HTTP (connexions persistantes) par thread d'envoi"""
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = self._local.session = requests.Session()
+        return session
+
+    def _send(self, row, retries: int = 3) -> Dict:
+        """Envoie une demande signée sous la limite de débit du fournisseur"""
+        header, secret = PROVIDER_SECRETS[row.provider]
+        body = json.dumps(payout_request(row.provider, row), separators=(',', ':')).encode()
+        headers = {
+            'Content-Type': 'application/json',
+            'Idempotency-Key': str(row.id),
+            header: hmac.new(secret().encode('utf-8'), body, hashlib.sha256).hexdigest()
+        }
+        limiter = self.limiters.get(row.provider)
+
+        error = None
+        for _ in range(retries):
+            if limiter:
+                limiter.acquire()
+            try:
+                response = self._session().post(
+                    self.endpoints[row.provider], data=body, headers=headers, timeout=self.timeout
+                )
+            except requests.RequestException as e:
+                error = str(e)
+                continue
+
+            if response.status_code == 429:
+                if limiter:
+                    limiter.penalize(float(response.headers.get('Retry-After') or 1))
+                error = 'Limite de débit du fournisseur'
+                continue
+            if response.ok:
+                reference = (response.json() or {}).get('reference') if response.content else None
+                return {'b_id': row.id, 'b_status': 'SENT', 'b_reference': reference, 'b_error': None}
+            error = f"HTTP {response.status_code}: {response.text[:200]}"
+            if response.status_code < 500:
+                break
+
+        return {'b_id': row.id, 'b_status': 'FAILED', 'b_reference': None, 'b_error': error}
+
+    @staticmethod
+    def _record(results: List[Dict]):
+        """Enregistre les résultats d'envoi en une instruction (sans écraser une confirmation déjà reçue)"""
+        if not results:
+            return
+        with get_db() as db:
+            db.execute(
+                update(Disbursement.__table__)
+                .where(Disbursement.id == bindparam('b_id'), Disbursement.status == 'SENDING')
+                .values(
+                    status=bindparam('b_status'),
+                    provider_reference=bindparam('b_reference'),
+                    error=bindparam('b_error')
+                ),
+                results
+            )
+            db.commit()
+
+    @staticmethod
+    def confirm(db, provider: str, data: Dict) -> bool:
+        """
+        Enregistre la confirmation (ou l'échec) d'un décaissement reçue par webhook
+        Returns:
+            bool: False si le décaissement est inconnu ou déjà confirmé
+        """
+        confirmation = normalize_disbursement_data(provider, data)
+        values = {'provider_reference': confirmation['reference']} if confirmation['reference'] else {}
+        if confirmation['confirmed']:
+            values.update(status='CONFIRMED', confirmed_at=datetime.utcnow(), error=None)
+        else:
+            values.update(status='FAILED', error=confirmation['error'] or 'Refusé par le fournisseur')
+
+        result = db.execute(
+            update(Disbursement)
+            .where(
+                Disbursement.id == confirmation['disbursement_id'],
+                Disbursement.provider == provider,
+                Disbursement.status != 'CONFIRMED'
+            )
+            .values(**values)
+            .execution_options(synchronize_session=False)
+        )
+        return result.rowcount == 1
+
+    @staticmethod
+    def apply_confirmations() -> int:
+        """
+        Reporte la date de décaissement sur les prêts confirmés, en une instruction
+        Returns:
+            int: Nombre de prêts mis à jour
+        """
+        with get_db() as db:
+            applied = (
+                update(Disbursement)
+                .where(Disbursement.status == 'CONFIRMED', Disbursement.applied_at.is_(None))
+                .values(applied_at=datetime.utcnow())
+                .returning(Disbursement.loan_id, Disbursement.confirmed_at)
+                .cte('applied')
+            )
+            result = db.execute(
+                update(Loan)
+                .where(Loan.id == applied.c.loan_id)
+                .values(disbursement_date=func.date(applied.c.confirmed_at))
+                .execution_options(synchronize_session=False)
+            )
+            db.commit()
+            return result.rowcount
+
+    @classmethod
+    def wait_and_apply(cls, timeout: float = 300, poll: float = 5) -> Dict:
+        """Attend les confirmations des demandes envoyées puis les reporte sur les prêts"""
+        deadline = time.monotonic() + timeout
+        while True:
+            with get_db() as db:
+                waiting = db.query(func.count(Disbursement.id)).filter(
+                    Disbursement.status.in_(('SENDING', 'SENT'))
+                ).scalar()
+            if not waiting or time.monotonic() >= deadline:
+                break
+            time.sleep(poll)
+        return {'applied': cls.apply_confirmations(), 'unconfirmed': waiting}
@@ -0,0 +1,141 @@
+# KREDILAKAY/app/services/forecast.py
+from datetime import date, timedelta
+from typing import Dict, List
+import numpy as np
+
+# Pas (en jours) entre deux échéances selon la fréquence de remboursement
+FREQUENCY_STEPS = {
+    'daily': 1,
+    'weekly': 7,
+    'monthly': 30
+}
+
+
+class PortfolioForecaster:
+    """Prévision vectorisée des encaissements attendus sur tout le portefeuille"""
+
+    def __init__(self, horizon_days: int = 30, granularity: str = 'daily'):
+        if granularity not in ('daily', 'weekly'):
+            raise ValueError(f"Granularité non supportée: {granularity}")
+        if horizon_days <= 0:
+            raise ValueError("L'horizon doit être positif")
+        self.horizon_days = horizon_days
+        self.granularity = granularity
+
+    def forecast(
+        self,
+        as_of: date,
+        amount: np.ndarray,
+        interest_rate: np.ndarray,
+        duration_days: np.ndarray,
+        start_offset: np.ndarray,
+        step: np.ndarray,
+        paid: np.ndarray
+    ) -> Dict:
+        """
+        Calcule les encaissements attendus en une seule passe NumPy
+        Args:
+            as_of: Date de début de la prévision
+            amount: Montants principaux
+            interest_rate: Taux annuels (0-1)
+            duration_days: Durées en jours
+            start_offset: Date de début de chaque prêt moins as_of (jours)
+            step: Pas entre deux échéances (jours)
+            paid: Montants déjà remboursés
+        Returns:
+            Dict: Encaissements par période, arriérés et totaux
+        """
+        horizon = self.horizon_days
+        amount = np.asarray(amount, dtype=np.float64)
+        duration = np.maximum(np.asarray(duration_days, dtype=np.int64), 1)
+        start_offset = np.asarray(start_offset, dtype=np.int64)
+        step = np.maximum(np.asarray(step, dtype=np.int64), 1)
+        paid = np.asarray(paid, dtype=np.float64)
+
+        # Mêmes termes que LoanService.calculate_loan_terms (intérêt simple sur 365 jours)
+        total_due = amount + amount * np.asarray(interest_rate, dtype=np.float64) * duration / 365.0
+        n_installments = -(-duration // step)
+        installment = total_due / n_installments
+
+        # Échéances déjà couvertes par les paiements (k est l'index 0-based de l'échéance)
+        covered = np.minimum(np.floor(paid / installment + 1e-9).astype(np.int64), n_installments)
+        residual = np.where(covered < n_installments, paid - covered * installment, 0.0)
+
+        # L'échéance k tombe au jour start_offset + (k + 1) * step
+        first_in_window = np.maximum(-(start_offset // step) - 1, 0)
+        k_lo = np.maximum(covered, first_in_window)
+        k_hi = np.minimum(n_installments - 1, (horizon - 1 - start_offset) // step - 1)
+        count = np.maximum(k_hi - k_lo + 1, 0)
+        first_day = start_offset + (k_lo + 1) * step
+
+        # Échéances impayées antérieures à as_of
+        overdue_count = np.maximum(np.minimum(first_in_window, n_installments) - covered, 0)
+        arrears = overdue_count * installment - np.where(overdue_count > 0, residual, 0.0)
+
+        active = count > 0
+        expected = self._strided_sum(
+            first_day[active], count[active], step[active], installment[active]
+        )
+        loans_due = self._strided_sum(
+            first_day[active], count[active], step[active], np.ones(int(active.sum()))
+        )
+
+        # Échéance partiellement payée: on retranche le reliquat déjà versé
+        partial = active & (k_lo == covered) & (residual > 0)
+        expected -= np.bincount(
+            first_day[partial], weights=residual[partial], minlength=horizon
+        )[:horizon]
+
+        return self._build_report(as_of, expected, loans_due, float(arrears.sum()))
+
+    def _strided_sum(
+        self,
+        first_day: np.ndarray,
+        count: np.ndarray,
+        step: np.ndarray,
+        weight: np.ndarray
+    ) -> np.ndarray:
+        """Somme de progressions arithmétiques via tableaux de différences par pas"""
+        horizon = self.horizon_days
+        out = np.zeros(horizon)
+        for s in np.unique(step):
+            mask = step == s
+            size = horizon + int(s)
+            diff = np.bincount(first_day[mask], weights=weight[mask], minlength=size)
+            diff -= np.bincount(
+                first_day[mask] + count[mask] * s, weights=weight[mask], minlength=size
+            )
+            for r in range(int(s)):
+                diff[r::s] = np.cumsum(diff[r::s])
+            out += diff[:horizon]
+        return out
+
+    def _build_report(
+        self,
+        as_of: date,
+        expected: np.ndarray,
+        loans_due: np.ndarray,
+        arrears: float
+    ) -> Dict:
+        """Agrège le résultat selon la granularité demandée"""
+        period = 7 if self.granularity == 'weekly' else 1
+        padding = (-len(expected)) % period
+        expected = np.pad(expected, (0, padding)).reshape(-1, period).sum(axis=1)
+        loans_due = np.pad(loans_due, (0, padding)).reshape(-1, period).sum(axis=1)
+
+        periods: List[Dict] = []
+        for i, (value, loans) in enumerate(zip(expected, loans_due)):
+            periods.append({
+                'period_start': (as_of + timedelta(days=i * period)).isoformat(),
+                'expected_amount': round(float(value), 2),
+                'installments_due': int(round(loans))
+            })
+
+        return {
+            'as_of': as_of.isoformat(),
+            'granularity': self.granularity,
+            'horizon_days': self.horizon_days,
+            'periods': periods,
+            'total_expected': round(float(expected.sum()), 2),
+            'arrears': round(arrears, 2)
+        }
@@ -0,0 +1,173 @@
+# KREDILAKAY/app/services/installments.py
+from datetime import date, datetime
+from typing import Dict, List, Optional, Sequence
+from sqlalchemy import case, func, insert, literal, select, update
+from app.database import get_db
+from app.models import Installment, Loan
+from app.services.money import Money
+from app.services.schedule import ScheduleRule
+import logging
+
+OPEN_STATUSES = ('PENDING', 'PARTIAL')
+
+
+class InstallmentService:
+    """
+    Échéances persistées dans la table installments: insérées une fois à
+    l'approbation, mises à jour à chaque paiement, et interrogées par plage
+    de due_date (index) pour les rappels et le recouvrement.
+    """
+
+    @staticmethod
+    def create(db, loan: Loan, rule: ScheduleRule) -> int:
+        """
+        Insère toutes les échéances du prêt en une seule instruction
+        Returns:
+            int: Nombre d'échéances créées
+        """
+        rows = [
+            {
+                'loan_id': loan.id,
+                'number': number,
+                'due_date': due_date,
+                'amount': amount.to_decimal(),
+                'paid_amount': 0,
+                'status': 'PENDING'
+            }
+            for number, due_date, amount in rule.expand()
+        ]
+        db.execute(insert(Installment).values(rows))
+        return len(rows)
+
+    @staticmethod
+    def apply_payment(db, loan: Loan):
+        """
+        Répartit le montant contractuel payé (tenu par LoanLedger) sur les échéances,
+        dans l'ordre, en une seule instruction UPDATE ... FROM. Seules les échéances
+        dont le montant payé change sont réécrites.
+        """
+        paid = (Money.from_decimal(loan.total_due) - Money.from_decimal(loan.outstanding_balance or 0)).to_decimal()
+
+        cumulative = (
+            select(
+                Installment.id,
+                (func.sum(Installment.amount).over(order_by=Installment.number) - Installment.amount).label('before')
+            )
+            .where(Installment.loan_id == loan.id)
+            .subquery()
+        )
+        new_paid = func.least(Installment.amount, func.greatest(literal(paid) - cumulative.c.before, 0))
+
+        db.execute(
+            update(Installment)
+            .where(Installment.id == cumulative.c.id, Installment.paid_amount != new_paid)
+            .values(
+                paid_amount=new_paid,
+                status=case(
+                    (new_paid >= Installment.amount, 'PAID'),
+                    (new_paid > 0, 'PARTIAL'),
+                    else_='PENDING'
+                ),
+                paid_at=case(
+                    (new_paid >= Installment.amount, func.coalesce(Installment.paid_at, datetime.utcnow())),
+                    else_=None
+                )
+            )
+            .execution_options(synchronize_session=False)
+        )
+
+    @staticmethod
+    def for_loan(
+        db,
+        loan_id,
+        date_from: Optional[date] = None,
+        date_to: Optional[date] = None,
+        limit: Optional[int] = None
+    ) -> List[Installment]:
+        """Échéances d'un prêt dans la fenêtre demandée (index loan_id, number)"""
+        query = db.query(Installment).filter(Installment.loan_id == loan_id)
+        if date_from:
+            query = query.filter(Installment.due_date >= date_from)
+        if date_to:
+            query = query.filter(Installment.due_date <= date_to)
+        return query.order_by(Installment.number).limit(limit).all()
+
+    @staticmethod
+    def due_between(
+        date_from: date,
+        date_to: date,
+        statuses: Sequence[str] = OPEN_STATUSES,
+        limit: int = 1000
+    ) -> List[Dict]:
+        """
+        Échéances non soldées d'une plage de dates (rappels, recouvrement),
+        via l'index (due_date, status)
+        """
+        with get_db() as db:
+            rows = (
+                db.query(
+                    Installment.loan_id,
+                    Installment.number,
+                    Installment.due_date,
+                    Installment.amount,
+                    Installment.paid_amount,
+                    Installment.status,
+                    Loan.client_id,
+                    Loan.officer_id
+                )
+                .join(Loan, Loan.id == Installment.loan_id)
+                .filter(
+                    Installment.due_date.between(date_from, date_to),
+                    Installment.status.in_(statuses)
+                )
+                .order_by(Installment.due_date, Installment.loan_id)
+                .limit(limit)
+                .all()
+            )
+
+        return [
+            {
+                'loan_id': str(row.loan_id),
+                'client_id': str(row.client_id),
+                'officer_id': str(row.officer_id) if row.officer_id else None,
+                'installment': row.number,
+                'due_date': row.due_date.isoformat(),
+                'amount': float(row.amount),
+                'remaining': float(row.amount - row.paid_amount),
+                'status': row.status
+            }
+            for row in rows
+        ]
+
+    @classmethod
+    def backfill(cls, batch_size: int = 500) -> int:
+        """
+        Crée les échéances des prêts approuvés avant la table installments
+        Returns:
+            int: Nombre de prêts complétés
+        """
+        done = 0
+        while True:
+            with get_db() as db:
+                loans = (
+                    db.query(Loan)
+                    .filter(
+                        Loan.status == 'APPROVED',
+                        Loan.start_date.isnot(None),
+                        ~select(Installment.id).where(Installment.loan_id == Loan.id).exists()
+                    )
+                    .limit(batch_size)
+                    .all()
+                )
+                if not loans:
+                    break
+
+                for loan in loans:
+                    rule = ScheduleRule.from_dict(loan.schedule_rule) if loan.schedule_rule else ScheduleRule.from_loan(loan)
+                    cls.create(db, loan, rule)
+                    cls.apply_payment(db, loan)
+                db.commit()
+                done += len(loans)
+
+        logging.info(f"Échéances créées pour {done} prêts existants")
+        return done
@@ -0,0 +1,73 @@
+# KREDILAKAY/app/services/json_codec.py
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Dict, Optional, Union
+from uuid import UUID
+from flask import make_response
+from flask.json.provider import JSONProvider
+from app.services.money import Money
+
+try:
+    import orjson
+except ImportError:  # orjson optionnel: repli sur le module json standard
+    orjson = None
+
+BACKEND = 'orjson' if orjson else 'json'
+
+
+def _default(obj: Any):
+    """Types non natifs: montants en nombres, identifiants et dates en chaînes ISO"""
+    if isinstance(obj, Decimal):
+        return float(obj)
+    if isinstance(obj, Money):
+        return float(obj.to_decimal())
+    if isinstance(obj, UUID):
+        return str(obj)
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    if hasattr(obj, 'tolist'):  # Scalaires et tableaux numpy/pandas
+        return obj.tolist()
+    raise TypeError(f"Type non sérialisable en JSON: {type(obj).__name__}")
+
+
+if orjson:
+    _OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+    def dumps(obj: Any) -> bytes:
+        """Sérialise en JSON compact (UTF-8)"""
+        return orjson.dumps(obj, default=_default, option=_OPTIONS)
+
+    def loads(data: Union[bytes, str]) -> Any:
+        return orjson.loads(data)
+else:
+    _encoder = json.JSONEncoder(default=_default, ensure_ascii=False, separators=(',', ':'))
+
+    def dumps(obj: Any) -> bytes:
+        """Sérialise en JSON compact (UTF-8)"""
+        return _encoder.encode(obj).encode('utf-8')
+
+    def loads(data: Union[bytes, str]) -> Any:
+        return json.loads(data)
+
+
+def output_json(data: Any, code: int, headers: Optional[Dict] = None):
+    """Représentation application/json de l'API flask-restx"""
+    response = make_response(dumps(data), code)
+    response.headers['Content-Type'] = 'application/json'
+    response.headers.extend(headers or {})
+    return response
+
+
+class CodecJSONProvider(JSONProvider):
+    """Fournisseur JSON de Flask (jsonify, request.get_json) sur le même codec que l'API"""
+
+    def dumps(self, obj: Any, **kwargs) -> str:
+        return dumps(obj).decode('utf-8')
+
+    def loads(self, s: Union[str, bytes], **kwargs) -> Any:
+        return loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(dumps(obj), mimetype='application/json')
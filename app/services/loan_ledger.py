@@ -0,0 +1,277 @@
+# KREDILAKAY/app/services/loan_ledger.py
+import uuid
+from collections import defaultdict
+from datetime import datetime
+from decimal import Decimal
+from types import SimpleNamespace
+from typing import Dict, Iterable, List, Optional, Sequence
+from sqlalchemy import case, func, insert, or_
+from app.database import get_db
+from app.models import Loan, Payment
+from app.services.aging import AgingService
+from app.services.allocation import Allocation, AllocationEngine
+from app.services.installments import InstallmentService
+from app.services.money import Money
+import logging
+
+LEDGER_FIELDS = ('paid_principal', 'paid_interest', 'paid_penalties', 'outstanding_balance', 'credit_balance')
+
+
+class LoanLedger:
+    """
+    Totaux cumulés d'un prêt (principal, intérêts et pénalités payés, solde restant,
+    trop-perçu) maintenus à chaque paiement, dans la même transaction que l'insertion
+    du paiement. La répartition de chaque paiement suit la cascade d'AllocationEngine.
+    """
+
+    @classmethod
+    def lock(cls, db, loan_id) -> Optional[Loan]:
+        """Charge le prêt en verrouillant sa ligne jusqu'au commit, totaux reconstitués si absents"""
+        loan = db.query(Loan).filter_by(id=loan_id).with_for_update().first()
+        if loan is not None:
+            cls.backfill(db, [loan])
+        return loan
+
+    @classmethod
+    def backfill(cls, db, loans: Iterable[Loan]) -> int:
+        """
+        Reconstitue dans la transaction de l'appelant les totaux NULL des prêts antérieurs
+        au registre, depuis l'historique de leurs paiements. Les prêts doivent être
+        verrouillés par l'appelant.
+        Returns:
+            int: Nombre de prêts complétés
+        """
+        missing = {loan.id: loan for loan in loans if any(getattr(loan, field) is None for field in LEDGER_FIELDS)}
+        if not missing:
+            return 0
+
+        engine = AllocationEngine()
+        parts = {row.loan_id: row for row in cls._payment_parts(db, list(missing))}
+        for loan_id, loan in missing.items():
+            state = cls._replay(engine, loan, parts.get(loan_id))
+            for field in LEDGER_FIELDS:
+                setattr(loan, field, getattr(state, field))
+        logging.info(f"Totaux reconstitués pour {len(missing)} prêt(s) antérieur(s) au registre")
+        return len(missing)
+
+    @staticmethod
+    def _payment_parts(db, loan_ids: Optional[Sequence] = None):
+        """Répartition enregistrée des paiements, et montant des paiements sans répartition, par prêt"""
+        query = db.query(
+            Payment.loan_id,
+            func.sum(Payment.penalty_part).label('penalties'),
+            func.sum(Payment.interest_part).label('interest'),
+            func.sum(Payment.principal_part).label('principal'),
+            func.sum(Payment.excess_part).label('excess'),
+            func.sum(case((Payment.principal_part.is_(None), Payment.amount), else_=0)).label('unallocated')
+        )
+        if loan_ids is not None:
+            query = query.filter(Payment.loan_id.in_(loan_ids))
+        return query.group_by(Payment.loan_id)
+
+    @staticmethod
+    def _replay(engine: AllocationEngine, loan: Loan, parts) -> SimpleNamespace:
+        """Totaux attendus: répartition enregistrée, puis paiements sans répartition imputés en cascade"""
+        state = SimpleNamespace(
+            amount=loan.amount,
+            total_due=loan.total_due,
+            accrued_penalties=loan.accrued_penalties,
+            paid_penalties=getattr(parts, 'penalties', None) or 0,
+            paid_interest=getattr(parts, 'interest', None) or 0,
+            paid_principal=getattr(parts, 'principal', None) or 0,
+            credit_balance=getattr(parts, 'excess', None) or 0
+        )
+        engine.apply(state, Money.from_decimal(getattr(parts, 'unallocated', None) or 0))
+        return state
+
+    @staticmethod
+    def open(loan: Loan) -> Loan:
+        """Initialise les totaux d'un nouveau prêt"""
+        loan.paid_principal = Decimal('0.00')
+        loan.paid_interest = Decimal('0.00')
+        loan.paid_penalties = Decimal('0.00')
+        loan.credit_balance = Decimal('0.00')
+        loan.outstanding_balance = Money.from_decimal(loan.total_due).to_decimal()
+        return loan
+
+    @staticmethod
+    def apply_payment(loan: Loan, amount: Decimal, engine: Optional[AllocationEngine] = None) -> Allocation:
+        """Impute un paiement sur les totaux du prêt en O(1) et retourne sa répartition"""
+        return (engine or AllocationEngine()).apply(loan, Money.from_decimal(amount))
+
+    @classmethod
+    def post_payments(
+        cls,
+        db,
+        loan: Loan,
+        amounts: Sequence[Decimal],
+        engine: Optional[AllocationEngine] = None
+    ) -> List[Allocation]:
+        """
+        Impute des paiements d'un prêt verrouillé, dans l'ordre donné, puis met à jour
+        les échéances, le statut et le retard une seule fois
+        Returns:
+            List[Allocation]: Répartition de chaque paiement
+        """
+        engine = engine or AllocationEngine()
+        previous = AgingService.position(loan)
+        allocations = [cls.apply_payment(loan, amount, engine) for amount in amounts]
+        InstallmentService.apply_payment(db, loan)
+        if loan.outstanding_balance <= 0:
+            loan.status = 'PAID'
+            loan.end_date = datetime.utcnow()
+        AgingService.update(db, loan, previous)
+        return allocations
+
+    @staticmethod
+    def total_paid(loan: Loan) -> Money:
+        return sum(
+            Money.from_decimal(getattr(loan, field) or 0)
+            for field in ('paid_principal', 'paid_interest', 'paid_penalties', 'credit_balance')
+        )
+
+    @classmethod
+    def post_batch(cls, rows: Iterable[Dict], chunk_size: int = 500) -> Dict:
+        """
+        Impute en lot des paiements saisis hors ligne (espèces collectées par les agents).
+        Les paiements sont regroupés par prêt et imputés par date croissante; chaque bloc
+        de prêts est verrouillé en une requête et ses paiements insérés en une instruction.
+        Un reçu déjà enregistré pour le prêt (fichier rejoué, ligne répétée) est ignoré:
+        la vérification se fait sous le verrou des prêts, avant toute imputation.
+        Args:
+            rows: Paiements {loan_id, amount, payment_date, payment_method, receipt_number}
+            chunk_size: Nombre de prêts par transaction
+        Returns:
+            Dict: Compteurs, paiements rejetés (prêt inconnu ou non approuvé) et paiements
+                  déjà imputés (même reçu)
+        """
+        by_loan = defaultdict(list)
+        for row in rows:
+            by_loan[str(row['loan_id'])].append(row)
+
+        engine = AllocationEngine()
+        loan_ids = sorted(by_loan)  # Ordre stable des verrous
+        posted, rejected, already_posted = 0, [], []
+        for i in range(0, len(loan_ids), chunk_size):
+            chunk = loan_ids[i:i + chunk_size]
+            with get_db() as db:
+                loans = {
+                    str(loan.id): loan
+                    for loan in db.query(Loan).filter(Loan.id.in_(chunk)).order_by(Loan.id).with_for_update()
+                }
+                cls.backfill(db, loans.values())
+                # Reçus déjà enregistrés pour les prêts verrouillés
+                receipts = {row.get('receipt_number') for loan_id in chunk for row in by_loan[loan_id]} - {None}
+                recorded = set()
+                if receipts and loans:
+                    recorded = {
+                        (str(loan_id), receipt)
+                        for loan_id, receipt in db.query(Payment.loan_id, Payment.receipt_number).filter(
+                            Payment.loan_id.in_([loan.id for loan in loans.values()]),
+                            Payment.receipt_number.in_(list(receipts))
+                        )
+                    }
+
+                payments = []
+                for loan_id in chunk:
+                    loan = loans.get(loan_id)
+                    if loan is None:
+                        rejected.extend({**entry, 'reason': 'Prêt non trouvé'} for entry in by_loan[loan_id])
+                        continue
+
+                    entries = []
+                    for entry in sorted(by_loan[loan_id], key=lambda r: r['payment_date']):
+                        receipt = entry.get('receipt_number')
+                        if receipt is not None:
+                            if (loan_id, receipt) in recorded:
+                                already_posted.append(entry)
+                                continue
+                            recorded.add((loan_id, receipt))
+                        entries.append(entry)
+                    if not entries:
+                        continue
+                    if loan.status != 'APPROVED':
+                        rejected.extend({**entry, 'reason': 'Prêt non approuvé'} for entry in entries)
+                        continue
+
+                    amounts = [Decimal(str(entry['amount'])) for entry in entries]
+                    allocations = cls.post_payments(db, loan, amounts, engine)
+                    last_date = entries[-1]['payment_date']
+                    if loan.last_payment_date is None or loan.last_payment_date < last_date:
+                        loan.last_payment_date = last_date
+                    payments.extend(
+                        {
+                            'id': str(uuid.uuid4()),
+                            'loan_id': loan.id,
+                            'amount': amount,
+                            'payment_method': entry.get('payment_method') or 'CASH',
+                            'receipt_number': entry.get('receipt_number'),
+                            'payment_date': entry['payment_date'],
+                            **allocation.as_columns()
+                        }
+                        for entry, amount, allocation in zip(entries, amounts, allocations)
+                    )
+
+                if payments:
+                    db.execute(insert(Payment).values(payments))
+                db.commit()
+                posted += len(payments)
+
+        logging.info(
+            f"Paiements hors ligne imputés: {posted}, rejetés: {len(rejected)}, déjà imputés: {len(already_posted)}"
+        )
+        return {'payments': posted, 'loans': len(loan_ids), 'rejected': rejected, 'already_posted': already_posted}
+
+    @classmethod
+    def rebuild(
+        cls,
+        loan_ids: Optional[Iterable[str]] = None,
+        repair: bool = True,
+        batch_size: int = 1000,
+        missing_only: bool = False
+    ) -> List[Dict]:
+        """
+        Recalcule les totaux depuis la répartition enregistrée des paiements. Les paiements
+        antérieurs à l'imputation en cascade (sans répartition) sont imputés à la suite.
+        Args:
+            loan_ids: Prêts à vérifier (tous si None)
+            repair: Corrige les écarts si True, sinon vérifie seulement
+            batch_size: Taille des lots lus depuis la base
+            missing_only: Limite aux prêts dont un total est NULL (prêts antérieurs au registre)
+        Returns:
+            List[Dict]: Écarts détectés {'loan_id', 'field', 'stored', 'expected'}
+        """
+        mismatches = []
+        engine = AllocationEngine()
+        with get_db() as db:
+            parts = cls._payment_parts(db).subquery()
+            query = (
+                db.query(Loan, parts)
+                .outerjoin(parts, parts.c.loan_id == Loan.id)
+                .order_by(Loan.id)
+            )
+            if loan_ids is not None:
+                query = query.filter(Loan.id.in_(list(loan_ids)))
+            if missing_only:
+                query = query.filter(or_(*(getattr(Loan, field).is_(None) for field in LEDGER_FIELDS)))
+
+            for row in query.yield_per(batch_size):
+                loan = row[0]
+                state = cls._replay(engine, loan, row)
+                for field in LEDGER_FIELDS:
+                    stored, expected = getattr(loan, field), getattr(state, field)
+                    if stored is None or Decimal(stored) != expected:
+                        mismatches.append({
+                            'loan_id': str(loan.id),
+                            'field': field,
+                            'stored': stored,
+                            'expected': expected
+                        })
+                        if repair:
+                            setattr(loan, field, expected)
+
+            if repair and mismatches:
+                db.commit()
+                logging.warning(f"Totaux de prêts corrigés: {len(mismatches)} écart(s)")
+
+        return mismatches
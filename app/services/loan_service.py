@@ -1,12 +1,23 @@
 # KREDILAKAY/app/services/loan_service.py
-from decimal import Decimal, ROUND_HALF_UP
-from datetime import datetime, timedelta
-from typing import List, Dict, Optional
+import base64
+from decimal import Decimal, ROUND_HALF_EVEN
+from fractions import Fraction
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+from typing import List, Dict, Optional, Sequence
+from sqlalchemy import func, tuple_
+import numpy as np
 from app.database import get_db
 from app.models import Loan, Payment, Client
+from app.services.forecast import PortfolioForecaster
+from app.services.schedule import ScheduleRule
+from app.services.loan_ledger import LoanLedger
+from app.services.money import Money, round_half_even_div
 from config import settings
 import logging
 
+RATE_TIER = Decimal('.0001')  # Paliers de taux de 0,01%, clé du cache des grilles d'offres
+
 class LoanService:
     """Service central pour la gestion des prêts et calculs financiers"""
 
@@ -30,47 +41,130 @@ class LoanService:
             Dict: Termes calculés (intérêts, échéances)
         """
         interest_rate = self._determine_interest_rate(client_risk_score)
-        total_interest = (amount * interest_rate * duration_days) / Decimal('365')
-        total_due = amount + total_interest
+        principal = Money.from_decimal(amount, ROUND_HALF_EVEN)
+        total_interest, daily_payment = _loan_terms(principal, interest_rate, duration_days)
 
         return {
-            'amount': amount.quantize(Decimal('.01'),
-            'interest_rate': interest_rate.quantize(Decimal('.0001')),
-            'total_interest': total_interest.quantize(Decimal('.01')),
-            'total_due': total_due.quantize(Decimal('.01')),
-            'daily_payment': (total_due / duration_days).quantize(Decimal('.01'))
+            'amount': principal.to_decimal(),
+            'interest_rate': interest_rate,
+            'total_interest': total_interest.to_decimal(),
+            'total_due': (principal + total_interest).to_decimal(),
+            'daily_payment': daily_payment.to_decimal()
         }
 
     def _determine_interest_rate(self, risk_score: Decimal) -> Decimal:
-        """Calcule le taux d'intérêt basé sur le risque"""
+        """Calcule le taux d'intérêt basé sur le risque, par paliers de 0,01%"""
         base_rate = Decimal(settings.BASE_INTEREST_RATE)  # 15% par défaut
         risk_adjustment = (Decimal('1') - risk_score) * Decimal('0.1')  # 0-10% ajustement
-        return max(
+        rate = max(
             min(base_rate + risk_adjustment, Decimal('0.3')),  # Plafond à 30%
             Decimal('0.05')  # Plancher à 5%
         )
+        # Précision de Loan.interest_rate (pourcentage à deux décimales)
+        return rate.quantize(RATE_TIER, rounding=ROUND_HALF_EVEN)
+
+    def quote_grid(
+        self,
+        amounts: Sequence[Decimal],
+        durations: Sequence[int],
+        client_risk_score: Decimal
+    ) -> Dict:
+        """
+        Calcule une grille d'offres (montants x durées) en un seul calcul vectorisé,
+        au palier de taux du client et avec les mêmes arrondis que calculate_loan_terms
+        Args:
+            amounts: Montants proposés
+            durations: Durées proposées en jours
+            client_risk_score: Score de risque client (0-1)
+        Returns:
+            Dict: Taux du client et matrices intérêts / total dû / paiement journalier,
+                  une ligne par montant et une colonne par durée
+        """
+        interest_rate = self._determine_interest_rate(Decimal(str(client_risk_score)))
+        grid = _price_grid(
+            str(interest_rate),
+            tuple(str(Decimal(str(a))) for a in amounts),
+            tuple(int(d) for d in durations)
+        )
+        # Grille en cache partagée entre les appels: matrices en tuples, dictionnaire copié
+        return dict(grid, risk_score=float(client_risk_score))
 
     def generate_payment_schedule(self, loan: Loan) -> List[Dict]:
         """Génère le calendrier de paiement pour un prêt"""
         if not loan.start_date:
             raise ValueError("Date de début non définie")
 
-        schedule = []
-        daily_amount = loan.total_due / Decimal(loan.duration_days)
-        remaining_balance = loan.total_due
+        if loan.schedule_rule:
+            rule = ScheduleRule.from_dict(loan.schedule_rule)
+        else:
+            rule = ScheduleRule.from_loan(loan)
 
-        for day in range(1, loan.duration_days + 1):
-            due_date = loan.start_date + timedelta(days=day)
-            remaining_balance -= daily_amount
+        # Solde courant tenu en centimes entiers, converti en Decimal en sortie seulement
+        schedule = []
+        remaining = rule.total.cents
+        for number, due_date, amount in rule.expand():
+            remaining -= amount.cents
             schedule.append({
-                'day_number': day,
-                'due_date': due_date.strftime('%Y-%m-%d'),
-                'amount_due': daily_amount.quantize(Decimal('.01')),
-                'remaining_balance': max(remaining_balance, Decimal('0')).quantize(Decimal('.01'))
+                'day_number': number * rule.step,
+                'due_date': due_date.isoformat(),
+                'amount_due': amount.to_decimal(),
+                'remaining_balance': Money(remaining).to_decimal()
             })
 
         return schedule
 
+    def forecast_collections(
+        self,
+        as_of: Optional[date] = None,
+        horizon_days: int = 30,
+        granularity: str = 'daily'
+    ) -> Dict:
+        """
+        Prévoit les encaissements attendus sur l'ensemble des prêts actifs
+        Args:
+            as_of: Date de début (par défaut aujourd'hui)
+            horizon_days: Nombre de jours couverts par la prévision
+            granularity: 'daily' ou 'weekly'
+        Returns:
+            Dict: Encaissements attendus par période
+        """
+        as_of = as_of or datetime.utcnow().date()
+        forecaster = PortfolioForecaster(horizon_days, granularity)
+
+        with get_db() as db:
+            rows = (
+                db.query(
+                    Loan.amount,
+                    Loan.interest_rate,
+                    Loan.duration_days,
+                    Loan.start_date,
+                    Loan.schedule_rule,
+                    func.coalesce(Loan.paid_principal, 0) + func.coalesce(Loan.paid_interest, 0)
+                )
+                .filter(Loan.status == 'APPROVED', Loan.start_date.isnot(None))
+                .all()
+            )
+
+        if not rows:
+            return forecaster.forecast(as_of, *([np.zeros(0)] * 6))
+
+        amounts, rates, durations, start_dates, rules, paid_totals = zip(*rows)
+        # Mêmes dates d'échéance que les échéances persistées par InstallmentService
+        starts, steps = zip(*(ScheduleRule.timing(rule, start) for rule, start in zip(rules, start_dates)))
+        start_offset = np.array(
+            [(d - as_of).days for d in starts], dtype=np.int64
+        )
+
+        return forecaster.forecast(
+            as_of,
+            amount=np.array(amounts, dtype=np.float64),
+            interest_rate=np.array(rates, dtype=np.float64),
+            duration_days=np.array(durations, dtype=np.int64),
+            start_offset=start_offset,
+            step=np.array(steps, dtype=np.int64),
+            paid=np.array(paid_totals, dtype=np.float64)
+        )
+
     def record_payment(
         self,
         loan_id: str,
@@ -80,27 +174,24 @@ class LoanService:
     ) -> Dict:
         """Enregistre un paiement et met à jour le prêt"""
         with get_db() as db:
-            loan = db.query(Loan).filter_by(id=loan_id).first()
+            loan = LoanLedger.lock(db, loan_id)
             if not loan:
                 raise ValueError("Prêt non trouvé")
 
+            # Imputation en cascade; le prêt passe à PAID s'il est complètement remboursé
+            allocation, = LoanLedger.post_payments(db, loan, [amount])
             payment = Payment(
                 id=str(uuid.uuid4()),
                 loan_id=loan.id,
                 amount=amount,
                 payment_method=payment_method,
                 receipt_number=receipt_number,
-                payment_date=datetime.utcnow()
+                payment_date=datetime.utcnow(),
+                **allocation.as_columns()
             )
 
             db.add(payment)
             loan.last_payment_date = payment.payment_date
-
-            # Vérifier si le prêt est complètement remboursé
-            if self._calculate_remaining_balance(loan) <= Decimal('0'):
-                loan.status = 'PAID'
-                loan.end_date = datetime.utcnow()
-
             db.commit()
 
             return {
@@ -110,9 +201,8 @@ class LoanService:
             }
 
     def _calculate_remaining_balance(self, loan: Loan) -> Decimal:
-        """Calcule le solde restant d'un prêt"""
-        total_paid = sum(p.amount for p in loan.payments)
-        return max(loan.total_due - total_paid, Decimal('0'))
+        """Solde restant d'un prêt, lu depuis les totaux maintenus par LoanLedger (repli si non encore calculés)"""
+        return loan.get_current_balance()
 
     def calculate_penalties(self, loan: Loan, as_of_date: datetime = None) -> Dict:
         """Calcule les pénalités de retard pour un prêt"""
@@ -136,7 +226,8 @@ class LoanService:
             }
 
         days_late = (as_of_date - due_date).days - self.grace_period
-        penalty_amount = (loan.total_due * self.penalty_rate * days_late).quantize(Decimal('.01'))
+        # Montant accru chaque nuit par PenaltyAccrualEngine (registre penalty_entries)
+        penalty_amount = (loan.accrued_penalties or Decimal('0')).quantize(Decimal('.01'))
 
         return {
             'days_late': days_late,
@@ -145,27 +236,134 @@ class LoanService:
             'total_due_with_penalty': (loan.total_due + penalty_amount).quantize(Decimal('.01'))
         }
 
-    def client_loan_history(self, client_id: str) -> Dict:
-        """Récupère l'historique complet des prêts d'un client"""
+    def client_loan_history(self, client_id: str, limit: int = 20, cursor: Optional[str] = None) -> Dict:
+        """
+        Récupère l'historique des prêts d'un client, page par page
+        Args:
+            client_id: Identifiant du client
+            limit: Nombre de prêts par page
+            cursor: Curseur renvoyé par la page précédente (next_cursor)
+        Returns:
+            Dict: Totaux par prêt (lus depuis les totaux LoanLedger) et curseur suivant
+        """
         with get_db() as db:
-            client = db.query(Client).filter_by(id=client_id).first()
+            active_loans = (
+                db.query(func.count(Loan.id))
+                .filter(Loan.client_id == Client.id, Loan.status == 'APPROVED')
+                .scalar_subquery()
+            )
+            client = db.query(Client.id, Client.credit_score, active_loans.label('active_loans')).filter(
+                Client.id == client_id
+            ).first()
             if not client:
-                raise ValueError("Client non trouvé")
-
-            loans = []
-            for loan in client.loans:
-                loans.append({
-                    'id': loan.id,
-                    'amount': float(loan.amount),
-                    'status': loan.status,
-                    'start_date': loan.start_date.strftime('%Y-%m-%d') if loan.start_date else None,
-                    'total_paid': float(sum(p.amount for p in loan.payments)),
-                    'remaining_balance': float(self._calculate_remaining_balance(loan))
-                })
+                raise ClientNotFound("Client non trouvé")
 
-            return {
-                'client_id': client.id,
-                'credit_score': float(client.credit_score),
-                'active_loans': len([l for l in loans if l['status'] == 'APPROVED']),
-                'loan_history': loans
-            }
+            payments = (
+                db.query(
+                    Payment.loan_id,
+                    func.count(Payment.id).label('payments_count'),
+                    func.max(Payment.payment_date).label('last_payment_date')
+                )
+                .join(Loan, Loan.id == Payment.loan_id)
+                .filter(Loan.client_id == client_id)
+                .group_by(Payment.loan_id)
+                .subquery()
+            )
+            query = (
+                db.query(
+                    Loan,
+                    func.coalesce(payments.c.payments_count, 0).label('payments_count'),
+                    payments.c.last_payment_date
+                )
+                .outerjoin(payments, payments.c.loan_id == Loan.id)
+                .filter(Loan.client_id == client_id)
+            )
+            if cursor:
+                created_at, loan_id = _decode_cursor(cursor)
+                query = query.filter(tuple_(Loan.created_at, Loan.id) < tuple_(created_at, loan_id))
+            rows = query.order_by(Loan.created_at.desc(), Loan.id.desc()).limit(limit + 1).all()
+
+        page = rows[:limit]
+        loans = [{
+            'id': str(row.Loan.id),
+            'amount': float(row.Loan.amount),
+            'status': row.Loan.status,
+            'start_date': row.Loan.start_date.strftime('%Y-%m-%d') if row.Loan.start_date else None,
+            'total_paid': float(LoanLedger.total_paid(row.Loan)),
+            'remaining_balance': float(self._calculate_remaining_balance(row.Loan)),
+            'payments_count': row.payments_count,
+            'last_payment_date': row.last_payment_date.isoformat() if row.last_payment_date else None
+        } for row in page]
+
+        return {
+            'client_id': str(client.id),
+            'credit_score': float(client.credit_score),
+            'active_loans': client.active_loans,
+            'loan_history': loans,
+            'next_cursor': _encode_cursor(page[-1].Loan) if len(rows) > limit else None
+        }
+
+
+def _encode_cursor(row) -> str:
+    """Curseur opaque (created_at, id) du dernier prêt de la page"""
+    return base64.urlsafe_b64encode(f"{row.created_at.isoformat()}|{row.id}".encode()).decode()
+
+
+def _decode_cursor(cursor: str):
+    try:
+        created_at, loan_id = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+        return datetime.fromisoformat(created_at), loan_id
+    except (ValueError, UnicodeDecodeError):
+        raise InvalidCursor("Curseur de pagination invalide")
+
+
+def _loan_terms(principal: Money, interest_rate: Decimal, duration_days: int):
+    """Intérêts totaux et paiement journalier (arrondi bancaire au centime)"""
+    interest_factor = Fraction(interest_rate) * duration_days / 365
+    total_interest = principal.scale(interest_factor, ROUND_HALF_EVEN)
+    daily_payment = principal.scale((1 + interest_factor) / duration_days, ROUND_HALF_EVEN)
+    return total_interest, daily_payment
+
+
+@lru_cache(maxsize=1024)
+def _price_grid(interest_rate: str, amounts: tuple, durations: tuple) -> Dict:
+    """
+    Grille de prix mise en cache par palier de taux, calculée en centimes entiers
+    sur toute la grille à la fois (mêmes arrondis exacts que _loan_terms)
+    """
+    rate = Fraction(Decimal(interest_rate))
+    cents = [Money.from_decimal(Decimal(a), ROUND_HALF_EVEN).cents for a in amounts]
+    # Entiers Python au-delà de la plage int64 (montants hors normes)
+    largest = max(cents) * (365 * rate.denominator + rate.numerator * max(durations))
+    dtype = np.int64 if largest < 2 ** 62 else object
+    principal = np.array(cents, dtype=dtype)[:, None]
+    duration = np.array(durations, dtype=dtype)[None, :]
+
+    # intérêts = P * r * d / 365 et paiement journalier = P * (1 + r * d / 365) / d
+    denominator = 365 * rate.denominator
+    total_interest = round_half_even_div(principal * duration * rate.numerator, denominator)
+    daily_payment = round_half_even_div(
+        principal * (denominator + rate.numerator * duration), denominator * duration
+    )
+
+    def to_htg(matrix) -> tuple:
+        return tuple(tuple(c / 100 for c in row) for row in matrix.tolist())
+
+    return {
+        'interest_rate': float(interest_rate),
+        'amounts': tuple(c / 100 for c in cents),
+        'durations': durations,
+        'total_interest': to_htg(total_interest),
+        'total_due': to_htg(principal + total_interest),
+        'daily_payment': to_htg(daily_payment)
+    }
+
+
+class ClientNotFound(ValueError):
+    """Client inconnu"""
+    pass
+
+
+class InvalidCursor(ValueError):
+    """Curseur de pagination illisible"""
+    pass
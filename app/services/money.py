@@ -0,0 +1,132 @@
+# KREDILAKAY/app/services/money.py
+from decimal import Decimal, ROUND_DOWN, ROUND_HALF_DOWN, ROUND_HALF_EVEN, ROUND_HALF_UP
+from fractions import Fraction
+from functools import total_ordering
+from typing import Tuple, Union
+
+CENTS_PER_UNIT = 100
+DEFAULT_ROUNDING = ROUND_HALF_UP
+
+
+def round_fraction(value: Fraction, rounding: str = DEFAULT_ROUNDING) -> int:
+    """Arrondit un rationnel exact à l'entier selon la règle Decimal indiquée"""
+    sign = -1 if value < 0 else 1
+    quotient, remainder = divmod(abs(value.numerator), value.denominator)
+    twice = 2 * remainder
+
+    if rounding == ROUND_DOWN or remainder == 0:
+        pass
+    elif rounding == ROUND_HALF_UP:
+        quotient += twice >= value.denominator
+    elif rounding == ROUND_HALF_DOWN:
+        quotient += twice > value.denominator
+    elif rounding == ROUND_HALF_EVEN:
+        quotient += twice > value.denominator or (twice == value.denominator and quotient % 2 == 1)
+    else:
+        raise ValueError(f"Règle d'arrondi non supportée: {rounding}")
+
+    return sign * quotient
+
+
+def round_half_even_div(numerator, denominator):
+    """
+    Quotient entier de numérateurs positifs, arrondi au plus proche avec égalités vers
+    le pair. Opère aussi élément par élément sur des tableaux NumPy d'entiers.
+    """
+    quotient = numerator // denominator
+    twice = 2 * (numerator - quotient * denominator)
+    return quotient + ((twice > denominator) | ((twice == denominator) & (quotient % 2 == 1)))
+
+
+@total_ordering
+class Money:
+    """
+    Montant en HTG stocké en centimes entiers.
+    Les conversions Decimal <-> Money se font à la frontière ORM (Numeric(12, 2)),
+    les calculs internes restent en entiers avec des règles d'arrondi explicites.
+    """
+
+    __slots__ = ('cents',)
+
+    def __init__(self, cents: int = 0):
+        self.cents = int(cents)
+
+    @classmethod
+    def from_decimal(cls, value: Union[Decimal, int, str, float], rounding: str = DEFAULT_ROUNDING) -> 'Money':
+        """Convertit un montant Decimal (colonne Numeric) en centimes"""
+        if isinstance(value, float):
+            value = Decimal(str(value))
+        cents = (Decimal(value) * CENTS_PER_UNIT).quantize(Decimal('1'), rounding=rounding)
+        return cls(int(cents))
+
+    def to_decimal(self) -> Decimal:
+        """Montant Decimal à deux décimales pour l'ORM"""
+        return Decimal(self.cents).scaleb(-2)
+
+    def __float__(self) -> float:
+        return self.cents / CENTS_PER_UNIT
+
+    def scale(self, factor: Union[Decimal, Fraction, int, str], rounding: str = DEFAULT_ROUNDING) -> 'Money':
+        """Multiplie par un taux ou un ratio, avec un seul arrondi exact au centime"""
+        if isinstance(factor, str):
+            factor = Decimal(factor)
+        return Money(round_fraction(self.cents * Fraction(factor), rounding))
+
+    def prorate(self, numerator: 'Money', denominator: 'Money', rounding: str = DEFAULT_ROUNDING) -> 'Money':
+        """Part de ce montant correspondant au ratio numerator / denominator"""
+        if not denominator.cents:
+            return Money(0)
+        return Money(round_fraction(Fraction(self.cents * numerator.cents, denominator.cents), rounding))
+
+    def split(self, parts: int) -> Tuple['Money', 'Money']:
+        """Répartit en `parts` montants égaux; retourne (montant unitaire, reliquat)"""
+        base = self.cents // parts
+        return Money(base), Money(self.cents - base * parts)
+
+    def __add__(self, other):
+        if isinstance(other, Money):
+            return Money(self.cents + other.cents)
+        if other == 0:
+            return self
+        return NotImplemented
+
+    __radd__ = __add__
+
+    def __sub__(self, other: 'Money') -> 'Money':
+        return Money(self.cents - other.cents)
+
+    def __neg__(self) -> 'Money':
+        return Money(-self.cents)
+
+    def __mul__(self, count: int) -> 'Money':
+        if not isinstance(count, int):
+            return NotImplemented
+        return Money(self.cents * count)
+
+    __rmul__ = __mul__
+
+    def __eq__(self, other):
+        if isinstance(other, Money):
+            return self.cents == other.cents
+        if other == 0:
+            return self.cents == 0
+        return NotImplemented
+
+    def __lt__(self, other):
+        if isinstance(other, Money):
+            return self.cents < other.cents
+        if other == 0:
+            return self.cents < 0
+        return NotImplemented
+
+    def __hash__(self):
+        return hash(self.cents)
+
+    def __bool__(self):
+        return self.cents != 0
+
+    def __repr__(self):
+        return f"Money('{self.to_decimal()}')"
+
+    def __str__(self):
+        return f"{self.to_decimal()} HTG"
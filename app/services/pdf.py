@@ -1,31 +1,22 @@
 import io
 from reportlab.lib.pagesizes import letter
 from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
-from reportlab.lib.styles import getSampleStyleSheet
 from reportlab.lib.units import inch
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
-from flask import current_app
-import os
+from app.services.pdf_assets import pdf_assets
+from app.services.pdf_render import get_pdf_renderer
 
 class PDFService:
-    @staticmethod
-    def _register_fonts():
-        fonts_path = os.path.join(current_app.root_path, 'static/fonts')
-        try:
-            pdfmetrics.registerFont(TTFont('Roboto', os.path.join(fonts_path, 'Roboto-Regular.ttf')))
-            pdfmetrics.registerFont(TTFont('Roboto-Bold', os.path.join(fonts_path, 'Roboto-Bold.ttf')))
-        except:
-            current_app.logger.warning("Polices non chargées, fallback en cours")
-
     @classmethod
     def generate_loan_contract(cls, contract_data):
+        """Contrat simple, rendu par le pool de rendu PDF du processus"""
+        return get_pdf_renderer().render('loan_contract', contract_data)
+
+    @classmethod
+    def render_loan_contract(cls, contract_data):
         buffer = io.BytesIO()
         doc = SimpleDocTemplate(buffer, pagesize=letter)
-        cls._register_fonts()
-        styles = getSampleStyleSheet()
-        styles['Normal'].fontName = 'Roboto'
-        styles['Title'].fontName = 'Roboto-Bold'
+        # Polices et styles chargés une fois par processus
+        styles = pdf_assets.stylesheet('roboto')
         
         story = []
         story.append(Paragraph("CONTRAT DE PRÊT", styles['Title']))
@@ -0,0 +1,150 @@
+# KREDILAKAY/app/services/pdf_assets.py
+import os
+import threading
+from io import BytesIO
+from typing import Callable, Dict, Optional
+from reportlab.lib.enums import TA_CENTER
+from reportlab.lib.styles import ParagraphStyle, StyleSheet1, getSampleStyleSheet
+from reportlab.lib.utils import ImageReader
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from config import settings
+import logging
+
+FONTS = {
+    'Roboto': 'Roboto-Regular.ttf',
+    'Roboto-Bold': 'Roboto-Bold.ttf'
+}
+# app/static/fonts, comme current_app.root_path: aussi valable hors contexte Flask (pool de rendu)
+FONTS_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'static', 'fonts')
+
+
+def _default_styles() -> StyleSheet1:
+    return getSampleStyleSheet()
+
+
+def _roboto_styles() -> StyleSheet1:
+    """Styles du contrat simple (PDFService), en Roboto si la police est chargée"""
+    styles = getSampleStyleSheet()
+    if pdf_assets.fonts_loaded:
+        styles['Normal'].fontName = 'Roboto'
+        styles['Title'].fontName = 'Roboto-Bold'
+    return styles
+
+
+def _contract_styles() -> StyleSheet1:
+    """Styles du contrat détaillé (pdf_utils.PDFGenerator)"""
+    styles = getSampleStyleSheet()
+    styles.add(ParagraphStyle(
+        name='Kreyol',
+        fontName='Helvetica',
+        fontSize=10,
+        leading=12,
+        spaceAfter=6
+    ))
+    # 'Title' existe déjà dans la feuille d'exemple: on l'ajuste au lieu de l'ajouter
+    title = styles['Title']
+    title.fontName = 'Helvetica-Bold'
+    title.fontSize = 14
+    title.alignment = TA_CENTER
+    title.spaceAfter = 12
+    return styles
+
+
+STYLESHEETS: Dict[str, Callable[[], StyleSheet1]] = {
+    'default': _default_styles,
+    'roboto': _roboto_styles,
+    'contract': _contract_styles
+}
+
+
+class PDFAssets:
+    """
+    Ressources partagées de génération PDF, chargées une fois par processus:
+    polices TTF enregistrées dans pdfmetrics, feuilles de styles, logos.
+    Les feuilles de styles et images retournées sont partagées entre requêtes
+    et threads: elles ne doivent pas être modifiées par les appelants.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._fonts_loaded: Optional[bool] = None
+        self._stylesheets: Dict[str, StyleSheet1] = {}
+        self._images: Dict[str, Optional[ImageReader]] = {}
+        self._raw: Dict[str, Optional[bytes]] = {}
+
+    @property
+    def fonts_loaded(self) -> bool:
+        """Enregistre les polices au premier appel; False si elles sont introuvables"""
+        if self._fonts_loaded is None:
+            with self._lock:
+                if self._fonts_loaded is None:
+                    self._fonts_loaded = self._register_fonts()
+        return self._fonts_loaded
+
+    @staticmethod
+    def _register_fonts() -> bool:
+        registered = set(pdfmetrics.getRegisteredFontNames())
+        try:
+            for name, filename in FONTS.items():
+                if name not in registered:
+                    pdfmetrics.registerFont(TTFont(name, os.path.join(FONTS_PATH, filename)))
+            return True
+        except Exception:
+            logging.warning("Polices non chargées, fallback en cours")
+            return False
+
+    def stylesheet(self, name: str = 'default') -> StyleSheet1:
+        """Feuille de styles partagée (lecture seule)"""
+        styles = self._stylesheets.get(name)
+        if styles is None:
+            with self._lock:
+                styles = self._stylesheets.get(name)
+                if styles is None:
+                    styles = self._stylesheets[name] = STYLESHEETS[name]()
+        return styles
+
+    def image_bytes(self, path: str) -> Optional[bytes]:
+        """Contenu d'un fichier image, lu une seule fois (None s'il est absent)"""
+        if path not in self._raw:
+            with self._lock:
+                if path not in self._raw:
+                    try:
+                        with open(path, 'rb') as f:
+                            self._raw[path] = f.read()
+                    except OSError:
+                        logging.warning(f"Image PDF introuvable: {path}")
+                        self._raw[path] = None
+        return self._raw[path]
+
+    def image(self, path: str) -> Optional[ImageReader]:
+        """Image décodée pour canvas.drawImage, partagée (None si le fichier est absent)"""
+        if path not in self._images:
+            with self._lock:
+                if path not in self._images:
+                    reader, raw = None, self.image_bytes(path)
+                    if raw is not None:
+                        reader = ImageReader(BytesIO(raw))
+                        reader.getRGBData()  # Décodage fait une fois, les lectures suivantes sont en cache
+                    self._images[path] = reader
+        return self._images[path]
+
+    def logo(self) -> Optional[bytes]:
+        """Logo des contrats (PDF_LOGO_PATH)"""
+        return self.image_bytes(settings.PDF_LOGO_PATH)
+
+    def security_logo(self) -> Optional[ImageReader]:
+        """Logo des filigranes de sécurité (SECURITY_LOGO_PATH)"""
+        return self.image(settings.SECURITY_LOGO_PATH)
+
+    def warm(self):
+        """Charge toutes les ressources (démarrage du worker)"""
+        fonts = self.fonts_loaded
+        for name in STYLESHEETS:
+            self.stylesheet(name)
+        self.logo()
+        self.security_logo()
+        logging.info(f"Ressources PDF chargées (polices {'TTF' if fonts else 'de base'})")
+
+
+pdf_assets = PDFAssets()
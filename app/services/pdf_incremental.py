@@ -0,0 +1,211 @@
+# KREDILAKAY/app/services/pdf_incremental.py
+import hashlib
+import re
+import struct
+from io import BytesIO
+from typing import Dict, List, Optional, Tuple
+from PyPDF2 import PageObject, PdfReader, PdfWriter
+from PyPDF2.generic import (
+    ArrayObject, ByteStringObject, DecodedStreamObject, DictionaryObject, IndirectObject, NameObject,
+    NumberObject, PdfObject, StreamObject, create_string_object
+)
+import logging
+
+_STARTXREF = re.compile(rb"startxref\s+(\d+)")
+_OBJECT_HEADER = re.compile(rb"\s*\d+\s+\d+\s+obj")
+
+
+class IncrementalWriter:
+    """
+    Mise à jour incrémentale d'un PDF existant (ISO 32000-1, §7.5.6): les objets
+    ajoutés (calques, flux de contenu, dictionnaire /Info) et les pages modifiées
+    sont écrits à la suite des octets d'origine, avec une section de références
+    croisées chaînée à la précédente par /Prev. Les objets inchangés ne sont ni
+    relus ni réécrits, et les octets couverts par une signature restent identiques.
+
+    Si la table de références d'origine est inutilisable (fichier réparé par
+    PdfReader), le document est réécrit entièrement comme avec PdfWriter.
+    """
+
+    def __init__(self, pdf_bytes: bytes):
+        self.original = pdf_bytes
+        self.reader = PdfReader(BytesIO(pdf_bytes))
+        # /Size n'est pas repris dans le trailer par PdfReader pour les flux de références
+        known = [idnum for entries in self.reader.xref.values() for idnum in entries] + list(self.reader.xref_objStm)
+        self._size = max([int(self.reader.trailer.get('/Size', 0))] + [idnum + 1 for idnum in known])
+        self._objects: Dict[int, Tuple[PdfObject, int]] = {}
+        self._imported: Dict[Tuple[int, int], IndirectObject] = {}
+        self._info: Optional[DictionaryObject] = None
+        self._startxref = self._find_startxref()
+        self.incremental = self._startxref is not None
+
+    def _find_startxref(self) -> Optional[int]:
+        """Position de la dernière section de références, si elle est cohérente"""
+        matches = list(_STARTXREF.finditer(self.original[-2048:]))
+        if not matches:
+            return None
+        offset = int(matches[-1].group(1))
+        head = self.original[offset:offset + 32]
+        if head.lstrip().startswith(b'xref') or _OBJECT_HEADER.match(head):
+            return offset
+        logging.warning("Table de références PDF incohérente: réécriture complète du document")
+        return None
+
+    @property
+    def pages(self) -> List[PageObject]:
+        return self.reader.pages
+
+    def get_object(self, indirect_reference: IndirectObject) -> PdfObject:
+        entry = self._objects.get(indirect_reference.idnum)
+        return entry[0] if entry else self.reader.get_object(indirect_reference)
+
+    def add_object(self, obj: PdfObject) -> IndirectObject:
+        """Ajoute un nouvel objet au document; retourne sa référence"""
+        ref = IndirectObject(self._size, 0, self)
+        self._size += 1
+        self._objects[ref.idnum] = (obj, 0)
+        obj.indirect_reference = ref
+        return ref
+
+    def update_page(self, page: PageObject):
+        """Page du document modifiée: seul son dictionnaire est réécrit"""
+        ref = page.indirect_reference
+        self._objects[ref.idnum] = (page, ref.generation)
+
+    def import_object(self, obj: PdfObject) -> PdfObject:
+        """
+        Copie dans le document un objet issu d'un autre PDF (calque en cache):
+        les objets indirects qu'il référence sont ajoutés une seule fois
+        """
+        if isinstance(obj, IndirectObject):
+            if obj.pdf is self or obj.pdf is self.reader:
+                return obj
+            key = (id(obj.pdf), obj.idnum)
+            ref = self._imported.get(key)
+            if ref is None:
+                ref = self._imported[key] = self.add_object(DictionaryObject())  # Numéro réservé (cycles)
+                copy = self.import_object(obj.get_object())
+                copy.indirect_reference = ref
+                self._objects[ref.idnum] = (copy, 0)
+            return ref
+        if isinstance(obj, StreamObject):
+            copy = obj.__class__()
+            copy._data = obj._data
+        elif isinstance(obj, DictionaryObject):
+            copy = DictionaryObject()
+        elif isinstance(obj, ArrayObject):
+            return ArrayObject(self.import_object(item) for item in obj)
+        else:
+            return obj
+        for key, value in obj.items():
+            copy[key] = self.import_object(value)
+        return copy
+
+    def add_metadata(self, infos: Dict[str, str]):
+        """Complète le dictionnaire /Info (écrit comme un nouvel objet)"""
+        if self._info is None:
+            self._info = DictionaryObject()
+            original = self.reader.trailer.get('/Info')
+            if original is not None:
+                original = original.get_object()
+                self._info.update({key: original[key] for key in original})
+        for key, value in infos.items():
+            self._info[NameObject(key)] = create_string_object(value)
+
+    def write(self) -> bytes:
+        """Document mis à jour: octets d'origine + mise à jour incrémentale"""
+        if not self.incremental:
+            return self._rewrite()
+
+        separator = b'' if self.original.endswith((b'\n', b'\r')) else b'\n'
+        base = len(self.original) + len(separator)  # Les positions de la mise à jour partent de là
+        out = BytesIO()
+
+        trailer = DictionaryObject({
+            NameObject('/Root'): self.reader.trailer.raw_get('/Root'),
+            NameObject('/Prev'): NumberObject(self._startxref)
+        })
+        if self._info is not None:
+            trailer[NameObject('/Info')] = self.add_object(self._info)
+        elif '/Info' in self.reader.trailer:
+            trailer[NameObject('/Info')] = self.reader.trailer.raw_get('/Info')
+
+        offsets: Dict[int, Tuple[int, int]] = {}
+        for idnum in sorted(self._objects):
+            obj, generation = self._objects[idnum]
+            offsets[idnum] = (base + out.tell(), generation)
+            out.write(f"{idnum} {generation} obj\n".encode())
+            obj.write_to_stream(out, None)
+            out.write(b"\nendobj\n")
+
+        # Premier identifiant conservé, second renouvelé à chaque révision
+        file_id = self.reader.trailer.get('/ID')
+        if file_id is not None:
+            revision = hashlib.md5(out.getvalue()).digest()
+            trailer[NameObject('/ID')] = ArrayObject([file_id[0], ByteStringObject(revision)])
+
+        if self.original[self._startxref:self._startxref + 32].lstrip().startswith(b'xref'):
+            self._write_xref_table(out, base, offsets, trailer)
+        else:
+            self._write_xref_stream(out, base, offsets, trailer)
+        return self.original + separator + out.getvalue()
+
+    @staticmethod
+    def _sections(numbers: List[int]) -> List[Tuple[int, int]]:
+        """Sous-sections (premier numéro, nombre) d'objets consécutifs"""
+        sections = []
+        for idnum in numbers:
+            if sections and sections[-1][0] + sections[-1][1] == idnum:
+                sections[-1][1] += 1
+            else:
+                sections.append([idnum, 1])
+        return [(start, count) for start, count in sections]
+
+    def _write_xref_table(self, out: BytesIO, base: int, offsets: Dict[int, Tuple[int, int]],
+                          trailer: DictionaryObject):
+        xref_offset = base + out.tell()
+        numbers = sorted(offsets)
+        out.write(b"xref\n")
+        for start, count in self._sections(numbers):
+            out.write(f"{start} {count}\n".encode())
+            for idnum in range(start, start + count):
+                offset, generation = offsets[idnum]
+                out.write(f"{offset:010d} {generation:05d} n\r\n".encode())
+        trailer[NameObject('/Size')] = NumberObject(self._size)
+        out.write(b"trailer\n")
+        trailer.write_to_stream(out, None)
+        out.write(f"\nstartxref\n{xref_offset}\n%%EOF\n".encode())
+
+    def _write_xref_stream(self, out: BytesIO, base: int, offsets: Dict[int, Tuple[int, int]],
+                           trailer: DictionaryObject):
+        """Fichier d'origine à flux de références (PDF 1.5+): la mise à jour suit le même format"""
+        xref = DecodedStreamObject()
+        xref_offset = base + out.tell()
+        idnum = self.add_object(xref).idnum
+        offsets[idnum] = (xref_offset, 0)
+
+        numbers = sorted(offsets)
+        xref.set_data(b"".join(struct.pack('>BIH', 1, *offsets[n]) for n in numbers))
+        xref.update(trailer)
+        xref.update({
+            NameObject('/Type'): NameObject('/XRef'),
+            NameObject('/Size'): NumberObject(self._size),
+            NameObject('/W'): ArrayObject([NumberObject(1), NumberObject(4), NumberObject(2)]),
+            NameObject('/Index'): ArrayObject(
+                NumberObject(v) for section in self._sections(numbers) for v in section
+            )
+        })
+        out.write(f"{idnum} 0 obj\n".encode())
+        xref.write_to_stream(out, None)
+        out.write(f"\nendobj\nstartxref\n{xref_offset}\n%%EOF\n".encode())
+
+    def _rewrite(self) -> bytes:
+        """Réécriture complète (fichier d'origine sans références exploitables)"""
+        writer = PdfWriter()
+        for page in self.reader.pages:
+            writer.add_page(page)
+        if self._info is not None:
+            writer.add_metadata(self._info)
+        out = BytesIO()
+        writer.write(out)
+        return out.getvalue()
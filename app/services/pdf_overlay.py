@@ -0,0 +1,123 @@
+# KREDILAKAY/app/services/pdf_overlay.py
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable
+from PyPDF2 import PageObject
+from PyPDF2.generic import (
+    ArrayObject, DecodedStreamObject, DictionaryObject, FloatObject, IndirectObject, NameObject, StreamObject
+)
+
+
+def page_to_form(page: PageObject) -> StreamObject:
+    """Convertit une page (modèle, filigrane) en Form XObject: contenu + ressources"""
+    content = DecodedStreamObject()
+    content.set_data(page.get_contents().get_data())
+    form = content.flate_encode()
+    form.update({
+        NameObject('/Type'): NameObject('/XObject'),
+        NameObject('/Subtype'): NameObject('/Form'),
+        NameObject('/BBox'): ArrayObject([FloatObject(v) for v in page.mediabox]),
+        NameObject('/Resources'): page['/Resources'].get_object()
+    })
+    return form
+
+
+def _stream(data: bytes) -> DecodedStreamObject:
+    stream = DecodedStreamObject()
+    stream.set_data(data)
+    return stream
+
+
+def stamp_page(
+    page: PageObject,
+    forms: Dict[NameObject, IndirectObject],
+    add_object: Callable[[StreamObject], IndirectObject],
+    over: bool = True
+) -> Dict[NameObject, NameObject]:
+    """
+    Peint des Form XObjects sur (ou sous) une page en ajoutant des flux à son
+    /Contents: les flux existants ne sont ni décodés ni réanalysés (contrairement
+    à PageObject.merge_page)
+    Args:
+        page: Page modifiée en place
+        forms: Formulaires à peindre, dans l'ordre (nom -> référence dans le document)
+        add_object: Enregistre un nouvel objet dans le document (PdfWriter._add_object,
+            IncrementalWriter.add_object)
+        over: Au-dessus du contenu existant (filigrane) ou en dessous (modèle de contrat)
+    Returns:
+        Dict: Noms effectivement utilisés, renommés s'ils existaient déjà sur la page
+    """
+    # Ressources copiées: l'original peut être partagé entre plusieurs pages
+    resources = page.get('/Resources')
+    resources = DictionaryObject(resources.get_object()) if resources is not None else DictionaryObject()
+    xobjects = resources.get('/XObject')
+    xobjects = DictionaryObject(xobjects.get_object()) if xobjects is not None else DictionaryObject()
+
+    names = {}
+    for name, ref in forms.items():
+        used = name
+        while used in xobjects:  # Document déjà filigrané: l'ancien calque est conservé
+            used = NameObject(used + '_')
+        xobjects[used] = ref
+        names[name] = used
+    resources[NameObject('/XObject')] = xobjects
+    page[NameObject('/Resources')] = resources
+
+    # Les calques sont dessinés dans le repère de la page, même si sa MediaBox ne part pas de (0, 0)
+    box = page.mediabox
+    shift = f"1 0 0 1 {box.left} {box.bottom} cm ".encode() if (box.left, box.bottom) != (0, 0) else b""
+    layer = add_object(_stream(b"".join(b"q " + shift + used.encode() + b" Do Q\n" for used in names.values())))
+
+    contents = page.get('/Contents')
+    if contents is None:
+        layers = []
+    elif isinstance(contents.get_object(), ArrayObject):
+        layers = list(contents.get_object())
+    else:
+        layers = [page.raw_get('/Contents')]
+
+    if over:
+        # État graphique du contenu existant isolé: le calque part de l'état initial
+        page[NameObject('/Contents')] = ArrayObject(
+            [add_object(_stream(b"q\n"))] + layers + [add_object(_stream(b"Q\n")), layer]
+        )
+    else:
+        page[NameObject('/Contents')] = ArrayObject([layer] + layers)
+    return names
+
+
+class OverlayCache:
+    """
+    Calques PDF déjà construits (Form XObjects), conservés par processus et
+    évincés au-delà de `maxsize` (LRU). Les calques retournés sont partagés:
+    les appelants les clonent dans leur document sans les modifier.
+    """
+
+    def __init__(self, maxsize: int = 32):
+        self.maxsize = maxsize
+        self._overlays: 'OrderedDict[Hashable, StreamObject]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, build: Callable[[], StreamObject]) -> StreamObject:
+        """Calque associé à `key`, construit par `build` s'il n'est pas en cache"""
+        with self._lock:
+            overlay = self._overlays.get(key)
+            if overlay is not None:
+                self._overlays.move_to_end(key)
+                self.hits += 1
+                return overlay
+            self.misses += 1
+
+        overlay = build()
+        with self._lock:
+            self._overlays[key] = overlay
+            self._overlays.move_to_end(key)
+            while len(self._overlays) > self.maxsize:
+                self._overlays.popitem(last=False)
+        return overlay
+
+    def clear(self):
+        with self._lock:
+            self._overlays.clear()
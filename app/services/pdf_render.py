@@ -0,0 +1,223 @@
+# KREDILAKAY/app/services/pdf_render.py
+import atexit
+import importlib
+import multiprocessing
+import os
+import signal
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, Optional, Tuple
+from config import settings
+import logging
+
+# Travaux de rendu acceptés: nom -> (module, classe, méthode). La classe est
+# instanciée une fois par processus du pool; arguments et résultat sont picklés.
+# Les méthodes publiques de ces classes (generate_contract, apply_watermark...)
+# soumettent le travail; la méthode listée ici fait le rendu lui-même.
+JOBS: Dict[str, Tuple[str, str, str]] = {
+    'loan_contract': ('app.services.pdf', 'PDFService', 'render_loan_contract'),
+    'contract': ('app.services.pdf_utils', 'PDFGenerator', 'render_contract'),
+    'html': ('app.pdf_services.generators', 'PDFGenerator', 'convert_html'),
+    'watermark': ('app.services.pdf_watermark', 'PDFWatermarker', 'render_watermark'),
+    'penalty_watermark': ('app.services.penalty', 'PDFWatermarker', 'render_penalty_watermark')
+}
+
+_instances: Dict[Tuple[str, str], Any] = {}
+
+
+class PDFRenderError(Exception):
+    """Échec du service de rendu PDF"""
+    pass
+
+
+class PDFRenderBusy(PDFRenderError):
+    """File de rendu pleine: la demande est refusée plutôt que mise en attente"""
+    pass
+
+
+class PDFRenderTimeout(PDFRenderError):
+    """Rendu non terminé dans le délai imparti"""
+    pass
+
+
+def _warm():
+    """Polices, styles, logos et modèle de contrat chargés avant le premier rendu"""
+    from app.services.contract_template import get_contract_template
+    from app.services.pdf_assets import pdf_assets
+
+    pdf_assets.warm()
+    get_contract_template()
+
+
+def _init_worker():
+    """Initialisation d'un processus du pool"""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # L'arrêt est piloté par le processus parent
+    signal.signal(signal.SIGALRM, _expired)
+    _warm()
+
+
+def _expired(signum, frame):
+    raise PDFRenderTimeout("Délai de rendu dépassé")
+
+
+def _run_job(job: str, args: tuple, kwargs: dict, time_limit: Optional[float] = None):
+    """
+    Exécute un travail de rendu (dans un processus du pool, ou en ligne)
+    Args:
+        job: Nom du travail (clé de JOBS)
+        time_limit: Durée maximale en secondes; le rendu est interrompu au-delà
+    Returns:
+        Résultat de la méthode, les flux BytesIO étant convertis en bytes
+    """
+    module, cls, method = JOBS[job]
+    instance = _instances.get((module, cls))
+    if instance is None:
+        instance = _instances[module, cls] = getattr(importlib.import_module(module), cls)()
+
+    if time_limit:
+        signal.setitimer(signal.ITIMER_REAL, time_limit)
+    try:
+        result = getattr(instance, method)(*args, **kwargs)
+    finally:
+        if time_limit:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+    return result.getvalue() if hasattr(result, 'getvalue') else result
+
+
+def _ready() -> int:
+    """Travail vide: force le démarrage (et donc le préchauffage) d'un processus"""
+    return os.getpid()
+
+
+class PDFRenderService:
+    """
+    Rendu PDF (ReportLab, PyPDF2, xhtml2pdf) dans un pool de processus borné, hors
+    des workers gevent: un contrat volumineux ne bloque plus les autres greenlets.
+    Au-delà de `max_pending` rendus en cours ou en attente, les demandes sont
+    refusées (PDFRenderBusy) après `queue_timeout` secondes au lieu de s'accumuler.
+    Avec workers=0, les rendus sont exécutés dans le processus appelant.
+    """
+
+    def __init__(self, workers: int = 2, max_pending: int = 16, timeout: float = 30, queue_timeout: float = 2.0):
+        self.workers = workers
+        self.timeout = timeout
+        self.queue_timeout = queue_timeout
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def _pool(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.workers,
+                        mp_context=multiprocessing.get_context('spawn'),
+                        initializer=_init_worker
+                    )
+        return self._executor
+
+    def _reset(self, executor: ProcessPoolExecutor):
+        """Remplace un pool cassé (processus tué, mémoire épuisée)"""
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def start(self):
+        """Démarre les processus du pool et attend qu'ils soient préchauffés"""
+        if not self.workers:
+            _warm()
+            return
+        pool = self._pool()
+        for future in [pool.submit(_ready) for _ in range(self.workers)]:
+            future.result()
+        logging.info(f"Pool de rendu PDF prêt: {self.workers} processus")
+
+    def submit(self, job: str, *args, timeout: Optional[float] = None, **kwargs) -> Future:
+        """
+        Planifie un rendu sans attendre son résultat
+        Args:
+            job: Nom du travail (clé de JOBS)
+            timeout: Durée maximale du rendu (par défaut PDF_RENDER_TIMEOUT)
+        Returns:
+            Future: Résultat du rendu (bytes)
+        Raises:
+            PDFRenderBusy: File pleine pendant plus de queue_timeout secondes
+        """
+        if job not in JOBS:
+            raise ValueError(f"Travail de rendu inconnu: {job}")
+        timeout = timeout or self.timeout
+
+        if not self.workers:
+            future = Future()
+            try:
+                future.set_result(_run_job(job, args, kwargs))
+            except Exception as e:
+                future.set_exception(e)
+            return future
+
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            raise PDFRenderBusy("File de rendu PDF pleine")
+        pool = self._pool()
+        try:
+            future = pool.submit(_run_job, job, args, kwargs, timeout)
+        except BrokenProcessPool:
+            self._slots.release()
+            self._reset(pool)
+            raise PDFRenderError("Pool de rendu PDF indisponible, il sera recréé")
+        except Exception:
+            self._slots.release()
+            raise
+        # La place est libérée à la fin réelle du rendu, même si l'appelant a cessé d'attendre
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def render(self, job: str, *args, timeout: Optional[float] = None, **kwargs) -> bytes:
+        """
+        Rendu bloquant pour l'appelant seul: sous gevent, l'attente cède la main
+        aux autres greenlets pendant que le pool travaille
+        Raises:
+            PDFRenderBusy: File pleine
+            PDFRenderTimeout: Rendu non terminé dans le délai
+        """
+        timeout = timeout or self.timeout
+        future = self.submit(job, *args, timeout=timeout, **kwargs)
+        try:
+            # Marge pour l'attente d'un processus libre et le transfert du résultat
+            return future.result(timeout=timeout + (self.queue_timeout or 0))
+        except FutureTimeout:
+            future.cancel()
+            raise PDFRenderTimeout(f"Rendu '{job}' non terminé en {timeout:.0f}s")
+        except BrokenProcessPool:
+            if self._executor is not None:
+                self._reset(self._executor)
+            raise PDFRenderError(f"Processus de rendu interrompu pendant '{job}'")
+
+    def shutdown(self):
+        """Arrête le pool en laissant finir les rendus en cours"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+
+_renderer = None
+_renderer_lock = threading.Lock()
+
+
+def get_pdf_renderer() -> PDFRenderService:
+    """Service de rendu du processus, créé au premier usage (après le fork des workers)"""
+    global _renderer
+    if _renderer is None:
+        with _renderer_lock:
+            if _renderer is None:
+                _renderer = PDFRenderService(
+                    workers=settings.PDF_RENDER_WORKERS,
+                    max_pending=settings.PDF_RENDER_MAX_PENDING,
+                    timeout=settings.PDF_RENDER_TIMEOUT,
+                    queue_timeout=settings.PDF_RENDER_QUEUE_SECONDS
+                )
+                atexit.register(_renderer.shutdown)
+    return _renderer
@@ -1,47 +1,29 @@
 # KREDILAKAY/app/services/pdf_utils.py
 from io import BytesIO
-from PyPDF2 import PdfWriter, PdfReader
-from reportlab.lib.pagesizes import letter
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Image
-from reportlab.lib.units import inch
 from reportlab.lib import colors
+from reportlab.lib.pagesizes import letter
+from reportlab.pdfgen import canvas
 import qrcode
 import hashlib
-from datetime import datetime
 from pathlib import Path
 from app.database import get_db
+from app.services.contract_template import get_contract_template
+from app.services.pdf_assets import pdf_assets
+from app.services.pdf_render import get_pdf_renderer
 from config import settings
-from typing import Optional, Tuple
+from typing import Callable, Optional, Tuple
 import logging
 
 class PDFGenerator:
     """Générateur de documents PDF sécurisés pour KrediLakay"""
 
-    def __init__(self):
-        self.styles = self._init_styles()
+    def __init__(self, renderer=None):
+        self.styles = pdf_assets.stylesheet('contract')
         self.logo_path = Path(settings.PDF_LOGO_PATH)
         self.font_dir = Path(settings.FONT_DIR)
         self.watermark_text = settings.WATERMARK_TEXT
-
-    def _init_styles(self):
-        """Initialise les styles ReportLab"""
-        styles = getSampleStyleSheet()
-        styles.add(ParagraphStyle(
-            name='Kreyol',
-            fontName='Helvetica',
-            fontSize=10,
-            leading=12,
-            spaceAfter=6
-        ))
-        styles.add(ParagraphStyle(
-            name='Title',
-            fontName='Helvetica-Bold',
-            fontSize=14,
-            alignment=1,
-            spaceAfter=12
-        ))
-        return styles
+        # Service de rendu (pdf_render): le rendu quitte le worker web
+        self.renderer = renderer or get_pdf_renderer()
 
     def generate_contract(
         self,
@@ -50,7 +32,22 @@ class PDFGenerator:
         signature_img: Optional[bytes] = None
     ) -> BytesIO:
         """
-        Génère un contrat PDF professionnel
+        Génère un contrat PDF dans le pool de rendu (voir render_contract)
+        Returns:
+            BytesIO: Flux PDF en mémoire
+        """
+        return BytesIO(self.renderer.render('contract', loan_data, client_data, signature_img))
+
+    def render_contract(
+        self,
+        loan_data: dict,
+        client_data: dict,
+        signature_img: Optional[bytes] = None
+    ) -> BytesIO:
+        """
+        Génère un contrat PDF professionnel à partir du modèle précompilé:
+        métadonnées, champs client et prêt et QR code de vérification sont posés
+        sur un seul canvas, écrit directement (sans relecture PdfReader/PdfWriter)
         Args:
             loan_data: Données du prêt (montant, durée, etc.)
             client_data: Info client (nom, photo, etc.)
@@ -58,161 +55,68 @@ class PDFGenerator:
         Returns:
             BytesIO: Flux PDF en mémoire
         """
+        loan_id = loan_data['id']
         buffer = BytesIO()
-        doc = SimpleDocTemplate(
-            buffer,
-            pagesize=letter,
-            title=f"Contrat KrediLakay {loan_data['id']}",
-            author="Système KrediLakay"
-        )
-
-        story = []
-        self._add_cover_page(story, client_data, loan_data)
-        self._add_terms(story, loan_data)
-        
-        if signature_img:
-            self._add_signature_page(story, signature_img)
-
-        doc.build(story)
-        pdf_bytes = self._finalize_pdf(buffer, loan_data['id'])
-        return pdf_bytes
-
-    def _add_cover_page(self, story, client_data, loan_data):
-        """Ajoute une page de couverture professionnelle"""
-        # Logo et en-tête
-        logo = Image(self.logo_path, width=2*inch, height=1*inch)
-        story.append(logo)
-        story.append(Spacer(1, 0.5*inch))
-
-        # Titre
-        title = Paragraph("CONTRAT DE PRÊT", self.styles['Title'])
-        story.append(title)
-        story.append(Spacer(1, 0.3*inch))
-
-        # Photo client si disponible
-        if client_data.get('photo_path'):
-            client_photo = Image(client_data['photo_path'], width=1.5*inch, height=1.5*inch)
-            story.append(client_photo)
-            story.append(Spacer(1, 0.2*inch))
-
-        # Info client
-        client_info = [
-            f"<b>Client:</b> {client_data['full_name']}",
-            f"<b>ID:</b> {client_data['id']}",
-            f"<b>Téléphone:</b> {client_data['phone']}",
-            f"<b>Adresse:</b> {client_data['address']}"
-        ]
-        for line in client_info:
-            story.append(Paragraph(line, self.styles['Kreyol']))
-
-        # Info prêt
-        story.append(Spacer(1, 0.3*inch))
-        loan_info = [
-            f"<b>Montant:</b> {loan_data['amount']} HTG",
-            f"<b>Durée:</b> {loan_data['duration_days']} jours",
-            f"<b>Taux journalier:</b> {loan_data['daily_interest_rate']*100:.2f}%",
-            f"<b>Date:</b> {datetime.now().strftime('%d/%m/%Y')}"
-        ]
-        for line in loan_info:
-            story.append(Paragraph(line, self.styles['Kreyol']))
-
-        story.append(Spacer(1, 0.5*inch))
-        story.append(Paragraph("<i>Veuillez lire attentivement les termes ci-dessous</i>", self.styles['Kreyol']))
-        story.append(PageBreak())
-
-    def _add_terms(self, story, loan_data):
-        """Ajoute les termes et conditions du contrat"""
-        # Clause 1
-        terms = [
-            "<b>1. Montant du Prêt:</b> Le prêteur accorde un prêt de {} HTG au client.".format(loan_data['amount']),
-            Spacer(1, 0.2*inch),
-            "<b>2. Durée:</b> Le prêt doit être remboursé dans un délai de {} jours.".format(loan_data['duration_days']),
-            Spacer(1, 0.2*inch),
-            "<b>3. Intérêts:</b> Taux d'intérêt journalier de {}%.".format(loan_data['daily_interest_rate']*100),
-            Spacer(1, 0.2*inch),
-            "<b>4. Pénalités:</b> En cas de retard, une pénalité de 2% par jour sera appliquée.",
-            Spacer(1, 0.2*inch),
-            "<b>5. Droit Haïtien:</b> Ce contrat est régi par les lois de la République d'Haïti."
-        ]
-
-        for item in terms:
-            if isinstance(item, str):
-                story.append(Paragraph(item, self.styles['Kreyol']))
-            else:
-                story.append(item)
-
-    def _add_signature_page(self, story, signature_img):
-        """Ajoute une page de signature"""
-        story.append(PageBreak())
-        story.append(Paragraph("<b>Signature du Client</b>", self.styles['Title']))
-        story.append(Spacer(1, 0.5*inch))
-
-        # Image de la signature
-        sig_img = Image(BytesIO(signature_img), width=3*inch, height=1*inch)
-        story.append(sig_img)
-        story.append(Spacer(1, 0.2*inch))
-
-        # Ligne de signature
-        story.append(Paragraph("_"*50, self.styles['Kreyol']))
-        story.append(Paragraph("<i>Signature du client</i>", self.styles['Kreyol']))
-
-    def _finalize_pdf(self, buffer, loan_id) -> BytesIO:
-        """Finalise le PDF avec sécurité et métadonnées"""
+        c = canvas.Canvas(buffer, pagesize=letter)
+        # Métadonnées du document (la date de création est posée par ReportLab)
+        c.setTitle(f'Contrat KrediLakay {loan_id}')
+        c.setAuthor('Système KrediLakay')
+        c.setSubject(f'Contrat de prêt {loan_id}')
+        c.setKeywords(['KrediLakay', 'contrat de prêt', str(loan_id)])
+        c.setCreator('KrediLakay PDF Generator')
+
+        get_contract_template().render(c, loan_data, client_data, signature_img, on_page=self._qr_code(loan_id))
+        c.save()
         buffer.seek(0)
-        pdf_reader = PdfReader(buffer)
-        pdf_writer = PdfWriter()
-
-        # Ajout du filigrane et métadonnées
-        for page in pdf_reader.pages:
-            pdf_writer.add_page(page)
-
-        # Métadonnées
-        pdf_writer.add_metadata({
-            '/Title': f'Contrat KrediLakay {loan_id}',
-            '/Author': 'Système KrediLakay',
-            '/Creator': 'KrediLakay PDF Generator',
-            '/Producer': 'ReportLab + PyPDF2',
-            '/CreationDate': datetime.now().strftime("D:%Y%m%d%H%M%S")
-        })
+        return buffer
 
-        # Ajout du QR Code sécurisé
-        self._add_qr_code(pdf_writer, loan_id)
-
-        # Finalisation
-        output_buffer = BytesIO()
-        pdf_writer.write(output_buffer)
-        output_buffer.seek(0)
-        return output_buffer
-
-    def _add_qr_code(self, pdf_writer, loan_id):
-        """Ajoute un QR Code de vérification"""
+    def _qr_code(self, loan_id, x: float = 450, y: float = 50, size: float = 100) -> Callable[[canvas.Canvas], None]:
+        """
+        QR Code de vérification en tracé vectoriel (pas d'image PNG intermédiaire)
+        Args:
+            loan_id: Identifiant du prêt encodé dans l'URL de vérification
+            x, y, size: Position et côté du QR code sur la page (points)
+        Returns:
+            Callable: Dessine le QR code sur la page en cours d'un canvas
+        """
         verification_url = f"{settings.BASE_URL}/verify-contract?loan={loan_id}"
         qr = qrcode.QRCode(
             version=1,
             error_correction=qrcode.constants.ERROR_CORRECT_L,
-            box_size=4,
-            border=2
+            border=2,
+            mask_pattern=0  # Masque fixe (valide pour tout lecteur): évite d'évaluer les 8 masques par contrat
         )
         qr.add_data(verification_url)
         qr.make(fit=True)
-        qr_img = qr.make_image(fill_color="black", back_color="white")
-
-        # Convertir en image ReportLab
-        qr_buffer = BytesIO()
-        qr_img.save(qr_buffer, format='PNG')
-        qr_buffer.seek(0)
-
-        # Ajouter au PDF
-        from reportlab.pdfgen import canvas
-        packet = BytesIO()
-        can = canvas.Canvas(packet, pagesize=letter)
-        can.drawImage(qr_buffer, 450, 50, width=100, height=100)
-        can.save()
-
-        packet.seek(0)
-        qr_pdf = PdfReader(packet)
-        for page in pdf_writer.pages:
-            page.merge_page(qr_pdf.pages[0])
+        matrix = qr.get_matrix()  # Marge blanche comprise
+        module = size / len(matrix)
+
+        def draw(c: canvas.Canvas):
+            # Tracé une fois par document (Form XObject), référencé sur chaque page
+            if not c.hasForm('kredi_qr'):
+                c.saveState()
+                c.beginForm('kredi_qr')
+                c.setFillColor(colors.white)
+                c.rect(x, y, size, size, stroke=0, fill=1)
+                path = c.beginPath()
+                for row, cells in enumerate(matrix):
+                    top = y + size - row * module
+                    col = 0
+                    while col < len(cells):
+                        if not cells[col]:
+                            col += 1
+                            continue
+                        start = col
+                        while col < len(cells) and cells[col]:
+                            col += 1
+                        path.rect(x + start * module, top - module, (col - start) * module, module)
+                c.setFillColor(colors.black)
+                c.drawPath(path, stroke=0, fill=1)
+                c.endForm()
+                c.restoreState()
+            c.doForm('kredi_qr')
+
+        return draw
 
 class PDFSecurity:
     """Classe utilitaire pour la sécurité des PDF"""
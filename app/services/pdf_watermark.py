@@ -1,20 +1,32 @@
 # KREDILAKAY/app/services/pdf_watermark.py
 from io import BytesIO
-from PyPDF2 import PdfReader, PdfWriter
+from PyPDF2 import PdfReader
 from reportlab.pdfgen import canvas
 from reportlab.lib.pagesizes import letter
 from reportlab.lib.colors import Color, lightgrey
-from reportlab.lib.utils import ImageReader
-from typing import Union, Optional
+from PyPDF2.generic import NameObject, StreamObject
+from typing import Union, Optional, Tuple
 import hashlib
 from pathlib import Path
 from config import settings
+from app.services.pdf_assets import pdf_assets
+from app.services.pdf_incremental import IncrementalWriter
+from app.services.pdf_overlay import OverlayCache, page_to_form, stamp_page
+from app.services.pdf_render import get_pdf_renderer
 import logging
 
+WATERMARK_NAME = NameObject('/KrediWm')
+UID_NAME = NameObject('/KrediUid')
+
+# Calques de filigrane construits une fois par processus (type, texte, format de page)
+_overlays = OverlayCache(settings.WATERMARK_OVERLAY_CACHE_SIZE)
+
 class PDFWatermarker:
     """Service d'ajout de filigranes sécurisés aux documents PDF"""
 
-    def __init__(self):
+    def __init__(self, renderer=None):
+        # Service de rendu (pdf_render): le filigrane est appliqué hors du worker web
+        self.renderer = renderer or get_pdf_renderer()
         self.watermark_config = {
             'text': settings.WATERMARK_TEXT,
             'font_name': 'Helvetica-Bold',
@@ -31,6 +43,20 @@ class PDFWatermarker:
         watermark_type: str = 'text',
         custom_text: Optional[str] = None,
         user_id: Optional[str] = None
+    ) -> bytes:
+        """
+        Applique un filigrane sécurisé au PDF, dans le pool de rendu (voir render_watermark)
+        Returns:
+            bytes: PDF avec filigrane
+        """
+        return self.renderer.render('watermark', pdf_bytes, watermark_type, custom_text, user_id)
+
+    def render_watermark(
+        self,
+        pdf_bytes: bytes,
+        watermark_type: str = 'text',
+        custom_text: Optional[str] = None,
+        user_id: Optional[str] = None
     ) -> bytes:
         """
         Applique un filigrane sécurisé au PDF
@@ -43,56 +69,70 @@ class PDFWatermarker:
             bytes: PDF avec filigrane
         """
         try:
-            pdf_reader = PdfReader(BytesIO(pdf_bytes))
-            pdf_writer = PdfWriter()
-
-            watermark_page = self._create_watermark_page(
-                watermark_type=watermark_type,
-                custom_text=custom_text,
-                user_id=user_id
-            )
+            # Mise à jour incrémentale: le document d'origine n'est pas réécrit
+            pdf_writer = IncrementalWriter(pdf_bytes)
+            text = custom_text if custom_text else self.watermark_config['text']
 
-            for page in pdf_reader.pages:
-                # Fusionner le filigrane avec chaque page
-                page.merge_page(watermark_page)
-                pdf_writer.add_page(page)
+            # Un calque copié par format de page et par document, référencé par chaque page
+            refs = {}
+            for page in pdf_writer.pages:
+                size = (round(float(page.mediabox.width), 2), round(float(page.mediabox.height), 2))
+                if size not in refs:
+                    forms = {WATERMARK_NAME: self._watermark_overlay(watermark_type, text, size)}
+                    if user_id and watermark_type != 'logo':
+                        forms[UID_NAME] = self._uid_overlay(user_id, size)
+                    refs[size] = {
+                        name: pdf_writer.add_object(pdf_writer.import_object(form)) for name, form in forms.items()
+                    }
+                stamp_page(page, refs[size], pdf_writer.add_object)
+                pdf_writer.update_page(page)
 
             # Ajouter les métadonnées de sécurité
             self._add_security_metadata(pdf_writer, user_id)
 
-            output_buffer = BytesIO()
-            pdf_writer.write(output_buffer)
-            return output_buffer.getvalue()
+            return pdf_writer.write()
 
         except Exception as e:
             logging.error(f"Erreur d'application du filigrane: {str(e)}")
             raise PDFWatermarkError(f"Échec de l'application du filigrane: {str(e)}")
 
-    def _create_watermark_page(
-        self,
-        watermark_type: str,
-        custom_text: Optional[str],
-        user_id: Optional[str]
-    ) -> PdfReader:
+    def _watermark_overlay(self, watermark_type: str, text: str, size: Tuple[float, float]) -> StreamObject:
+        """Calque du filigrane (motif répété ou logo), construit au premier usage puis en cache"""
+        key = ('logo', None, size) if watermark_type == 'logo' else ('text', text, size)
+        return _overlays.get(key, lambda: page_to_form(self._create_watermark_page(watermark_type, text, size)))
+
+    def _uid_overlay(self, user_id: str, size: Tuple[float, float]) -> StreamObject:
+        """Petit calque de traçabilité propre à l'utilisateur, superposé au motif partagé"""
+        return _overlays.get(('uid', user_id, size), lambda: page_to_form(self._create_uid_page(user_id, size)))
+
+    def _create_watermark_page(self, watermark_type: str, text: str, size: Tuple[float, float] = letter):
         """Crée une page de filigrane selon le type demandé"""
         packet = BytesIO()
-        can = canvas.Canvas(packet, pagesize=letter)
+        can = canvas.Canvas(packet, pagesize=size)
 
         if watermark_type == 'logo':
-            self._apply_logo_watermark(can)
+            self._apply_logo_watermark(can, size)
         else:
-            text = custom_text if custom_text else self.watermark_config['text']
-            if user_id:
-                text += f" (UID:{user_id})"
-            self._apply_text_watermark(can, text)
+            self._apply_text_watermark(can, text, size)
 
         can.save()
         packet.seek(0)
         return PdfReader(packet).pages[0]
 
-    def _apply_text_watermark(self, can: canvas.Canvas, text: str):
+    def _create_uid_page(self, user_id: str, size: Tuple[float, float] = letter):
+        """Mention 'UID:<id>' en pied de page, aux couleurs du filigrane"""
+        packet = BytesIO()
+        can = canvas.Canvas(packet, pagesize=size)
+        can.setFont(self.watermark_config['font_name'], 8)
+        can.setFillColorRGB(*self.watermark_config['color'][:3], alpha=self.watermark_config['color'][3])
+        can.drawCentredString(size[0] / 2, 12, f"UID:{user_id}")
+        can.save()
+        packet.seek(0)
+        return PdfReader(packet).pages[0]
+
+    def _apply_text_watermark(self, can: canvas.Canvas, text: str, size: Tuple[float, float] = letter):
         """Applique un filigrane textuel"""
-        width, height = letter
+        width, height = size
         can.setFont(
             self.watermark_config['font_name'],
             self.watermark_config['font_size']
@@ -114,12 +154,12 @@ class PDFWatermarker:
 
         can.restoreState()
 
-    def _apply_logo_watermark(self, can: canvas.Canvas):
+    def _apply_logo_watermark(self, can: canvas.Canvas, size: Tuple[float, float] = letter):
         """Applique un filigrane avec logo de sécurité"""
-        if not self.logo_path.exists():
+        logo = pdf_assets.security_logo()
+        if logo is None:
             raise FileNotFoundError(f"Logo de sécurité introuvable: {self.logo_path}")
 
-        logo = ImageReader(self.logo_path)
         logo_width, logo_height = logo.getSize()
         aspect = logo_height / float(logo_width)
         width = 200
@@ -129,15 +169,15 @@ class PDFWatermarker:
         can.setFillAlpha(0.2)
         can.drawImage(
             logo,
-            (letter[0] - width) / 2,
-            (letter[1] - height) / 2,
+            (size[0] - width) / 2,
+            (size[1] - height) / 2,
             width=width,
             height=height,
             mask='auto'
         )
         can.setFillAlpha(1)
 
-    def _add_security_metadata(self, pdf_writer: PdfWriter, user_id: Optional[str]):
+    def _add_security_metadata(self, pdf_writer: IncrementalWriter, user_id: Optional[str]):
         """Ajoute des métadonnées de sécurité"""
         metadata = {
             '/Title': 'Document sécurisé KrediLakay',
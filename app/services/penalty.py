@@ -1,5 +1,6 @@
 from decimal import Decimal
 from datetime import datetime
+from app.services.penalty_accrual import PenaltyAccrualEngine
 
 class PenaltyCalculator:
     def __init__(self, loan):
@@ -14,10 +15,12 @@ class PenaltyCalculator:
         return max((datetime.utcnow().date() - due_date).days, 0)
     
     def calculate_total(self):
-        return self.loan.total_due * self.daily_rate * self.days_late
+        # Pénalités accrues chaque nuit par PenaltyAccrualEngine
+        return self.loan.accrued_penalties or Decimal('0')
 # KREDILAKAY/app/services/pdf_watermark.py
 from io import BytesIO
-from PyPDF2 import PdfReader, PdfWriter
+from PyPDF2 import PdfReader
+from PyPDF2.generic import NameObject
 from reportlab.pdfgen import canvas
 from reportlab.lib.pagesizes import letter
 from reportlab.lib.colors import Color, red, black
@@ -27,12 +30,19 @@ from decimal import Decimal
 import hashlib
 from pathlib import Path
 from config import settings
+from app.services.pdf_incremental import IncrementalWriter
+from app.services.pdf_overlay import page_to_form, stamp_page
+from app.services.pdf_render import get_pdf_renderer
 import logging
 
+PENALTY_NAME = NameObject('/KrediPenalty')
+
 class PDFWatermarker:
     """Service d'ajout de filigranes avec calcul automatique de pénalités"""
 
-    def __init__(self):
+    def __init__(self, renderer=None):
+        # Service de rendu (pdf_render): le filigrane est appliqué hors du worker web
+        self.renderer = renderer or get_pdf_renderer()
         self.penalty_rate = Decimal('0.02')  # 2% par jour
         self.watermark_config = {
             'font_name': 'Helvetica-Bold',
@@ -55,43 +65,58 @@ class PDFWatermarker:
             loan_data: {
                 'due_date': datetime,
                 'total_amount': Decimal,
-                'loan_id': str
+                'loan_id': str,
+                'accrued_penalty': Decimal  # optionnel, lu depuis le prêt sinon
             }
             as_of_date: Date de calcul (par défaut aujourd'hui)
         Returns:
             bytes: PDF avec filigrane de pénalité si applicable
         """
         as_of_date = as_of_date or datetime.now()
+        # Pénalités lues ici: le pool de rendu n'accède pas à la base
+        if loan_data.get('accrued_penalty') is None:
+            loan_data = dict(loan_data, accrued_penalty=PenaltyAccrualEngine.accrued_for(loan_data['loan_id']))
+
+        penalty_info = self._calculate_penalty(
+            loan_data['due_date'], loan_data['total_amount'], as_of_date, loan_data['accrued_penalty']
+        )
+        if not penalty_info['has_penalty']:
+            return pdf_bytes  # Pas de filigrane si pas de retard, document non transmis au pool
+        return self.renderer.render('penalty_watermark', pdf_bytes, loan_data, as_of_date)
+
+    def render_penalty_watermark(self, pdf_bytes: bytes, loan_data: dict, as_of_date: datetime) -> bytes:
+        """Filigrane de pénalité (pool de rendu), pénalités accrues fournies dans loan_data"""
         penalty_info = self._calculate_penalty(
             loan_data['due_date'],
             loan_data['total_amount'],
-            as_of_date
+            as_of_date,
+            loan_data['accrued_penalty']
         )
 
         if not penalty_info['has_penalty']:
             return pdf_bytes  # Pas de filigrane si pas de retard
 
-        pdf_reader = PdfReader(BytesIO(pdf_bytes))
-        pdf_writer = PdfWriter()
-
-        watermark_page = self._create_penalty_watermark(penalty_info)
+        # Mention ajoutée par mise à jour incrémentale: le document d'origine n'est pas réécrit
+        pdf_writer = IncrementalWriter(pdf_bytes)
+        watermark = {PENALTY_NAME: pdf_writer.add_object(
+            pdf_writer.import_object(page_to_form(self._create_penalty_watermark(penalty_info)))
+        )}
 
-        for page in pdf_reader.pages:
-            page.merge_page(watermark_page)
-            pdf_writer.add_page(page)
+        for page in pdf_writer.pages:
+            stamp_page(page, watermark, pdf_writer.add_object)
+            pdf_writer.update_page(page)
 
-        output_buffer = BytesIO()
-        pdf_writer.write(output_buffer)
-        return output_buffer.getvalue()
+        return pdf_writer.write()
 
     def _calculate_penalty(
         self,
         due_date: datetime,
         total_amount: Decimal,
-        as_of_date: datetime
+        as_of_date: datetime,
+        accrued_penalty: Decimal
     ) -> dict:
-        """Calcule les pénalités de retard"""
-        if as_of_date <= due_date:
+        """Met en forme les pénalités déjà accrues dans le registre"""
+        if as_of_date <= due_date or not accrued_penalty:
             return {
                 'has_penalty': False,
                 'penalty_amount': Decimal('0'),
@@ -99,7 +124,7 @@ class PDFWatermarker:
             }
 
         days_late = (as_of_date - due_date).days
-        penalty_amount = (total_amount * self.penalty_rate * days_late).quantize(Decimal('0.01'))
+        penalty_amount = Decimal(accrued_penalty).quantize(Decimal('0.01'))
 
         return {
             'has_penalty': True,
@@ -0,0 +1,155 @@
+# KREDILAKAY/app/services/penalty_accrual.py
+from datetime import date, datetime
+from decimal import Decimal
+from fractions import Fraction
+from typing import Dict, List, Optional
+from sqlalchemy import func, select, update
+from sqlalchemy.dialects.postgresql import insert
+import numpy as np
+from app.database import get_db
+from app.models import Loan, PenaltyEntry
+from app.services.loan_ledger import LoanLedger
+from app.services.money import Money, round_half_even_div
+from config import settings
+import logging
+
+
+class PenaltyAccrualEngine:
+    """
+    Accrual nocturne des pénalités de retard: une requête ensembliste sélectionne
+    les prêts en retard, NumPy calcule les jours à pénaliser et les écritures
+    journalières sont persistées dans penalty_entries.
+    """
+
+    def __init__(self, daily_rate=None, grace_period: Optional[int] = None, chunk_size: int = 5000):
+        self.daily_rate = Decimal(str(daily_rate if daily_rate is not None else settings.PENALTY_RATE))
+        self.grace_period = grace_period if grace_period is not None else settings.GRACE_PERIOD_DAYS
+        self.chunk_size = chunk_size
+
+    def run(self, as_of: Optional[date] = None) -> Dict:
+        """
+        Enregistre les pénalités de chaque jour de retard non encore couvert
+        Args:
+            as_of: Dernier jour à pénaliser (par défaut aujourd'hui)
+        Returns:
+            Dict: Nombre de prêts et d'écritures, montant total accru
+        """
+        as_of = as_of or datetime.utcnow().date()
+        penalty_start = Loan.start_date + Loan.duration_days + self.grace_period
+        # Les prêts antérieurs au registre (solde NULL) seraient sinon exclus du filtre sur le solde
+        LoanLedger.rebuild(missing_only=True)
+
+        with get_db() as db:
+            rows = db.execute(
+                select(
+                    Loan.id,
+                    Loan.start_date,
+                    Loan.duration_days,
+                    Loan.total_due,
+                    Loan.penalties_accrued_until
+                ).where(
+                    Loan.status == 'APPROVED',
+                    Loan.start_date.isnot(None),
+                    Loan.outstanding_balance > 0,
+                    penalty_start < as_of,
+                    func.coalesce(Loan.penalties_accrued_until, penalty_start) < as_of
+                )
+            ).all()
+
+            if not rows:
+                return {'as_of': as_of.isoformat(), 'loans': 0, 'entries': 0, 'amount': 0.0}
+
+            entries = self._build_entries(rows, as_of)
+            for i in range(0, len(entries), self.chunk_size):
+                db.execute(
+                    insert(PenaltyEntry)
+                    .values(entries[i:i + self.chunk_size])
+                    .on_conflict_do_nothing(index_elements=['loan_id', 'accrual_date'])
+                )
+
+            loan_ids = [row.id for row in rows]
+            for i in range(0, len(loan_ids), self.chunk_size):
+                self._refresh_totals(db, loan_ids[i:i + self.chunk_size], as_of)
+
+            db.commit()
+
+        total = sum(entry['amount'] for entry in entries)
+        logging.info(f"Pénalités accrues au {as_of}: {len(entries)} écritures, {total} HTG")
+        return {
+            'as_of': as_of.isoformat(),
+            'loans': len(rows),
+            'entries': len(entries),
+            'amount': float(total)
+        }
+
+    def _build_entries(self, rows, as_of: date) -> List[Dict]:
+        """
+        Calcule en une passe NumPy les jours de retard à pénaliser pour chaque prêt.
+        L'écriture du jour n est la différence des cumuls arrondis des jours n et n - 1:
+        le total accru sur n jours vaut exactement l'ancienne formule
+        (total_due * taux * n).quantize(Decimal('0.01')), arrondie une seule fois
+        (au pair), au lieu d'accumuler l'arrondi de chaque pénalité journalière.
+        """
+        loan_ids, start_dates, durations, total_due, accrued_until = zip(*rows)
+
+        due = np.array(start_dates, dtype='datetime64[D]') + np.array(durations, dtype='timedelta64[D]')
+        first_day = due + np.timedelta64(self.grace_period + 1, 'D')
+        accrued = np.array(
+            [d if d is not None else np.datetime64('NaT') for d in accrued_until],
+            dtype='datetime64[D]'
+        )
+        # Reprise au lendemain du dernier jour déjà accru
+        first_day = np.where(np.isnat(accrued), first_day, np.maximum(first_day, accrued + 1))
+        counts = np.maximum((np.datetime64(as_of, 'D') - first_day).astype(np.int64) + 1, 0)
+
+        idx = np.repeat(np.arange(len(rows)), counts)
+        offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        days = first_day[idx] + offsets.astype('timedelta64[D]')
+        days_late = (days - due[idx]).astype(np.int64) - self.grace_period
+
+        base = [Money.from_decimal(amount).cents for amount in total_due]
+        rate = Fraction(self.daily_rate)
+        # Entiers Python au-delà de la plage int64 (taux à nombreuses décimales)
+        largest = max(base) * rate.numerator * int(days_late.max(initial=0))
+        dtype = np.int64 if largest < 2 ** 62 else object
+
+        # Pénalité cumulée sur n jours, en centimes: total_due * taux * n arrondi au pair
+        base_late = np.array(base, dtype=dtype)[idx] * rate.numerator
+        amounts = (
+            round_half_even_div(base_late * days_late.astype(dtype), rate.denominator)
+            - round_half_even_div(base_late * (days_late - 1).astype(dtype), rate.denominator)
+        )
+
+        return [
+            {
+                'loan_id': loan_ids[i],
+                'accrual_date': day.item(),
+                'days_late': int(late),
+                'base_amount': Money(base[i]).to_decimal(),
+                'rate': self.daily_rate,
+                'amount': Money(amount).to_decimal()
+            }
+            for i, day, late, amount in zip(idx.tolist(), days, days_late, amounts.tolist())
+        ]
+
+    def _refresh_totals(self, db, loan_ids: List, as_of: date):
+        """Recalcule le total accru des prêts depuis le registre (UPDATE ... FROM)"""
+        totals = (
+            select(PenaltyEntry.loan_id, func.sum(PenaltyEntry.amount).label('total'))
+            .where(PenaltyEntry.loan_id.in_(loan_ids))
+            .group_by(PenaltyEntry.loan_id)
+            .subquery()
+        )
+        db.execute(
+            update(Loan)
+            .where(Loan.id == totals.c.loan_id)
+            .values(accrued_penalties=totals.c.total, penalties_accrued_until=as_of)
+            .execution_options(synchronize_session=False)
+        )
+
+    @staticmethod
+    def accrued_for(loan_id) -> Decimal:
+        """Pénalités déjà accrues pour un prêt"""
+        with get_db() as db:
+            value = db.query(Loan.accrued_penalties).filter_by(id=loan_id).scalar()
+        return value or Decimal('0')
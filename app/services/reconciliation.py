@@ -0,0 +1,259 @@
+# KREDILAKAY/app/services/reconciliation.py
+import csv
+import os
+from datetime import date, timedelta
+from typing import Dict, Iterator, Optional
+import pandas as pd
+from openpyxl import load_workbook
+from sqlalchemy import BigInteger, Column, MetaData, String, Table, func, insert, select, true
+from app.database import get_db
+from app.models import Payment
+import logging
+
+# Colonnes des fichiers de règlement, par fournisseur
+SETTLEMENT_COLUMNS = {
+    'NATCOM_PAY': {'transaction_id': 'Transaction ID', 'amount': 'Amount', 'date': 'Transaction Date'},
+    'DIGICEL_PAY': {'transaction_id': 'txn_id', 'amount': 'amount', 'date': 'txn_date'},
+    'UNIBANK': {'transaction_id': 'Payment ID', 'amount': 'Montant', 'date': 'Date Valeur'}
+}
+
+REPORTS = {
+    'missing_payment': ['transaction_id', 'settled_amount', 'settled_date', 'row'],
+    'missing_settlement': ['transaction_id', 'payment_id', 'loan_id', 'amount', 'payment_date'],
+    'duplicate': ['transaction_id', 'source', 'settled_amount', 'row'],
+    'amount_mismatch': ['transaction_id', 'payment_id', 'loan_id', 'settled_amount', 'recorded_amount', 'row']
+}
+
+# Lignes du fichier sans paiement du fournisseur, en attente du rapprochement final
+_UNMATCHED = Table(
+    'reconciliation_unmatched', MetaData(),
+    Column('receipt', String(100)),
+    Column('settled_cents', BigInteger),
+    Column('settled_date', String(50)),
+    Column('file_row', BigInteger),
+    prefixes=['TEMPORARY'],
+    postgresql_on_commit='DROP'
+)
+
+
+class SettlementReconciler:
+    """
+    Rapprochement des fichiers de règlement fournisseurs avec les paiements enregistrés.
+    Les paiements de la période sont indexés en mémoire par numéro de reçu, le fichier
+    est lu par blocs et les écarts sont écrits au fil de l'eau: la mémoire dépend de la
+    taille d'un bloc et du nombre de paiements de la période, pas de celle du fichier.
+    Les lignes sans paiement du fournisseur passent par une table temporaire, où elles
+    sont dédoublonnées et rapprochées des paiements antérieurs sans fournisseur.
+    """
+
+    def __init__(self, provider: str, chunk_size: int = 50000, columns: Optional[Dict[str, str]] = None):
+        if provider not in SETTLEMENT_COLUMNS and not columns:
+            raise ValueError(f"Fournisseur non supporté: {provider}")
+        self.provider = provider
+        self.chunk_size = chunk_size
+        self.columns = columns or SETTLEMENT_COLUMNS[provider]
+
+    def run(self, path: str, output_dir: str, date_from: date, date_to: date) -> Dict:
+        """
+        Rapproche un fichier de règlement
+        Args:
+            path: Fichier CSV ou XLSX du fournisseur
+            output_dir: Répertoire des rapports CSV d'écarts
+            date_from: Premier jour couvert par le fichier
+            date_to: Dernier jour couvert par le fichier
+        Returns:
+            Dict: Compteurs, montants et chemins des rapports
+        """
+        index, duplicates = self._index_payments(date_from, date_to)
+        os.makedirs(output_dir, exist_ok=True)
+        stem = f"{self.provider.lower()}_{date_from.isoformat()}_{date_to.isoformat()}"
+
+        files = {name: open(os.path.join(output_dir, f"{stem}_{name}.csv"), 'w', newline='') for name in REPORTS}
+        try:
+            writers = {name: csv.writer(f) for name, f in files.items()}
+            for name, header in REPORTS.items():
+                writers[name].writerow(header)
+
+            stats = {
+                'rows': 0, 'matched': 0, 'missing_payment': 0, 'duplicate': len(duplicates),
+                'amount_mismatch': 0, 'settled_amount': 0.0
+            }
+            for receipt in duplicates:
+                writers['duplicate'].writerow([receipt, 'payments', '', ''])
+
+            with get_db() as db:
+                _UNMATCHED.create(db.connection())
+                for chunk in self._read_chunks(path):
+                    unmatched = self._match_chunk(chunk, index, writers, stats)
+                    if unmatched:
+                        db.execute(insert(_UNMATCHED), unmatched)
+                self._match_unmatched(db, writers, stats)
+                db.rollback()  # Table temporaire supprimée avec la transaction
+
+            # Paiements enregistrés absents du fichier
+            missing_settlement = 0
+            for receipt, entry in index.items():
+                if not entry[3]:
+                    payment_id, loan_id, cents, payment_date = entry[0], entry[1], entry[2], entry[4]
+                    writers['missing_settlement'].writerow(
+                        [receipt, payment_id, loan_id, f"{cents / 100:.2f}", payment_date]
+                    )
+                    missing_settlement += 1
+            stats['missing_settlement'] = missing_settlement
+        finally:
+            for f in files.values():
+                f.close()
+
+        stats['reports'] = {name: f.name for name, f in files.items()}
+        logging.info(
+            f"Rapprochement {self.provider} {date_from}..{date_to}: {stats['rows']} lignes, "
+            f"{stats['matched']} rapprochées, {stats['missing_payment']} sans paiement, "
+            f"{missing_settlement} non réglées, {stats['amount_mismatch']} écarts de montant"
+        )
+        return stats
+
+    def _index_payments(self, date_from: date, date_to: date):
+        """
+        Index {numéro de reçu: [payment_id, loan_id, centimes, rapproché, date]} des paiements
+        du fournisseur; les reçus en double dans la base sont signalés à part
+        """
+        index, duplicates = {}, []
+        with get_db() as db:
+            rows = (
+                db.query(Payment.id, Payment.loan_id, Payment.receipt_number, Payment.amount, Payment.payment_date)
+                .filter(
+                    Payment.provider == self.provider,
+                    Payment.payment_date >= date_from,
+                    Payment.payment_date < date_to + timedelta(days=1)
+                )
+                .yield_per(10000)
+            )
+            for row in rows:
+                receipt = str(row.receipt_number)
+                if receipt in index:
+                    duplicates.append(receipt)
+                    continue
+                index[receipt] = [
+                    str(row.id), str(row.loan_id), int(round(row.amount * 100)), False,
+                    row.payment_date.isoformat() if row.payment_date else ''
+                ]
+        return index, duplicates
+
+    def _read_chunks(self, path: str) -> Iterator[pd.DataFrame]:
+        """Blocs normalisés (transaction_id, amount, date) du fichier"""
+        source = {v: k for k, v in self.columns.items()}
+        if path.lower().endswith(('.xlsx', '.xlsm')):
+            chunks = self._read_xlsx(path, list(source))
+        else:
+            chunks = pd.read_csv(
+                path, usecols=list(source), dtype={self.columns['transaction_id']: str},
+                chunksize=self.chunk_size
+            )
+
+        offset = 0
+        for chunk in chunks:
+            chunk = chunk.rename(columns=source)
+            chunk.index = pd.RangeIndex(offset + 2, offset + 2 + len(chunk))  # Numéro de ligne du fichier
+            offset += len(chunk)
+            yield chunk
+
+    def _read_xlsx(self, path: str, columns) -> Iterator[pd.DataFrame]:
+        """Lecture openpyxl en mode read_only, ligne par ligne, regroupée en blocs"""
+        workbook = load_workbook(path, read_only=True, data_only=True)
+        try:
+            rows = workbook.active.iter_rows(values_only=True)
+            header = [str(h).strip() if h is not None else '' for h in next(rows)]
+            missing = [c for c in columns if c not in header]
+            if missing:
+                raise ValueError(f"Colonnes absentes du fichier: {', '.join(missing)}")
+            positions = [header.index(c) for c in columns]
+
+            batch = []
+            for row in rows:
+                batch.append([row[i] if i < len(row) else None for i in positions])
+                if len(batch) >= self.chunk_size:
+                    yield pd.DataFrame(batch, columns=columns)
+                    batch = []
+            if batch:
+                yield pd.DataFrame(batch, columns=columns)
+        finally:
+            workbook.close()
+
+    def _match_chunk(self, chunk: pd.DataFrame, index: Dict, writers: Dict, stats: Dict) -> list:
+        """
+        Rapproche un bloc: une recherche dans l'index par ligne, montants comparés en centimes
+        Returns:
+            list: Lignes sans paiement du fournisseur, pour _match_unmatched
+        """
+        receipts = chunk['transaction_id'].astype(str).str.strip()
+        cents = (pd.to_numeric(chunk['amount'], errors='coerce') * 100).round()
+        dates = chunk['date'].astype(str)
+        stats['rows'] += len(chunk)
+        stats['settled_amount'] += float(cents.sum()) / 100
+
+        unmatched = []
+        for row, receipt, amount, settled_date in zip(chunk.index, receipts, cents, dates):
+            settled = f"{amount / 100:.2f}" if amount == amount else ''
+            entry = index.get(receipt)
+            if entry is None:
+                unmatched.append({
+                    'receipt': receipt,
+                    'settled_cents': int(amount) if amount == amount else None,
+                    'settled_date': settled_date,
+                    'file_row': int(row)
+                })
+                continue
+
+            if entry[3]:
+                writers['duplicate'].writerow([receipt, 'settlement', settled, row])
+                stats['duplicate'] += 1
+                continue
+
+            entry[3] = True
+            if amount != entry[2]:
+                writers['amount_mismatch'].writerow(
+                    [receipt, entry[0], entry[1], settled, f"{entry[2] / 100:.2f}", row]
+                )
+                stats['amount_mismatch'] += 1
+            else:
+                stats['matched'] += 1
+        return unmatched
+
+    def _match_unmatched(self, db, writers: Dict, stats: Dict):
+        """
+        Lignes sans paiement du fournisseur, lues dans l'ordre du fichier: les répétitions
+        d'un reçu sont des doublons, la première occurrence est rapprochée par numéro de
+        reçu seul des paiements antérieurs sans fournisseur, ou signalée sans paiement
+        """
+        occurrence = func.row_number().over(partition_by=_UNMATCHED.c.receipt, order_by=_UNMATCHED.c.file_row)
+        ranked = select(_UNMATCHED, occurrence.label('occurrence')).subquery()
+        legacy = (
+            select(Payment.id, Payment.loan_id, Payment.amount)
+            .where(Payment.receipt_number == ranked.c.receipt, Payment.provider.is_(None))
+            .order_by(Payment.payment_date)
+            .limit(1)
+            .lateral()
+        )
+        rows = db.execute(
+            select(ranked, legacy.c.id.label('payment_id'), legacy.c.loan_id, legacy.c.amount)
+            .outerjoin(legacy, true())
+            .order_by(ranked.c.file_row)
+            .execution_options(yield_per=self.chunk_size)
+        )
+
+        for row in rows:
+            amount = row.settled_cents
+            settled = f"{amount / 100:.2f}" if amount is not None else ''
+            if row.occurrence > 1:
+                writers['duplicate'].writerow([row.receipt, 'settlement', settled, row.file_row])
+                stats['duplicate'] += 1
+            elif row.payment_id is None:
+                writers['missing_payment'].writerow([row.receipt, settled, row.settled_date, row.file_row])
+                stats['missing_payment'] += 1
+            elif amount != int(round(row.amount * 100)):
+                writers['amount_mismatch'].writerow(
+                    [row.receipt, str(row.payment_id), str(row.loan_id), settled, f"{row.amount:.2f}", row.file_row]
+                )
+                stats['amount_mismatch'] += 1
+            else:
+                stats['matched'] += 1
@@ -0,0 +1,136 @@
+# KREDILAKAY/app/services/schedule.py
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterator, Optional, Tuple
+from app.services.money import Money
+
+
+class ScheduleRule:
+    """
+    Échéancier compact: les échéances sont dérivées d'une règle
+    (début, pas, montant, nombre, reliquat d'arrondi) au lieu d'être stockées
+    ligne par ligne. Les montants sont stockés en centimes HTG.
+    """
+
+    # Pas des règles construites par from_loan: une échéance par jour
+    DAILY_STEP = 1
+
+    def __init__(self, start: date, step: int, amount: Money, count: int, remainder: Money = Money(0)):
+        if step <= 0 or count <= 0:
+            raise ValueError("Pas et nombre d'échéances doivent être positifs")
+        self.start = start
+        self.step = step
+        self.amount = amount
+        self.count = count
+        self.remainder = remainder
+        self._last_amount = amount + remainder
+
+    @classmethod
+    def from_loan(cls, loan, start: Optional[date] = None) -> 'ScheduleRule':
+        """Construit la règle à partir des termes du prêt: échéances journalières de total_due / duration_days"""
+        count = max(loan.duration_days, 1)
+        amount, remainder = Money.from_decimal(loan.total_due).split(count)
+        return cls(
+            start=start or loan.start_date or datetime.utcnow().date(),
+            step=cls.DAILY_STEP,
+            amount=amount,
+            count=count,
+            remainder=remainder
+        )
+
+    @classmethod
+    def timing(cls, data: Optional[Dict], start: date) -> Tuple[date, int]:
+        """
+        Début et pas des échéances d'un prêt, sans construire la règle
+        Args:
+            data: Règle stockée (schedule_rule), ou None si non encore persistée
+            start: Date de début du prêt
+        Returns:
+            Tuple: (début, pas en jours) de la règle stockée ou de celle de from_loan
+        """
+        if data:
+            return date.fromisoformat(data['start']), data['step']
+        return start, cls.DAILY_STEP
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'ScheduleRule':
+        return cls(
+            start=date.fromisoformat(data['start']),
+            step=data['step'],
+            amount=Money(data['amount']),
+            count=data['count'],
+            remainder=Money(data.get('remainder', 0))
+        )
+
+    def to_dict(self) -> Dict:
+        """Représentation JSONB stockée sur le prêt"""
+        return {
+            'start': self.start.isoformat(),
+            'step': self.step,
+            'amount': self.amount.cents,
+            'count': self.count,
+            'remainder': self.remainder.cents
+        }
+
+    @property
+    def total(self) -> Money:
+        return self.amount * self.count + self.remainder
+
+    @property
+    def end_date(self) -> date:
+        return self.due_date(self.count)
+
+    def due_date(self, number: int) -> date:
+        """Date d'échéance de l'échéance numéro `number` (1-based)"""
+        return self.start + timedelta(days=number * self.step)
+
+    def amount_for(self, number: int) -> Money:
+        """Montant de l'échéance, le reliquat d'arrondi étant porté par la dernière"""
+        return self._last_amount if number == self.count else self.amount
+
+    def remaining_after(self, number: int) -> Money:
+        """Solde restant dû après l'échéance numéro `number`"""
+        if number >= self.count:
+            return Money(0)
+        return self.total - self.amount * number
+
+    def installments_covered(self, paid: Money) -> int:
+        """Nombre d'échéances entièrement couvertes par le montant payé"""
+        if paid >= self.total:
+            return self.count
+        if not self.amount:
+            return self.count - 1
+        return min(max(paid.cents, 0) // self.amount.cents, self.count - 1)
+
+    def index_range(
+        self,
+        date_from: Optional[date] = None,
+        date_to: Optional[date] = None,
+        limit: Optional[int] = None
+    ) -> Tuple[int, int]:
+        """Bornes (incluses) des échéances comprises dans la fenêtre, en O(1)"""
+        first, last = 1, self.count
+        if date_from:
+            first = max(first, -(-(date_from - self.start).days // self.step))
+        if date_to:
+            last = min(last, (date_to - self.start).days // self.step)
+        if limit is not None:
+            last = min(last, first + limit - 1)
+        return first, last
+
+    def expand(
+        self,
+        date_from: Optional[date] = None,
+        date_to: Optional[date] = None,
+        limit: Optional[int] = None
+    ) -> Iterator[Tuple[int, date, Money]]:
+        """
+        Déroule paresseusement les échéances de la fenêtre demandée
+        Yields:
+            (numéro, date d'échéance, montant)
+        """
+        first, last = self.index_range(date_from, date_to, limit)
+        step = timedelta(days=self.step)
+        due_date = self.due_date(first)
+        for number in range(first, last + 1):
+            yield number, due_date, self.amount_for(number)
+            due_date += step
@@ -0,0 +1,82 @@
+# KREDILAKAY/app/services/tasks.py
+import threading
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Callable, Dict, Optional
+from flask import current_app
+import logging
+
+
+class TaskQueue:
+    """
+    File de tâches de fond du processus web: les traitements longs (simulations,
+    recalculs) sont exécutés hors de la requête HTTP, dans le contexte de l'application.
+    """
+
+    def __init__(self, app, max_workers: int = 2, max_history: int = 100):
+        self.app = app
+        self.max_history = max_history
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='kredilakay-task')
+        self._jobs: 'OrderedDict[str, Dict]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, name: str, func: Callable, *args, **kwargs) -> str:
+        """
+        Planifie une tâche
+        Args:
+            name: Nom lisible de la tâche
+            func: Fonction à exécuter
+        Returns:
+            str: Identifiant de la tâche
+        """
+        job_id = str(uuid.uuid4())
+        with self._lock:
+            self._jobs[job_id] = {
+                'id': job_id,
+                'name': name,
+                'status': 'PENDING',
+                'submitted_at': datetime.utcnow().isoformat(),
+                'finished_at': None,
+                'result': None,
+                'error': None
+            }
+            while len(self._jobs) > self.max_history:
+                self._jobs.popitem(last=False)
+
+        self._executor.submit(self._run, job_id, func, args, kwargs)
+        return job_id
+
+    def status(self, job_id: str) -> Optional[Dict]:
+        """État d'une tâche (None si inconnue ou purgée de l'historique)"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def _update(self, job_id: str, **fields):
+        with self._lock:
+            if job_id in self._jobs:
+                self._jobs[job_id].update(fields)
+
+    def _run(self, job_id: str, func: Callable, args, kwargs):
+        self._update(job_id, status='RUNNING')
+        with self.app.app_context():
+            try:
+                result = func(*args, **kwargs)
+                self._update(job_id, status='DONE', result=result, finished_at=datetime.utcnow().isoformat())
+            except Exception as e:
+                logging.exception(f"Échec de la tâche {job_id}")
+                self._update(job_id, status='FAILED', error=str(e), finished_at=datetime.utcnow().isoformat())
+
+
+def init_task_queue(app) -> TaskQueue:
+    """Crée la file de tâches de l'application"""
+    queue = TaskQueue(app, max_workers=app.config.get('TASK_WORKERS', 2))
+    app.extensions['task_queue'] = queue
+    return queue
+
+
+def get_task_queue() -> Optional[TaskQueue]:
+    """File de tâches de l'application courante (None si ENABLE_ASYNC est désactivé)"""
+    return current_app.extensions.get('task_queue')
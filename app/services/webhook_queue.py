@@ -0,0 +1,431 @@
+# KREDILAKAY/app/services/webhook_queue.py
+import json
+import os
+import socket
+import time
+import uuid
+from collections import defaultdict
+from datetime import datetime, timedelta
+from decimal import Decimal
+from typing import Dict, List, NamedTuple, Optional
+from sqlalchemy import case, select, update
+from sqlalchemy.dialects.postgresql import insert
+from app.database import get_db
+from app.models import AuditLog, Payment, WebhookInbox
+from app.services import json_codec
+from app.services.allocation import Allocation
+from app.services.loan_ledger import LoanLedger
+from config import settings
+import logging
+
+try:
+    import redis
+except ImportError:  # Redis optionnel: repli sur la file Postgres
+    redis = None
+
+
+class QueuedWebhook(NamedTuple):
+    """Notification brute en attente: le corps est conservé tel que signé"""
+    id: str
+    provider: str
+    body: str
+    ip_address: Optional[str] = None
+    user_agent: Optional[str] = None
+
+
+def normalize_payment_data(provider: str, data: Dict) -> Dict:
+    """Normalise les données de paiement selon le fournisseur"""
+    # Adapté aux formats spécifiques des providers haïtiens
+    if provider == 'NATCOM_PAY':
+        return {
+            'transaction_id': data['transactionId'],
+            'amount': data['amount']['value'],
+            'loan_id': data['reference'].split('_')[-1],
+            'currency': data['amount']['currency']
+        }
+    elif provider == 'DIGICEL_PAY':
+        return {
+            'transaction_id': data['txn_id'],
+            'amount': data['amount'],
+            'loan_id': data['client_ref'],
+            'currency': 'HTG'
+        }
+    else:  # UNIBANK
+        return {
+            'transaction_id': data['payment']['id'],
+            'amount': data['payment']['amount'],
+            'loan_id': data['payment']['reference'],
+            'currency': data['payment']['currency']
+        }
+
+
+def post_loan_payments(db, loan_id, amounts: List[Decimal]) -> List[Allocation]:
+    """
+    Impute les paiements d'un prêt (totaux, échéances, statut si totalement payé)
+    Returns:
+        List[Allocation]: Répartition de chaque paiement (vide si le prêt est inconnu)
+    """
+    loan = LoanLedger.lock(db, loan_id)
+    if not loan:
+        return []
+    return LoanLedger.post_payments(db, loan, amounts)
+
+
+class RedisWebhookQueue:
+    """File Redis Stream avec groupe de consommateurs (livraison au moins une fois)"""
+
+    def __init__(
+        self,
+        url: str,
+        stream: str,
+        group: str = 'payment-workers',
+        lease_seconds: int = 60,
+        max_attempts: int = 5
+    ):
+        self.client = redis.Redis.from_url(url)
+        self.stream = stream
+        self.dead_letter = f"{stream}:dead"
+        self.group = group
+        self.consumer = f"{socket.gethostname()}-{os.getpid()}"
+        self.lease_ms = lease_seconds * 1000
+        self.max_attempts = max_attempts
+        self._group_ready = False
+
+    def push(self, message: QueuedWebhook):
+        self.client.xadd(self.stream, {
+            'provider': message.provider,
+            'body': message.body,
+            'ip_address': message.ip_address or '',
+            'user_agent': message.user_agent or ''
+        })
+
+    def fetch(self, size: int, timeout: float = 5.0) -> List[QueuedWebhook]:
+        """Réclame d'abord les messages abandonnés par un worker arrêté, puis les nouveaux"""
+        self._ensure_group()
+        entries = self.client.xautoclaim(
+            self.stream, self.group, self.consumer, min_idle_time=self.lease_ms, count=size
+        )[1]
+        if not entries:
+            response = self.client.xreadgroup(
+                self.group, self.consumer, {self.stream: '>'}, count=size, block=int(timeout * 1000)
+            )
+            entries = response[0][1] if response else []
+        return [self._decode(entry_id, fields) for entry_id, fields in entries if fields]
+
+    def ack(self, messages: List[QueuedWebhook]):
+        if messages:
+            ids = [m.id for m in messages]
+            self.client.xack(self.stream, self.group, *ids)
+            self.client.xdel(self.stream, *ids)
+
+    def fail(self, message: QueuedWebhook, error: str):
+        """
+        Laisse le message en attente (repris à l'expiration du bail) jusqu'à
+        max_attempts livraisons, puis le déplace dans le flux de lettres mortes
+        """
+        pending = self.client.xpending_range(self.stream, self.group, message.id, message.id, 1)
+        if pending and pending[0]['times_delivered'] < self.max_attempts:
+            return
+        self.client.xadd(self.dead_letter, {
+            'provider': message.provider,
+            'body': message.body,
+            'error': error
+        })
+        self.ack([message])
+
+    def pending(self) -> int:
+        return self.client.xlen(self.stream)
+
+    def _ensure_group(self):
+        if self._group_ready:
+            return
+        try:
+            self.client.xgroup_create(self.stream, self.group, id='0', mkstream=True)
+        except redis.ResponseError as e:
+            if 'BUSYGROUP' not in str(e):
+                raise
+        self._group_ready = True
+
+    @staticmethod
+    def _decode(entry_id, fields) -> QueuedWebhook:
+        text = {k.decode(): v.decode('utf-8') for k, v in fields.items()}
+        return QueuedWebhook(
+            id=entry_id.decode(),
+            provider=text['provider'],
+            body=text['body'],
+            ip_address=text.get('ip_address') or None,
+            user_agent=text.get('user_agent') or None
+        )
+
+
+class PostgresWebhookQueue:
+    """
+    File dans la table webhook_inbox: les workers réclament un lot par bail
+    (FOR UPDATE SKIP LOCKED), un bail expiré rend le message à nouveau disponible.
+    """
+
+    def __init__(self, lease_seconds: int = 60, max_attempts: int = 5):
+        self.lease = timedelta(seconds=lease_seconds)
+        self.max_attempts = max_attempts
+
+    def push(self, message: QueuedWebhook):
+        with get_db() as db:
+            db.add(WebhookInbox(
+                provider=message.provider,
+                body=message.body,
+                ip_address=message.ip_address,
+                user_agent=message.user_agent
+            ))
+            db.commit()
+
+    def fetch(self, size: int, timeout: float = 5.0) -> List[QueuedWebhook]:
+        now = datetime.utcnow()
+        with get_db() as db:
+            claimable = (
+                select(WebhookInbox.id)
+                .where(
+                    WebhookInbox.processed_at.is_(None),
+                    (WebhookInbox.locked_until.is_(None)) | (WebhookInbox.locked_until < now)
+                )
+                .order_by(WebhookInbox.id)
+                .limit(size)
+                .with_for_update(skip_locked=True)
+            )
+            rows = db.execute(
+                update(WebhookInbox)
+                .where(WebhookInbox.id.in_(claimable.scalar_subquery()))
+                .values(locked_until=now + self.lease, attempts=WebhookInbox.attempts + 1)
+                .returning(
+                    WebhookInbox.id, WebhookInbox.provider, WebhookInbox.body,
+                    WebhookInbox.ip_address, WebhookInbox.user_agent
+                )
+                .execution_options(synchronize_session=False)
+            ).all()
+            db.commit()
+
+        if not rows:
+            time.sleep(timeout)
+        return [QueuedWebhook(str(r.id), r.provider, r.body, r.ip_address, r.user_agent) for r in sorted(rows)]
+
+    def ack(self, messages: List[QueuedWebhook]):
+        if messages:
+            with get_db() as db:
+                db.execute(
+                    update(WebhookInbox)
+                    .where(WebhookInbox.id.in_([int(m.id) for m in messages]))
+                    .values(processed_at=datetime.utcnow(), locked_until=None)
+                    .execution_options(synchronize_session=False)
+                )
+                db.commit()
+
+    def fail(self, message: QueuedWebhook, error: str):
+        """Conserve l'erreur; le message est abandonné après max_attempts tentatives"""
+        with get_db() as db:
+            db.execute(
+                update(WebhookInbox)
+                .where(WebhookInbox.id == int(message.id))
+                .values(
+                    error=error,
+                    processed_at=case((WebhookInbox.attempts >= self.max_attempts, datetime.utcnow()), else_=None)
+                )
+                .execution_options(synchronize_session=False)
+            )
+            db.commit()
+
+    def pending(self) -> int:
+        with get_db() as db:
+            return db.query(WebhookInbox).filter(WebhookInbox.processed_at.is_(None)).count()
+
+
+class LocalSpool:
+    """
+    Repli local si la file principale est injoignable: une notification par ligne
+    JSON, écrite avec fsync avant de répondre 202. Le worker la reverse dans la file.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.path = os.path.join(directory, 'webhooks.jsonl')
+
+    def push(self, message: QueuedWebhook):
+        os.makedirs(self.directory, exist_ok=True)
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(message._asdict()) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+
+    def drain_into(self, queue) -> int:
+        """Transfère le spool dans la file principale; retourne le nombre de messages repris"""
+        if not os.path.exists(self.path):
+            return 0
+        draining = f"{self.path}.{os.getpid()}.draining"
+        os.replace(self.path, draining)
+
+        with open(draining, encoding='utf-8') as f:
+            messages = [QueuedWebhook(**json.loads(line)) for line in f if line.strip()]
+        for message in messages:
+            queue.push(message)
+        os.remove(draining)
+        return len(messages)
+
+
+_queue = None
+
+
+def get_webhook_queue():
+    """File configurée (Redis si disponible, sinon Postgres), créée une fois par processus"""
+    global _queue
+    if _queue is None:
+        backend = settings.WEBHOOK_QUEUE_BACKEND
+        if backend == 'redis' and redis is None:
+            logging.warning("Module redis absent, file des webhooks sur Postgres")
+            backend = 'postgres'
+        if backend == 'redis':
+            _queue = RedisWebhookQueue(
+                settings.REDIS_URL, settings.WEBHOOK_STREAM, max_attempts=settings.WEBHOOK_MAX_ATTEMPTS
+            )
+        else:
+            _queue = PostgresWebhookQueue(max_attempts=settings.WEBHOOK_MAX_ATTEMPTS)
+    return _queue
+
+
+def enqueue_webhook(provider: str, body: str, ip_address: str = None, user_agent: str = None) -> str:
+    """
+    Enregistre une notification vérifiée pour traitement différé
+    Returns:
+        str: 'queue' ou 'spool' selon le support utilisé
+    """
+    message = QueuedWebhook(str(uuid.uuid4()), provider, body, ip_address, (user_agent or '')[:200])
+    try:
+        get_webhook_queue().push(message)
+        return 'queue'
+    except Exception:
+        logging.exception("File des webhooks indisponible, repli sur le spool local")
+        LocalSpool(settings.WEBHOOK_SPOOL_DIR).push(message)
+        return 'spool'
+
+
+class WebhookBatchProcessor:
+    """
+    Traite les notifications par lot: insertion idempotente des paiements en une
+    instruction, puis une seule mise à jour par prêt avec la somme de ses paiements.
+    """
+
+    def __init__(self, queue=None, batch_size: Optional[int] = None):
+        self.queue = queue or get_webhook_queue()
+        self.batch_size = batch_size or settings.WEBHOOK_BATCH_SIZE
+        self.spool = LocalSpool(settings.WEBHOOK_SPOOL_DIR)
+
+    def run(self, once: bool = False, timeout: float = 5.0) -> Dict:
+        """
+        Vide la file en continu (ou une seule fois avec once=True)
+        Returns:
+            Dict: Compteurs cumulés (messages, paiements, prêts, échecs)
+        """
+        stats = defaultdict(int)
+        while True:
+            stats['spooled'] += self.spool.drain_into(self.queue)
+            messages = self.queue.fetch(self.batch_size, timeout)
+            if messages:
+                for key, value in self.process(messages).items():
+                    stats[key] += value
+            elif once:
+                break
+        return dict(stats)
+
+    def process(self, messages: List[QueuedWebhook]) -> Dict:
+        """Traite un lot et acquitte les messages traités"""
+        parsed, failed = [], []
+        for message in messages:
+            try:
+                data = json_codec.loads(message.body)
+                payment = normalize_payment_data(message.provider, data)
+                payment['amount'] = Decimal(str(payment['amount']))
+                parsed.append((message, data, payment))
+            except (ValueError, KeyError, TypeError, AttributeError, ArithmeticError) as e:
+                failed.append((message, f"Notification invalide: {e}"))
+
+        try:
+            posted = self._post(parsed)
+        except Exception:
+            # Un message fautif ne doit pas bloquer le lot: reprise message par message
+            logging.exception("Échec du lot de webhooks, traitement unitaire")
+            posted = {'payments': 0, 'loans': 0}
+            for item in parsed:
+                try:
+                    result = self._post([item])
+                    posted['payments'] += result['payments']
+                    posted['loans'] += result['loans']
+                except Exception as e:
+                    failed.append((item[0], str(e)))
+
+        failed_ids = {message.id for message, _ in failed}
+        for message, error in failed:
+            self.queue.fail(message, error)
+        self.queue.ack([m for m in messages if m.id not in failed_ids])
+
+        return {'messages': len(messages), 'failed': len(failed), **posted}
+
+    def _post(self, items) -> Dict:
+        """Insère les paiements et met à jour chaque prêt une seule fois, en une transaction"""
+        if not items:
+            return {'payments': 0, 'loans': 0}
+
+        rows, seen = [], set()
+        for message, data, payment in items:
+            key = (message.provider, str(payment['transaction_id']))
+            if key in seen:
+                continue
+            seen.add(key)
+            rows.append({
+                'id': str(uuid.uuid4()),
+                'loan_id': payment['loan_id'],
+                'amount': payment['amount'],
+                'payment_method': f"{message.provider}_MOBILE",
+                'receipt_number': payment['transaction_id'],
+                'payment_date': datetime.utcnow(),
+                'provider': message.provider,
+                'transaction_id': key[1],
+                'details': {'provider': message.provider, 'raw_data': data}
+            })
+
+        with get_db() as db:
+            inserted = db.execute(
+                insert(Payment)
+                .values(rows)
+                .on_conflict_do_nothing(constraint='unique_provider_transaction')
+                .returning(Payment.id, Payment.loan_id, Payment.amount, Payment.provider, Payment.transaction_id)
+            ).all()
+
+            by_loan = defaultdict(list)
+            for row in inserted:
+                by_loan[row.loan_id].append(row)
+            # Ordre stable des verrous entre workers concurrents; un paiement est imputé
+            # à la suite du précédent, la répartition de chacun est enregistrée
+            parts = []
+            for loan_id in sorted(by_loan, key=str):
+                payments = by_loan[loan_id]
+                allocations = post_loan_payments(db, loan_id, [row.amount for row in payments])
+                parts.extend(
+                    {'id': row.id, **allocation.as_columns()} for row, allocation in zip(payments, allocations)
+                )
+            if parts:
+                db.bulk_update_mappings(Payment, parts)
+
+            recorded = {(row.provider, row.transaction_id) for row in inserted}
+            db.add_all([
+                AuditLog(
+                    id=str(uuid.uuid4()),
+                    event_type='WEBHOOK',
+                    provider=message.provider,
+                    status='Paiement enregistré' if (message.provider, str(payment['transaction_id'])) in recorded
+                    else 'Paiement déjà enregistré',
+                    ip_address=message.ip_address,
+                    user_agent=message.user_agent,
+                    metadata={'data': payment | {'amount': str(payment['amount'])}, 'queued_id': message.id}
+                )
+                for message, data, payment in items
+            ])
+            db.commit()
+
+        return {'payments': len(inserted), 'loans': len(by_loan)}
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+# KREDILAKAY/benchmarks/bench_contracts.py
+"""
+Benchmark de la génération des contrats de prêt: mise en page Platypus complète
+de chaque contrat (ancienne implémentation de PDFGenerator.generate_contract)
+contre le modèle précompilé de app.services.contract_template, où seuls les
+champs client et prêt sont dessinés.
+
+Usage:
+    python benchmarks/bench_contracts.py --contracts 200
+"""
+import argparse
+import random
+import time
+import uuid
+from io import BytesIO
+
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.units import inch
+from reportlab.pdfgen import canvas
+from reportlab.platypus import Image, PageBreak, Paragraph, SimpleDocTemplate, Spacer
+
+from app.services.contract_template import CONTRACT_TEMPLATE_VERSION, ContractTemplate, contract_fields
+from app.services.pdf_assets import pdf_assets
+from app.services.pdf_utils import PDFGenerator
+
+
+def platypus_contract(loan_data: dict, client_data: dict, signature_img: bytes = None) -> BytesIO:
+    """Contrat mis en page de zéro, comme avant le modèle précompilé"""
+    styles = pdf_assets.stylesheet('contract')
+    fields = contract_fields(loan_data, client_data)
+    buffer = BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=letter, title=f"Contrat KrediLakay {loan_data['id']}",
+                            author="Système KrediLakay")
+
+    story = []
+    logo = pdf_assets.logo()
+    if logo:
+        story.append(Image(BytesIO(logo), width=2*inch, height=1*inch))
+    story += [Spacer(1, 0.5*inch), Paragraph("CONTRAT DE PRÊT", styles['Title']), Spacer(1, 0.3*inch)]
+    if client_data.get('photo_path'):
+        story += [Image(client_data['photo_path'], width=1.5*inch, height=1.5*inch), Spacer(1, 0.2*inch)]
+    for label, name in [('Client', 'full_name'), ('ID', 'id'), ('Téléphone', 'phone'), ('Adresse', 'address')]:
+        story.append(Paragraph(f"<b>{label}:</b> {fields[name]}", styles['Kreyol']))
+    story.append(Spacer(1, 0.3*inch))
+    for label, name in [('Montant', 'amount'), ('Durée', 'duration_days'),
+                        ('Taux journalier', 'daily_interest_rate'), ('Date', 'date')]:
+        story.append(Paragraph(f"<b>{label}:</b> {fields[name]}", styles['Kreyol']))
+    story += [Spacer(1, 0.5*inch),
+              Paragraph("<i>Veuillez lire attentivement les termes ci-dessous</i>", styles['Kreyol']),
+              PageBreak()]
+
+    terms = [
+        f"<b>1. Montant du Prêt:</b> {fields['clause_amount']}",
+        f"<b>2. Durée:</b> {fields['clause_duration_days']}",
+        f"<b>3. Intérêts:</b> {fields['clause_daily_interest_rate']}",
+        "<b>4. Pénalités:</b> En cas de retard, une pénalité de 2% par jour sera appliquée.",
+        "<b>5. Droit Haïtien:</b> Ce contrat est régi par les lois de la République d'Haïti."
+    ]
+    for term in terms:
+        story += [Paragraph(term, styles['Kreyol']), Spacer(1, 0.2*inch)]
+
+    if signature_img:
+        story += [PageBreak(), Paragraph("<b>Signature du Client</b>", styles['Title']), Spacer(1, 0.5*inch),
+                  Image(BytesIO(signature_img), width=3*inch, height=1*inch), Spacer(1, 0.2*inch),
+                  Paragraph("_"*50, styles['Kreyol']), Paragraph("<i>Signature du client</i>", styles['Kreyol'])]
+
+    doc.build(story)
+    return buffer
+
+
+def template_contract(template: ContractTemplate, loan_data: dict, client_data: dict,
+                      signature_img: bytes = None) -> BytesIO:
+    buffer = BytesIO()
+    c = canvas.Canvas(buffer, pagesize=letter)
+    template.render(c, loan_data, client_data, signature_img)
+    c.save()
+    return buffer
+
+
+def cohort(rng: random.Random, count: int):
+    names = ['Jean-Baptiste', 'Pierre', 'Joseph', 'Louis', 'Charles', 'Etienne', 'Desrosiers']
+    streets = ['Rue Capois', 'Avenue John Brown', 'Rue Pavée', 'Route de Delmas', 'Rue Grégoire']
+    return [
+        (
+            {
+                'id': str(uuid.uuid4()),
+                'amount': f"{rng.randint(500, 100_000)}.00",
+                'duration_days': rng.choice([30, 60, 90, 180]),
+                'daily_interest_rate': rng.choice([0.003, 0.005, 0.008])
+            },
+            {
+                'id': str(uuid.uuid4()),
+                'full_name': f"{rng.choice(['Marie', 'Jacques', 'Rose', 'Wilner'])} {rng.choice(names)}",
+                'phone': f"509{rng.randint(30000000, 49999999)}",
+                'address': f"{rng.randint(1, 250)}, {rng.choice(streets)}, Port-au-Prince",
+                'photo_path': None
+            }
+        )
+        for _ in range(count)
+    ]
+
+
+def run(name: str, contracts, build) -> float:
+    started = time.perf_counter()
+    size = 0
+    for loan_data, client_data in contracts:
+        size += len(build(loan_data, client_data).getbuffer())
+    elapsed = time.perf_counter() - started
+    print(f"  {name:<28} {elapsed * 1000 / len(contracts):7.2f} ms/contrat   "
+          f"{len(contracts) / elapsed:7.0f} contrats/s   {size / len(contracts) / 1024:6.1f} Ko")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--contracts', type=int, default=200, help="Contrats générés par variante")
+    parser.add_argument('--signature', help="Image de signature (PNG) ajoutée à chaque contrat")
+    parser.add_argument('--seed', type=int, default=2024)
+    args = parser.parse_args()
+
+    signature_img = None
+    if args.signature:
+        with open(args.signature, 'rb') as f:
+            signature_img = f.read()
+    contracts = cohort(random.Random(args.seed), args.contracts)
+    pdf_assets.warm()
+
+    started = time.perf_counter()
+    template = ContractTemplate()
+    print(f"Modèle {CONTRACT_TEMPLATE_VERSION} compilé en {(time.perf_counter() - started) * 1000:.1f} ms\n")
+
+    print(f"Mise en page de {args.contracts} contrats")
+    platypus = run('Platypus complet', contracts, lambda l, c: platypus_contract(l, c, signature_img))
+    compiled = run('Modèle précompilé', contracts, lambda l, c: template_contract(template, l, c, signature_img))
+    print(f"  gain x{platypus / compiled:.1f}")
+
+    # Contrat complet, finalisation (métadonnées, QR code) comprise
+    from bench_finalize import legacy_finalize
+
+    generator = PDFGenerator()
+    print("\nPDFGenerator.render_contract (finalisation comprise)")
+    platypus = run('Platypus complet', contracts,
+                   lambda l, c: legacy_finalize(platypus_contract(l, c, signature_img), l['id']))
+    compiled = run('Modèle précompilé', contracts, lambda l, c: generator.render_contract(l, c, signature_img))
+    print(f"  gain x{platypus / compiled:.1f}")
+
+
+if __name__ == '__main__':
+    main()
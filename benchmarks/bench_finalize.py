@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+# KREDILAKAY/benchmarks/bench_finalize.py
+"""
+Benchmark de la finalisation des contrats (métadonnées + QR code de vérification).
+Avant: contrat écrit, relu par PdfReader, recopié page à page dans un PdfWriter,
+QR code rendu en PNG puis dessiné sur un second canvas relu et fusionné sur
+chaque page (legacy_finalize). Après: métadonnées et QR code vectoriel posés
+sur le canvas du contrat, écrit en une seule passe ReportLab.
+
+Usage:
+    python benchmarks/bench_finalize.py --contracts 200
+"""
+import argparse
+import random
+from datetime import datetime
+from io import BytesIO
+
+import qrcode
+from PyPDF2 import PdfReader, PdfWriter
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.utils import ImageReader
+from reportlab.pdfgen import canvas
+
+from bench_contracts import cohort, run, template_contract
+from app.services.contract_template import get_contract_template
+from app.services.pdf_assets import pdf_assets
+from app.services.pdf_utils import PDFGenerator
+from config import settings
+
+
+def legacy_finalize(buffer: BytesIO, loan_id) -> BytesIO:
+    """Ancienne finalisation de PDFGenerator (_finalize_pdf + _add_qr_code)"""
+    buffer.seek(0)
+    pdf_reader = PdfReader(buffer)
+    pdf_writer = PdfWriter()
+    for page in pdf_reader.pages:
+        pdf_writer.add_page(page)
+    pdf_writer.add_metadata({
+        '/Title': f'Contrat KrediLakay {loan_id}',
+        '/Author': 'Système KrediLakay',
+        '/Creator': 'KrediLakay PDF Generator',
+        '/Producer': 'ReportLab + PyPDF2',
+        '/CreationDate': datetime.now().strftime("D:%Y%m%d%H%M%S")
+    })
+
+    qr = qrcode.QRCode(version=1, error_correction=qrcode.constants.ERROR_CORRECT_L, box_size=4, border=2)
+    qr.add_data(f"{settings.BASE_URL}/verify-contract?loan={loan_id}")
+    qr.make(fit=True)
+    qr_buffer = BytesIO()
+    qr.make_image(fill_color="black", back_color="white").save(qr_buffer, format='PNG')
+    qr_buffer.seek(0)
+
+    packet = BytesIO()
+    can = canvas.Canvas(packet, pagesize=letter)
+    can.drawImage(ImageReader(qr_buffer), 450, 50, width=100, height=100)
+    can.save()
+    packet.seek(0)
+    qr_pdf = PdfReader(packet)
+    for page in pdf_writer.pages:
+        page.merge_page(qr_pdf.pages[0])
+
+    output_buffer = BytesIO()
+    pdf_writer.write(output_buffer)
+    output_buffer.seek(0)
+    return output_buffer
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--contracts', type=int, default=200, help="Contrats générés par variante")
+    parser.add_argument('--signature', help="Image de signature (PNG) ajoutée à chaque contrat")
+    parser.add_argument('--seed', type=int, default=2024)
+    args = parser.parse_args()
+
+    signature_img = None
+    if args.signature:
+        with open(args.signature, 'rb') as f:
+            signature_img = f.read()
+    contracts = cohort(random.Random(args.seed), args.contracts)
+    pdf_assets.warm()
+    template = get_contract_template()
+    generator = PDFGenerator()
+
+    print(f"PDFGenerator.render_contract, {args.contracts} contrats")
+    legacy = run('Relecture + fusion QR PNG', contracts,
+                 lambda l, c: legacy_finalize(template_contract(template, l, c, signature_img), l['id']))
+    single = run('Passe unique, QR vectoriel', contracts,
+                 lambda l, c: generator.render_contract(l, c, signature_img))
+    print(f"  gain x{legacy / single:.1f}")
+
+
+if __name__ == '__main__':
+    main()
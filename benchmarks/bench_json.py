@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+# KREDILAKAY/benchmarks/bench_json.py
+"""
+Benchmark de la sérialisation JSON des réponses volumineuses (échéanciers,
+journaux d'audit): encodeur standard avec conversion des Decimal/UUID/datetime
+contre app.services.json_codec (orjson si installé), et analyse des corps de
+webhooks.
+
+Usage:
+    python benchmarks/bench_json.py --loans 200 --audit 20000
+"""
+import argparse
+import json
+import random
+import time
+import uuid
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+from app.services import json_codec
+
+
+def stdlib_default(obj):
+    """Conversion équivalente à json_codec pour l'encodeur standard"""
+    if isinstance(obj, Decimal):
+        return float(obj)
+    if isinstance(obj, uuid.UUID):
+        return str(obj)
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    raise TypeError(type(obj).__name__)
+
+
+def schedules(rng: random.Random, loans: int):
+    start = date(2026, 1, 1)
+    result = []
+    for _ in range(loans):
+        days = rng.randint(30, 365)
+        amount = Decimal(rng.randint(500_00, 100_000_00)).scaleb(-2)
+        daily = (amount / days).quantize(Decimal('.01'))
+        result.append({
+            'loan_id': uuid.uuid4(),
+            'schedule': [
+                {
+                    'day_number': day,
+                    'due_date': start + timedelta(days=day),
+                    'amount_due': daily,
+                    'remaining_balance': amount - daily * day
+                }
+                for day in range(1, days + 1)
+            ]
+        })
+    return result
+
+
+def audit_entries(rng: random.Random, count: int):
+    now = datetime(2026, 3, 1)
+    return [
+        {
+            'id': uuid.uuid4(),
+            'event_type': 'WEBHOOK',
+            'provider': rng.choice(['NATCOM_PAY', 'DIGICEL_PAY', 'UNIBANK']),
+            'status': 'Paiement enregistré',
+            'created_at': now + timedelta(seconds=i),
+            'metadata': {'data': {'amount': Decimal(rng.randint(100_00, 5_000_00)).scaleb(-2), 'loan_id': str(uuid.uuid4())}}
+        }
+        for i in range(count)
+    ]
+
+
+def timed(fn, repeat: int) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def compare(name: str, payload, repeat: int):
+    stdlib = timed(lambda: json.dumps(payload, default=stdlib_default).encode('utf-8'), repeat)
+    codec = timed(lambda: json_codec.dumps(payload), repeat)
+    size = len(json_codec.dumps(payload))
+    print(f"  {name:<22} {size / 1e6:7.2f} Mo   json {stdlib * 1000:8.1f} ms   "
+          f"{json_codec.BACKEND} {codec * 1000:8.1f} ms   x{stdlib / codec:.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--loans', type=int, default=200, help="Échéanciers dans la réponse")
+    parser.add_argument('--audit', type=int, default=20000, help="Entrées du journal d'audit")
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=2024)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    print(f"Encodage des réponses (meilleur de {args.repeat})")
+    compare('Échéanciers', schedules(rng, args.loans), args.repeat)
+    audit = audit_entries(rng, args.audit)
+    compare("Journal d'audit", audit, args.repeat)
+
+    bodies = [json_codec.dumps(entry['metadata']) for entry in audit]
+    stdlib = timed(lambda: [json.loads(body) for body in bodies], args.repeat)
+    codec = timed(lambda: [json_codec.loads(body) for body in bodies], args.repeat)
+    print(f"\nAnalyse de {len(bodies)} corps de webhooks   json {stdlib * 1000:8.1f} ms   "
+          f"{json_codec.BACKEND} {codec * 1000:8.1f} ms   x{stdlib / codec:.1f}")
+
+
+if __name__ == '__main__':
+    main()
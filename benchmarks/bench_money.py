@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+# KREDILAKAY/benchmarks/bench_money.py
+"""
+Benchmark du noyau monétaire en centimes entiers (app.services.money).
+
+1. Vérifie sur des échantillons aléatoires que les calculs Money donnent,
+   au centime près, le même résultat que les formules Decimal d'origine
+   (termes du prêt, intérêts du modèle Loan, imputation en cascade des paiements,
+   pénalités de retard cumulées, échéancier).
+2. Compare le temps de génération d'échéanciers en masse: boucle Decimal
+   d'origine (quantize à chaque ligne) contre ScheduleRule + Money.
+
+Usage:
+    python benchmarks/bench_money.py --loans 5000 --cases 20000
+"""
+import argparse
+import random
+import sys
+import time
+from datetime import date, timedelta
+from decimal import Decimal, ROUND_DOWN
+from types import SimpleNamespace
+
+from app.models import Loan
+from app.services.allocation import AllocationEngine
+from app.services.loan_ledger import LEDGER_FIELDS
+from app.services.loan_service import LoanService
+from app.services.money import Money
+from app.services.penalty_accrual import PenaltyAccrualEngine
+from app.services.schedule import ScheduleRule
+
+CENT = Decimal('.01')
+
+
+def random_amount(rng: random.Random) -> Decimal:
+    return Decimal(rng.randint(500_00, 1_000_000_00)).scaleb(-2)
+
+
+def random_rate(rng: random.Random) -> Decimal:
+    return Decimal(rng.randint(500, 3000)).scaleb(-4)
+
+
+# --- Formules Decimal d'origine -------------------------------------------
+
+def decimal_loan_terms(amount, interest_rate, duration_days):
+    total_interest = (amount * interest_rate * duration_days) / Decimal('365')
+    total_due = amount + total_interest
+    return {
+        'amount': amount.quantize(CENT),
+        'total_interest': total_interest.quantize(CENT),
+        'total_due': total_due.quantize(CENT),
+        'daily_payment': (total_due / duration_days).quantize(CENT)
+    }
+
+
+def decimal_total_interest(amount, interest_rate, duration):
+    monthly_rate = Decimal(interest_rate) / Decimal(100) / Decimal(12)
+    return round(amount * monthly_rate * duration, 2)
+
+
+def decimal_waterfall(total_due, principal, penalties, paid):
+    """Cascade pénalités, intérêts, principal en Decimal"""
+    parts, left = {}, paid
+    for field, due in (
+        ('paid_penalties', penalties),
+        ('paid_interest', total_due - principal),
+        ('paid_principal', principal)
+    ):
+        parts[field] = min(left, due)
+        left -= parts[field]
+    parts['credit_balance'] = left
+    parts['outstanding_balance'] = total_due - parts['paid_principal'] - parts['paid_interest']
+    return parts
+
+
+def money_waterfall(total_due, principal, penalties, paid):
+    loan = SimpleNamespace(
+        total_due=total_due, amount=principal, accrued_penalties=penalties,
+        paid_penalties=0, paid_interest=0, paid_principal=0, credit_balance=0
+    )
+    AllocationEngine('penalties,interest,principal').apply(loan, Money.from_decimal(paid))
+    return {field: getattr(loan, field) for field in LEDGER_FIELDS}
+
+
+def money_penalties(total_due, rate, days):
+    """Total des écritures de PenaltyAccrualEngine sur `days` jours de retard"""
+    start = date(2026, 1, 1)
+    engine = PenaltyAccrualEngine(daily_rate=rate, grace_period=0)
+    entries = engine._build_entries([(0, start, 0, total_due, None)], start + timedelta(days=days))
+    return sum(entry['amount'] for entry in entries)
+
+
+def decimal_rule_schedule(total_due, count):
+    amount = (total_due / count).quantize(CENT, rounding=ROUND_DOWN)
+    remainder = total_due - amount * count
+    return [amount] * (count - 1) + [(amount + remainder).quantize(CENT)]
+
+
+def legacy_schedule(total_due, duration_days, start_date):
+    """Boucle d'origine de LoanService.generate_payment_schedule"""
+    schedule = []
+    daily_amount = total_due / Decimal(duration_days)
+    remaining_balance = total_due
+    for day in range(1, duration_days + 1):
+        due_date = start_date + timedelta(days=day)
+        remaining_balance -= daily_amount
+        schedule.append({
+            'day_number': day,
+            'due_date': due_date.strftime('%Y-%m-%d'),
+            'amount_due': daily_amount.quantize(CENT),
+            'remaining_balance': max(remaining_balance, Decimal('0')).quantize(CENT)
+        })
+    return schedule
+
+
+def money_rule(total_due, count, start_date=date(2026, 1, 1)):
+    amount, remainder = Money.from_decimal(total_due).split(count)
+    return ScheduleRule(start_date, 1, amount, count, remainder)
+
+
+def money_schedule(rule):
+    """Même boucle que LoanService.generate_payment_schedule"""
+    schedule = []
+    remaining = rule.total.cents
+    for number, due_date, amount in rule.expand():
+        remaining -= amount.cents
+        schedule.append({
+            'day_number': number * rule.step,
+            'due_date': due_date.isoformat(),
+            'amount_due': amount.to_decimal(),
+            'remaining_balance': Money(remaining).to_decimal()
+        })
+    return schedule
+
+
+# --- Vérifications d'équivalence --------------------------------------------
+
+def check(name, cases, expected_fn, actual_fn):
+    """Compare les deux implémentations cas par cas (égalité au centime)"""
+    failures = []
+    for case in cases:
+        expected, actual = expected_fn(*case), actual_fn(*case)
+        if expected != actual:
+            failures.append((case, expected, actual))
+    status = 'OK' if not failures else f'{len(failures)} ÉCART(S)'
+    print(f"  {name:<32} {len(cases):>7} cas  {status}")
+    for case, expected, actual in failures[:5]:
+        print(f"    {case}: attendu {expected}, obtenu {actual}")
+    return not failures
+
+
+def run_checks(rng: random.Random, n: int) -> bool:
+    print("Équivalence Money / Decimal")
+    ok = True
+
+    cases = [(random_amount(rng), random_rate(rng), rng.randint(1, 365)) for _ in range(n)]
+    ok &= check(
+        'LoanService.calculate_loan_terms', cases,
+        decimal_loan_terms,
+        lambda a, r, d: {
+            k: v for k, v in LoanService.calculate_loan_terms(
+                SimpleNamespace(_determine_interest_rate=lambda _: r), a, d, Decimal('0.5')
+            ).items() if k != 'interest_rate'
+        }
+    )
+
+    cases = [(random_amount(rng), Decimal(rng.randint(500, 3000)).scaleb(-2), rng.randint(1, 24)) for _ in range(n)]
+    ok &= check(
+        'Loan.total_interest', cases,
+        decimal_total_interest,
+        lambda a, r, d: Loan.total_interest.fget(SimpleNamespace(amount=a, interest_rate=r, duration=d))
+    )
+
+    cases = []
+    for _ in range(n):
+        principal = random_amount(rng)
+        total_due = (principal * (1 + random_rate(rng))).quantize(CENT)
+        penalties = (principal * Decimal(rng.random() * 0.1)).quantize(CENT)
+        cases.append((total_due, principal, penalties, ((total_due + penalties) * Decimal(rng.random() * 1.2)).quantize(CENT)))
+    ok &= check(
+        'AllocationEngine', cases,
+        decimal_waterfall,
+        money_waterfall
+    )
+
+    cases = [(random_amount(rng), Decimal('0.02'), rng.randint(1, 90)) for _ in range(max(n // 20, 1))]
+    ok &= check(
+        'Pénalités de retard cumulées', cases,
+        lambda total_due, rate, days: (total_due * rate * days).quantize(CENT),
+        money_penalties
+    )
+
+    cases = [(random_amount(rng), rng.randint(1, 365)) for _ in range(max(n // 20, 1))]
+    ok &= check(
+        'ScheduleRule (montants)', cases,
+        decimal_rule_schedule,
+        lambda total, count: [amount.to_decimal() for _, _, amount in money_rule(total, count).expand()]
+    )
+
+    return ok
+
+
+def run_benchmark(rng: random.Random, loans: int):
+    print(f"\nGénération d'échéanciers pour {loans} prêts")
+    start_date = date(2026, 1, 1)
+    terms = [(random_amount(rng), rng.randint(30, 365)) for _ in range(loans)]
+
+    started = time.perf_counter()
+    legacy_rows = sum(len(legacy_schedule(total, days, start_date)) for total, days in terms)
+    legacy_time = time.perf_counter() - started
+
+    started = time.perf_counter()
+    money_rows = 0
+    for total, days in terms:
+        money_rows += len(money_schedule(money_rule(total, days, start_date)))
+    money_time = time.perf_counter() - started
+
+    print(f"  Decimal (boucle d'origine)  {legacy_time:8.3f}s  {legacy_rows / legacy_time:>12,.0f} lignes/s")
+    print(f"  ScheduleRule + Money        {money_time:8.3f}s  {money_rows / money_time:>12,.0f} lignes/s")
+    print(f"  Accélération                x{legacy_time / money_time:.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--loans', type=int, default=5000, help="Nombre de prêts pour le benchmark")
+    parser.add_argument('--cases', type=int, default=20000, help="Nombre de cas par vérification")
+    parser.add_argument('--seed', type=int, default=2024)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    if not run_checks(rng, args.cases):
+        sys.exit(1)
+    run_benchmark(rng, args.loans)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+# KREDILAKAY/benchmarks/bench_pdf_render.py
+"""
+Latence de l'API pendant la génération de contrats. Une boucle asyncio joue le
+rôle d'un worker gevent: une sonde mesure le retard de réveils programmés toutes
+les 10 ms (les requêtes légères servies par le worker) pendant que des contrats
+sont rendus soit dans la boucle (rendu en ligne, comme avant), soit par le pool
+de app.services.pdf_render.
+
+Usage:
+    python benchmarks/bench_pdf_render.py --contracts 100 --workers 2
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import time
+
+from bench_contracts import cohort
+from app.services.pdf_render import PDFRenderService, _run_job, _warm
+
+PROBE_INTERVAL = 0.010
+
+
+async def probe(stop: asyncio.Event, lags: list):
+    """Réveils toutes les 10 ms: le retard observé est celui d'une requête légère"""
+    while not stop.is_set():
+        scheduled = time.perf_counter() + PROBE_INTERVAL
+        await asyncio.sleep(PROBE_INTERVAL)
+        lags.append(time.perf_counter() - scheduled)
+
+
+async def inline(contracts, signature_img):
+    for loan_data, client_data in contracts:
+        _run_job('contract', (loan_data, client_data, signature_img), {})
+        await asyncio.sleep(0)
+
+
+async def pooled(renderer: PDFRenderService, contracts, signature_img, concurrency: int):
+    pending = asyncio.Semaphore(concurrency)
+
+    async def one(loan_data, client_data):
+        async with pending:
+            await asyncio.wrap_future(renderer.submit('contract', loan_data, client_data, signature_img))
+
+    await asyncio.gather(*(one(loan_data, client_data) for loan_data, client_data in contracts))
+
+
+async def measure(name: str, render):
+    stop, lags = asyncio.Event(), []
+    prober = asyncio.ensure_future(probe(stop, lags))
+    await asyncio.sleep(0.1)
+    started = time.perf_counter()
+    count = await render
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await prober
+
+    lags = sorted(lags)
+    p99 = lags[int(len(lags) * 0.99) - 1] if lags else 0
+    print(f"  {name:<16} {count / elapsed:7.1f} contrats/s   retard API p50 {statistics.median(lags) * 1000:7.1f} ms   "
+          f"p99 {p99 * 1000:7.1f} ms   max {lags[-1] * 1000:7.1f} ms")
+
+
+async def count_after(coro, count: int) -> int:
+    await coro
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--contracts', type=int, default=100)
+    parser.add_argument('--workers', type=int, default=2, help="Processus du pool de rendu")
+    parser.add_argument('--concurrency', type=int, default=8, help="Rendus demandés simultanément")
+    parser.add_argument('--signature', help="Image de signature (PNG) ajoutée à chaque contrat")
+    parser.add_argument('--seed', type=int, default=2024)
+    args = parser.parse_args()
+
+    signature_img = None
+    if args.signature:
+        with open(args.signature, 'rb') as f:
+            signature_img = f.read()
+    contracts = cohort(random.Random(args.seed), args.contracts)
+
+    _warm()
+    renderer = PDFRenderService(workers=args.workers, max_pending=args.concurrency * 2)
+    renderer.start()
+
+    print(f"{args.contracts} contrats, sonde de latence toutes les {PROBE_INTERVAL * 1000:.0f} ms")
+    try:
+        asyncio.run(measure('Rendu en ligne', count_after(inline(contracts, signature_img), len(contracts))))
+        asyncio.run(measure(
+            f"Pool ({args.workers} proc.)",
+            count_after(pooled(renderer, contracts, signature_img, args.concurrency), len(contracts))
+        ))
+    finally:
+        renderer.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+# KREDILAKAY/benchmarks/bench_watermark.py
+"""
+Benchmark du filigrane appliqué à chaque téléchargement de document.
+Avant: motif de 121 chaînes dessiné sur un canvas neuf, relu par PdfReader puis
+fusionné (merge_page, qui réanalyse les flux des deux pages) à chaque appel,
+le suffixe UID étant inclus dans chaque chaîne. Ensuite: motif en cache (LRU)
+sous forme de Form XObject, mention UID sur un petit calque séparé, calques
+référencés par chaque page sans réanalyse de son contenu, document réécrit par
+PdfWriter. Enfin: calques et métadonnées ajoutés par mise à jour incrémentale
+(app.services.pdf_incremental), sans réécrire le document d'origine.
+
+Usage:
+    python benchmarks/bench_watermark.py --documents 200 --users 50
+    python benchmarks/bench_watermark.py --documents 20 --pages 120   # dossiers volumineux
+"""
+import argparse
+import random
+import time
+import tracemalloc
+from io import BytesIO
+
+from PyPDF2 import PdfReader, PdfWriter
+from reportlab.lib.pagesizes import letter
+from reportlab.pdfgen import canvas
+
+from bench_contracts import cohort
+from app.services.pdf_utils import PDFGenerator
+from app.services.pdf_overlay import stamp_page
+from app.services.pdf_watermark import UID_NAME, WATERMARK_NAME, PDFWatermarker, _overlays
+
+
+def legacy_watermark(watermarker: PDFWatermarker, pdf_bytes: bytes, user_id: str) -> bytes:
+    """Ancien apply_watermark (type 'text'): calque reconstruit et fusionné à chaque appel"""
+    packet = BytesIO()
+    can = canvas.Canvas(packet, pagesize=letter)
+    watermarker._apply_text_watermark(can, f"{watermarker.watermark_config['text']} (UID:{user_id})")
+    can.save()
+    packet.seek(0)
+    watermark_page = PdfReader(packet).pages[0]
+
+    pdf_writer = PdfWriter()
+    for page in PdfReader(BytesIO(pdf_bytes)).pages:
+        page.merge_page(watermark_page)
+        pdf_writer.add_page(page)
+    watermarker._add_security_metadata(pdf_writer, user_id)
+    output_buffer = BytesIO()
+    pdf_writer.write(output_buffer)
+    return output_buffer.getvalue()
+
+
+def rewrite_watermark(watermarker: PDFWatermarker, pdf_bytes: bytes, user_id: str) -> bytes:
+    """Calques en cache, mais document entièrement réécrit par PdfWriter"""
+    text = watermarker.watermark_config['text']
+    pdf_writer = PdfWriter()
+    refs = {}
+    for page in PdfReader(BytesIO(pdf_bytes)).pages:
+        size = (round(float(page.mediabox.width), 2), round(float(page.mediabox.height), 2))
+        if size not in refs:
+            forms = {WATERMARK_NAME: watermarker._watermark_overlay('text', text, size),
+                     UID_NAME: watermarker._uid_overlay(user_id, size)}
+            refs[size] = {name: pdf_writer._add_object(form.clone(pdf_writer)) for name, form in forms.items()}
+        page = pdf_writer.add_page(page)
+        stamp_page(page, refs[size], pdf_writer._add_object)
+    watermarker._add_security_metadata(pdf_writer, user_id)
+    output_buffer = BytesIO()
+    pdf_writer.write(output_buffer)
+    return output_buffer.getvalue()
+
+
+def dossier(generator: PDFGenerator, contracts, pages: int, signature_img: bytes = None) -> bytes:
+    """Dossier de prêt d'au moins `pages` pages (contrats mis bout à bout)"""
+    pdf_writer = PdfWriter()
+    for loan_data, client_data in contracts:
+        for page in PdfReader(generator.render_contract(loan_data, client_data, signature_img)).pages:
+            pdf_writer.add_page(page)
+        if len(pdf_writer.pages) >= pages:
+            break
+    output_buffer = BytesIO()
+    pdf_writer.write(output_buffer)
+    return output_buffer.getvalue()
+
+
+def run(name: str, documents, users, watermark) -> float:
+    started = time.perf_counter()
+    size = 0
+    for i, pdf_bytes in enumerate(documents):
+        size += len(watermark(pdf_bytes, users[i % len(users)]))
+    elapsed = time.perf_counter() - started
+
+    # Pic mémoire d'un appel, mesuré à part (tracemalloc ralentit l'exécution)
+    tracemalloc.start()
+    watermark(documents[0], users[0])
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    print(f"  {name:<28} {elapsed * 1000 / len(documents):8.2f} ms/document   "
+          f"{len(documents) / elapsed:7.0f} documents/s   {size / len(documents) / 1024:7.1f} Ko   "
+          f"pic {peak / 1024 / 1024:6.1f} Mo")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--documents', type=int, default=200, help="Téléchargements simulés par variante")
+    parser.add_argument('--users', type=int, default=50, help="Utilisateurs distincts (mention UID)")
+    parser.add_argument('--pages', type=int, default=0, help="Pages par document (dossier de plusieurs contrats)")
+    parser.add_argument('--signature', help="Image de signature (PNG): contrats de 3 pages au lieu de 2")
+    parser.add_argument('--seed', type=int, default=2024)
+    args = parser.parse_args()
+
+    signature_img = None
+    if args.signature:
+        with open(args.signature, 'rb') as f:
+            signature_img = f.read()
+    rng = random.Random(args.seed)
+    generator = PDFGenerator()
+    if args.pages:
+        contracts = cohort(rng, args.pages)
+        documents = [dossier(generator, contracts, args.pages, signature_img)] * args.documents
+    else:
+        contracts = cohort(rng, min(args.documents, 20))
+        documents = [
+            generator.render_contract(l, c, signature_img).getvalue()
+            for l, c in (contracts[i % len(contracts)] for i in range(args.documents))
+        ]
+    users = [f"agent-{rng.randint(1000, 9999)}" for _ in range(args.users)]
+    watermarker = PDFWatermarker()
+
+    pages = len(PdfReader(BytesIO(documents[0])).pages)
+    print(f"Filigrane de {args.documents} documents de {pages} pages, {args.users} utilisateurs")
+    legacy = run('Calque reconstruit + fusion', documents, users,
+                 lambda pdf_bytes, user_id: legacy_watermark(watermarker, pdf_bytes, user_id))
+    rewrite = run('Calques en cache, réécriture', documents, users,
+                  lambda pdf_bytes, user_id: rewrite_watermark(watermarker, pdf_bytes, user_id))
+    incremental = run('Mise à jour incrémentale', documents, users,
+                      lambda pdf_bytes, user_id: watermarker.render_watermark(pdf_bytes, user_id=user_id))
+    print(f"  gain x{legacy / incremental:.1f} (x{rewrite / incremental:.1f} sur la réécriture)   "
+          f"(cache: {_overlays.hits} succès, {_overlays.misses} constructions)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+# KREDILAKAY/benchmarks/bench_webhooks.py
+"""
+Test de charge des webhooks de paiement.
+
+Des fournisseurs simulés (provider_standins) signent des notifications
+NATCOM_PAY / DIGICEL_PAY / UNIBANK réalistes et les envoient à
+/webhooks/payment/<provider> à un débit et une concurrence donnés.
+
+1. Charge HTTP: débit planifié (boucle ouverte), latences p50/p99 mesurées
+   depuis l'instant d'envoi prévu (les retards de file côté client comptent),
+   débit obtenu, codes de réponse et commits Postgres par webhook
+   (pg_stat_database.xact_commit, à mesurer sur une base isolée).
+2. Micro-benchmark en processus de _verify_signature et normalize_payment_data,
+   pour détecter les régressions sans serveur.
+
+Usage:
+    python benchmarks/bench_webhooks.py --url http://localhost:5000/api/v1 \\
+        --rate 200 --duration 30 --concurrency 32 --database-url $DATABASE_URL
+    python benchmarks/bench_webhooks.py --micro 50000
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+from types import SimpleNamespace
+from typing import Dict, List, Optional
+
+import requests
+
+from app.routes.webhooks import PROVIDERS, PaymentWebhook
+from app.services.webhook_queue import normalize_payment_data
+from provider_standins import ProviderStandIn
+
+try:
+    import psycopg2
+except ImportError:  # Sans psycopg2: pas de comptage des commits
+    psycopg2 = None
+
+
+def percentile(values: List[float], q: float) -> float:
+    if not values:
+        return float('nan')
+    ordered = sorted(values)
+    return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+
+# --- Base de données ----------------------------------------------------------
+
+def load_loan_ids(database_url: Optional[str], path: Optional[str], limit: int) -> List[str]:
+    """Prêts ciblés: fichier (un identifiant par ligne) ou prêts approuvés de la base"""
+    if path:
+        with open(path) as f:
+            return [line.strip() for line in f if line.strip()]
+    if not (database_url and psycopg2):
+        sys.exit("--loan-ids ou --database-url (psycopg2) requis pour choisir les prêts ciblés")
+    with psycopg2.connect(database_url) as conn, conn.cursor() as cur:
+        cur.execute(
+            "SELECT id FROM kredilakay.loans WHERE status = 'APPROVED' ORDER BY random() LIMIT %s",
+            (limit,)
+        )
+        return [str(row[0]) for row in cur.fetchall()]
+
+
+def commit_count(database_url: Optional[str]) -> Optional[int]:
+    """Transactions validées de la base depuis le dernier reset des statistiques"""
+    if not (database_url and psycopg2):
+        return None
+    with psycopg2.connect(database_url) as conn, conn.cursor() as cur:
+        cur.execute("SELECT pg_stat_clear_snapshot()")
+        cur.execute("SELECT xact_commit FROM pg_stat_database WHERE datname = current_database()")
+        return cur.fetchone()[0]
+
+
+# --- Charge HTTP --------------------------------------------------------------
+
+class LoadRun:
+    """
+    Génère les notifications selon un planning fixe (rate/s) et les envoie avec
+    `concurrency` threads; chaque thread réserve le prochain créneau, attend son
+    heure et mesure la latence depuis ce créneau.
+    """
+
+    def __init__(self, url: str, standins: Dict[str, ProviderStandIn], loan_ids: List[str],
+                 rate: float, duration: float, concurrency: int, replay_ratio: float,
+                 invalid_ratio: float, amount_range, seed: int, timeout: float):
+        self.url = url.rstrip('/')
+        self.standins = list(standins.values())
+        self.loan_ids = loan_ids
+        self.rate = rate
+        self.total = int(rate * duration)
+        self.concurrency = concurrency
+        self.replay_ratio = replay_ratio
+        self.invalid_ratio = invalid_ratio
+        self.amount_range = amount_range
+        self.timeout = timeout
+        self.rng = random.Random(seed)
+        self._next = 0
+        self._sent = []  # Notifications déjà envoyées (fournisseur, prêt, montant, transaction), pour les rejeux
+        self._lock = threading.Lock()
+        self.latencies, self.service_times = [], []
+        self.statuses = Counter()
+
+    def _claim(self):
+        """Prochain créneau et sa notification, ou None à la fin du planning"""
+        with self._lock:
+            if self._next >= self.total:
+                return None
+            slot = self._next
+            self._next += 1
+            roll = self.rng.random()
+            if self._sent and roll < self.replay_ratio:
+                standin, loan_id, amount, transaction_id = self.rng.choice(self._sent)
+            else:
+                standin = self.rng.choice(self.standins)
+                loan_id = self.rng.choice(self.loan_ids)
+                low, high = self.amount_range
+                amount = Decimal(self.rng.randint(low * 100, high * 100)).scaleb(-2)
+                transaction_id = f"LT{self.rng.getrandbits(64):016x}"
+                self._sent.append((standin, loan_id, amount, transaction_id))
+            tamper = self.rng.random() < self.invalid_ratio
+        body, headers = standin.notification(loan_id, amount, transaction_id, tamper=tamper)
+        return slot, standin.name, body, headers
+
+    def _worker(self, started: float):
+        session = requests.Session()
+        while True:
+            claimed = self._claim()
+            if claimed is None:
+                return
+            slot, provider, body, headers = claimed
+            scheduled = started + slot / self.rate
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+
+            sent = time.perf_counter()
+            try:
+                response = session.post(
+                    f"{self.url}/webhooks/payment/{provider}", data=body, headers=headers, timeout=self.timeout
+                )
+                status = response.status_code
+            except requests.RequestException as e:
+                status = type(e).__name__
+            done = time.perf_counter()
+
+            with self._lock:
+                self.statuses[status] += 1
+                self.latencies.append(done - scheduled)
+                self.service_times.append(done - sent)
+
+    def run(self) -> float:
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            for _ in range(self.concurrency):
+                pool.submit(self._worker, started)
+        return time.perf_counter() - started
+
+
+def run_load(args, standins):
+    loan_ids = load_loan_ids(args.database_url, args.loan_ids, args.loans)
+    if not loan_ids:
+        sys.exit("Aucun prêt approuvé à cibler")
+
+    load = LoadRun(
+        args.url, standins, loan_ids, args.rate, args.duration, args.concurrency,
+        args.replay_ratio, args.invalid_ratio, (args.min_amount, args.max_amount), args.seed, args.timeout
+    )
+    print(f"Charge: {load.total} notifications à {args.rate:g}/s, {args.concurrency} connexions, "
+          f"{len(loan_ids)} prêts, {len(standins)} fournisseurs")
+
+    commits_before = commit_count(args.database_url)
+    elapsed = load.run()
+    if commits_before is not None:
+        time.sleep(args.settle)  # Statistiques publiées par les backends avec un léger délai
+    commits_after = commit_count(args.database_url)
+
+    ms = 1000
+    print(f"\n  Durée                 {elapsed:8.2f}s")
+    print(f"  Débit obtenu          {len(load.latencies) / elapsed:8.1f} req/s (planifié {args.rate:g})")
+    print(f"  Latence p50           {percentile(load.latencies, 0.50) * ms:8.1f} ms")
+    print(f"  Latence p99           {percentile(load.latencies, 0.99) * ms:8.1f} ms")
+    print(f"  Service p50 / p99     {percentile(load.service_times, 0.50) * ms:8.1f} / "
+          f"{percentile(load.service_times, 0.99) * ms:.1f} ms")
+    print(f"  Réponses              {', '.join(f'{k}: {v}' for k, v in sorted(load.statuses.items(), key=str))}")
+    if commits_before is not None:
+        commits = commits_after - commits_before
+        print(f"  Commits Postgres      {commits} ({commits / max(len(load.latencies), 1):.2f} par webhook)")
+
+    errors = sum(v for k, v in load.statuses.items() if not isinstance(k, int) or k >= 500)
+    return errors == 0
+
+
+# --- Micro-benchmark en processus -------------------------------------------
+
+def run_micro(standins: Dict[str, ProviderStandIn], iterations: int, seed: int):
+    print(f"Micro-benchmark en processus ({iterations} notifications par fournisseur)")
+    rng = random.Random(seed)
+    for name, standin in standins.items():
+        notifications = []
+        for _ in range(iterations):
+            amount = Decimal(rng.randint(100_00, 25_000_00)).scaleb(-2)
+            body, headers = standin.notification(str(rng.getrandbits(64)), amount)
+            notifications.append((SimpleNamespace(data=body, headers=headers), body))
+
+        started = time.perf_counter()
+        valid = sum(PaymentWebhook._verify_signature(None, name, request) for request, _ in notifications)
+        verify_time = time.perf_counter() - started
+
+        payloads = [json.loads(body) for _, body in notifications]
+        started = time.perf_counter()
+        for data in payloads:
+            normalize_payment_data(name, data)
+        normalize_time = time.perf_counter() - started
+
+        if valid != iterations:
+            print(f"  {name}: {iterations - valid} signature(s) rejetée(s)")
+            return False
+        print(f"  {name:<12} _verify_signature {verify_time / iterations * 1e6:7.2f} µs   "
+              f"normalize_payment_data {normalize_time / iterations * 1e6:7.2f} µs")
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', default='http://localhost:5000/api/v1', help="Préfixe de l'API")
+    parser.add_argument('--rate', type=float, default=100, help="Notifications par seconde")
+    parser.add_argument('--duration', type=float, default=30, help="Durée du test en secondes")
+    parser.add_argument('--concurrency', type=int, default=16, help="Connexions simultanées")
+    parser.add_argument('--providers', default=','.join(PROVIDERS), help="Fournisseurs simulés")
+    parser.add_argument('--replay-ratio', type=float, default=0.02, help="Part de notifications rejouées")
+    parser.add_argument('--invalid-ratio', type=float, default=0.0, help="Part de signatures invalides")
+    parser.add_argument('--min-amount', type=int, default=100, help="Montant minimal (HTG)")
+    parser.add_argument('--max-amount', type=int, default=5000, help="Montant maximal (HTG)")
+    parser.add_argument('--loans', type=int, default=1000, help="Nombre de prêts ciblés")
+    parser.add_argument('--loan-ids', default=None, help="Fichier d'identifiants de prêts")
+    parser.add_argument('--database-url', default=os.getenv('DATABASE_URL'),
+                        help="Base pour choisir les prêts et compter les commits")
+    parser.add_argument('--settle', type=float, default=2.0,
+                        help="Attente avant la dernière lecture des commits (files asynchrones)")
+    parser.add_argument('--timeout', type=float, default=10.0)
+    parser.add_argument('--micro', type=int, default=0,
+                        help="Micro-benchmark en processus seulement, N notifications par fournisseur")
+    parser.add_argument('--seed', type=int, default=2024)
+    args = parser.parse_args()
+
+    names = [name.strip() for name in args.providers.split(',') if name.strip()]
+    standins = ProviderStandIn.from_providers({name: PROVIDERS[name] for name in names})
+
+    ok = run_micro(standins, args.micro, args.seed) if args.micro else run_load(args, standins)
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,243 @@
+# KREDILAKAY/benchmarks/provider_standins.py
+"""
+Fournisseurs de paiement simulés (NATCOM_PAY, DIGICEL_PAY, UNIBANK) pour les
+tests de charge: notifications au format de chaque fournisseur, signées en
+HMAC-SHA256 avec le secret et l'en-tête déclarés dans webhooks.PROVIDERS.
+
+Lancé en script, sert aussi d'API de décaissement locale: les demandes de
+DisbursementEngine sont vérifiées, limitées en débit (429 au-delà), puis
+confirmées après un délai par un appel signé à /webhooks/disbursement/<provider>.
+
+Usage:
+    python benchmarks/provider_standins.py --port 8900 --callback http://localhost:5000/api/v1
+    python run.py disburse --endpoint-base http://localhost:8900
+"""
+import argparse
+import hashlib
+import hmac
+import json
+import random
+import threading
+import time
+import uuid
+from decimal import Decimal
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Optional, Tuple
+
+
+def natcom_payload(transaction_id: str, loan_id: str, amount: Decimal) -> Dict:
+    return {
+        'transactionId': transaction_id,
+        'reference': f"KREDI_{loan_id}",
+        'amount': {'value': str(amount), 'currency': 'HTG'},
+        'status': 'SUCCESS',
+        'msisdn': f"509{random.randint(30000000, 49999999)}"
+    }
+
+
+def digicel_payload(transaction_id: str, loan_id: str, amount: Decimal) -> Dict:
+    return {
+        'txn_id': transaction_id,
+        'client_ref': loan_id,
+        'amount': str(amount),
+        'status': 'COMPLETED',
+        'wallet': f"509{random.randint(30000000, 49999999)}"
+    }
+
+
+def unibank_payload(transaction_id: str, loan_id: str, amount: Decimal) -> Dict:
+    return {
+        'event': 'payment.completed',
+        'payment': {
+            'id': transaction_id,
+            'reference': loan_id,
+            'amount': str(amount),
+            'currency': 'HTG'
+        }
+    }
+
+
+PAYLOADS: Dict[str, Callable[[str, str, Decimal], Dict]] = {
+    'NATCOM_PAY': natcom_payload,
+    'DIGICEL_PAY': digicel_payload,
+    'UNIBANK': unibank_payload
+}
+
+
+def payout_confirmation(provider: str, request: Dict, reference: str, success: bool) -> Dict:
+    """Confirmation de décaissement au format du fournisseur, pour une demande reçue"""
+    if provider == 'NATCOM_PAY':
+        return {
+            'requestId': request['requestId'],
+            'transactionId': reference,
+            'status': 'SUCCESS' if success else 'FAILED',
+            'reason': None if success else 'Portefeuille introuvable'
+        }
+    elif provider == 'DIGICEL_PAY':
+        return {
+            'txn_ref': request['txn_ref'],
+            'txn_id': reference,
+            'status': 'COMPLETED' if success else 'FAILED',
+            'reason': None if success else 'Wallet suspended'
+        }
+    return {
+        'event': 'payout.completed' if success else 'payout.failed',
+        'payout': {
+            'id': request['payout']['id'],
+            'transfer_id': reference,
+            'failure_reason': None if success else 'Compte bénéficiaire invalide'
+        }
+    }
+
+
+class ProviderStandIn:
+    """Fournisseur simulé: construit et signe les notifications comme le vrai service"""
+
+    def __init__(self, name: str, secret: str, header: str):
+        if name not in PAYLOADS:
+            raise ValueError(f"Fournisseur non supporté: {name}")
+        self.name = name
+        self.secret = secret.encode('utf-8')
+        self.header = header
+
+    @classmethod
+    def from_providers(cls, providers: Dict[str, Dict]) -> Dict[str, 'ProviderStandIn']:
+        """Un fournisseur simulé par entrée de webhooks.PROVIDERS"""
+        return {name: cls(name, conf['secret'], conf['header']) for name, conf in providers.items()}
+
+    def sign(self, body: bytes) -> str:
+        return hmac.new(self.secret, body, hashlib.sha256).hexdigest()
+
+    def notification(
+        self,
+        loan_id: str,
+        amount: Decimal,
+        transaction_id: Optional[str] = None,
+        tamper: bool = False
+    ) -> Tuple[bytes, Dict[str, str]]:
+        """
+        Notification de paiement signée
+        Args:
+            loan_id: Prêt référencé
+            amount: Montant en HTG
+            transaction_id: Identifiant fournisseur (nouveau si None; réutilisé pour un rejeu)
+            tamper: Signe un autre corps que celui envoyé (signature invalide)
+        Returns:
+            Tuple: (corps, en-têtes HTTP)
+        """
+        transaction_id = transaction_id or uuid.uuid4().hex
+        body = json.dumps(PAYLOADS[self.name](transaction_id, loan_id, amount), separators=(',', ':')).encode()
+        signature = self.sign(body + b' ' if tamper else body)
+        return body, {'Content-Type': 'application/json', self.header: signature}
+
+
+class PayoutStandIn:
+    """
+    API de décaissement simulée: vérifie la signature, applique une limite de débit
+    par fournisseur, répond 202 puis confirme la demande par webhook après `delay`
+    secondes. Une demande rejouée (même clé d'idempotence) n'est confirmée qu'une fois.
+    """
+
+    def __init__(self, standins: Dict[str, ProviderStandIn], callback: str, rate: float = 20,
+                 delay: float = 1.0, failure_ratio: float = 0.0):
+        self.standins = standins
+        self.callback = callback.rstrip('/')
+        self.interval = 1.0 / rate
+        self.delay = delay
+        self.failure_ratio = failure_ratio
+        self.seen = {}
+        self.stats = {'accepted': 0, 'replayed': 0, 'throttled': 0, 'rejected': 0, 'confirmed': 0}
+        self._next = {name: 0.0 for name in standins}
+        self._lock = threading.Lock()
+
+    def handle(self, provider: str, body: bytes, headers) -> Tuple[int, Dict]:
+        standin = self.standins.get(provider)
+        if standin is None:
+            return 404, {'error': 'unknown provider'}
+        if not hmac.compare_digest(headers.get(standin.header) or '', standin.sign(body)):
+            with self._lock:
+                self.stats['rejected'] += 1
+            return 401, {'error': 'invalid signature'}
+
+        key = headers.get('Idempotency-Key')
+        with self._lock:
+            # Seau à jetons d'une seconde de capacité, comme les API des fournisseurs
+            now = time.monotonic()
+            theoretical = max(self._next[provider], now)
+            if theoretical - now > 1.0 - self.interval:
+                self.stats['throttled'] += 1
+                return 429, {'error': 'rate limited'}
+            self._next[provider] = theoretical + self.interval
+            if key in self.seen:
+                self.stats['replayed'] += 1
+                return 202, {'reference': self.seen[key]}
+            reference = uuid.uuid4().hex
+            self.seen[key] = reference
+            self.stats['accepted'] += 1
+
+        request = json.loads(body)
+        success = random.random() >= self.failure_ratio
+        threading.Timer(self.delay, self._confirm, (standin, request, reference, success)).start()
+        return 202, {'reference': reference}
+
+    def _confirm(self, standin: ProviderStandIn, request: Dict, reference: str, success: bool):
+        import requests
+
+        body = json.dumps(payout_confirmation(standin.name, request, reference, success)).encode()
+        headers = {'Content-Type': 'application/json', standin.header: standin.sign(body)}
+        try:
+            requests.post(f"{self.callback}/webhooks/disbursement/{standin.name}", data=body,
+                          headers=headers, timeout=10)
+            with self._lock:
+                self.stats['confirmed'] += 1
+        except requests.RequestException as e:
+            print(f"Confirmation {standin.name} {reference} non livrée: {e}")
+
+    def server(self, host: str, port: int) -> ThreadingHTTPServer:
+        payouts = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                provider = self.path.rstrip('/').rsplit('/', 1)[-1]
+                body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+                status, payload = payouts.handle(provider, body, self.headers)
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                if status == 429:
+                    self.send_header('Retry-After', '1')
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        return ThreadingHTTPServer((host, port), Handler)
+
+
+def main():
+    from app.routes.webhooks import PROVIDERS
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8900)
+    parser.add_argument('--callback', default='http://localhost:5000/api/v1', help="Préfixe de l'API KrediLakay")
+    parser.add_argument('--rate', type=float, default=20, help="Demandes/s acceptées par fournisseur")
+    parser.add_argument('--delay', type=float, default=1.0, help="Délai avant confirmation (s)")
+    parser.add_argument('--failure-ratio', type=float, default=0.0, help="Part de décaissements refusés")
+    args = parser.parse_args()
+
+    payouts = PayoutStandIn(
+        ProviderStandIn.from_providers(PROVIDERS), args.callback, args.rate, args.delay, args.failure_ratio
+    )
+    server = payouts.server(args.host, args.port)
+    print(f"Décaissements simulés sur http://{args.host}:{args.port}/payouts/<provider>")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print(f"\n{payouts.stats}")
+
+
+if __name__ == '__main__':
+    main()
@@ -137,3 +137,58 @@ class Settings:
     TWILIO_AUTH_TOKEN = "votre_auth_token"
     TWILIO_WHATSAPP_NUMBER = "+14155238886"  # Numéro Twilio Sandbox ou production
     TEMPLATES_DIR = "/app/templates"
+
+class Settings:
+    # Grille d'offres pour les agents
+    QUOTE_MAX_GRID_SIZE = 50  # Montants ou durées max par grille
+    QUOTE_CACHE_SECONDS = 3600
+
+class Settings:
+    # Simulation Monte Carlo du portefeuille
+    SIMULATION_WORKERS = 0  # Processus du pool (0 = nombre de CPU)
+    SIMULATION_RECOVERY_RATE = "0.10"  # Part de l'encours récupérée après défaut
+    SIMULATION_MAX_PATHS = 50000
+
+class Settings:
+    # File asynchrone des webhooks de paiement
+    WEBHOOK_ASYNC = False  # True: vérification HMAC + mise en file, réponse 202
+    WEBHOOK_QUEUE_BACKEND = "redis"  # redis/postgres
+    REDIS_URL = "redis://:votre_mot_de_passe_redis@redis:6379/0"
+    WEBHOOK_STREAM = "kredilakay:webhooks"
+    WEBHOOK_SPOOL_DIR = "/app/var/webhook_spool"  # Repli local si la file est injoignable
+    WEBHOOK_BATCH_SIZE = 200
+    WEBHOOK_MAX_ATTEMPTS = 5
+
+class Settings:
+    # Journal d'audit en écriture différée
+    AUDIT_BATCH_SIZE = 200  # Entrées par INSERT multi-lignes
+    AUDIT_FLUSH_SECONDS = 2.0  # Délai maximal avant écriture
+    AUDIT_SPOOL_DIR = "/app/var/audit_spool"  # Repli local si la base est indisponible
+
+class Settings:
+    # Imputation des paiements
+    PAYMENT_ALLOCATION_ORDER = "penalties,interest,principal"  # Ordre de la cascade
+
+class Settings:
+    # Décaissements mobile money
+    DISBURSEMENT_PROVIDER = "NATCOM_PAY"  # Fournisseur par défaut des décaissements
+    DISBURSEMENT_ENDPOINTS = {
+        'NATCOM_PAY': "https://api.natcom.com.ht/v1/payouts",
+        'DIGICEL_PAY': "https://api.digicelpay.ht/v1/disbursements",
+        'UNIBANK': "https://api.unibankhaiti.com/v1/payouts"
+    }
+    DISBURSEMENT_RATE_LIMITS = {'NATCOM_PAY': 20, 'DIGICEL_PAY': 20, 'UNIBANK': 5}  # Demandes/s par fournisseur
+    DISBURSEMENT_WORKERS = 32  # Envois simultanés
+    DISBURSEMENT_MAX_ATTEMPTS = 3
+    DISBURSEMENT_LEASE_SECONDS = 300  # Une demande restée en envoi au-delà est réémise (même clé d'idempotence)
+
+class Settings:
+    # Rendu PDF hors des workers gevent
+    PDF_RENDER_WORKERS = 2  # Processus de rendu par worker gunicorn (0 = rendu dans le processus appelant)
+    PDF_RENDER_MAX_PENDING = 16  # Rendus en cours ou en attente au-delà desquels les demandes sont refusées (503)
+    PDF_RENDER_QUEUE_SECONDS = 2.0  # Attente maximale d'une place dans la file
+    PDF_RENDER_TIMEOUT = 30  # Durée maximale d'un rendu (s)
+
+class Settings:
+    # Filigranes de sécurité
+    WATERMARK_OVERLAY_CACHE_SIZE = 64  # Calques (motif par texte et format de page, mention UID) gardés par processus
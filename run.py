@@ -37,6 +37,11 @@ def test():
 def gunicorn_run(workers):
     """Run production server with Gunicorn"""
     from gunicorn.app.base import Application
+
+    def post_worker_init(worker):
+        # Pool de rendu PDF propre à chaque worker, démarré et préchauffé après le fork
+        from app.services.pdf_render import get_pdf_renderer
+        get_pdf_renderer().start()
     
     class FlaskApplication(Application):
         def init(self, parser, opts, args):
@@ -44,7 +49,8 @@ def gunicorn_run(workers):
                 'bind': f"{os.getenv('HOST', '0.0.0.0')}:{os.getenv('PORT', 5000)}",
                 'workers': workers,
                 'worker_class': 'gevent',
-                'timeout': 120
+                'timeout': 120,
+                'post_worker_init': post_worker_init
             }
         
         def load(self):
@@ -66,5 +72,273 @@ def init_db():
         db.create_all()
         click.echo("Database initialized")
 
+@cli.command()
+@click.option('--horizon', default=30, help='Number of days to forecast')
+@click.option('--granularity', default='daily', type=click.Choice(['daily', 'weekly']))
+@click.option('--output', default=None, help='Optional CSV output path')
+def forecast(horizon, granularity, output):
+    """Forecast portfolio collections"""
+    import csv
+    from app.services.loan_service import LoanService
+
+    with app.app_context():
+        report = LoanService().forecast_collections(
+            horizon_days=horizon,
+            granularity=granularity
+        )
+
+    if output:
+        with open(output, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=['period_start', 'expected_amount', 'installments_due'])
+            writer.writeheader()
+            writer.writerows(report['periods'])
+        click.echo(f"Forecast written to {output}")
+    else:
+        for period in report['periods']:
+            click.echo(f"{period['period_start']}  {period['expected_amount']:>14,.2f} HTG  ({period['installments_due']} installments)")
+
+    click.echo(f"Total expected: {report['total_expected']:,.2f} HTG | Arrears: {report['arrears']:,.2f} HTG")
+
+@cli.command()
+@click.option('--verify-only', is_flag=True, help='Report mismatches without repairing them')
+@click.option('--loan-id', multiple=True, help='Restrict to the given loan(s)')
+def rebuild_balances(verify_only, loan_id):
+    """Rebuild loan running totals from payment history"""
+    from app.services.loan_ledger import LoanLedger
+
+    with app.app_context():
+        mismatches = LoanLedger.rebuild(
+            loan_ids=loan_id or None,
+            repair=not verify_only
+        )
+
+    for m in mismatches:
+        click.echo(f"{m['loan_id']}  {m['field']}: stored={m['stored']} expected={m['expected']}")
+
+    action = 'found' if verify_only else 'repaired'
+    click.echo(f"{len(mismatches)} mismatch(es) {action}")
+    if verify_only and mismatches:
+        raise SystemExit(1)
+
+@cli.command()
+@click.option('--as-of', default=None, help='Last day to accrue (YYYY-MM-DD), defaults to today')
+def accrue_penalties(as_of):
+    """Accrue daily late penalties (nightly job)"""
+    from datetime import date
+    from app.services.penalty_accrual import PenaltyAccrualEngine
+
+    with app.app_context():
+        result = PenaltyAccrualEngine().run(
+            as_of=date.fromisoformat(as_of) if as_of else None
+        )
+
+    click.echo(f"{result['entries']} penalty entries for {result['loans']} loans, {result['amount']:,.2f} HTG accrued as of {result['as_of']}")
+
+@cli.command()
+@click.option('--as-of', default=None, help='Aging date (YYYY-MM-DD), defaults to today')
+def refresh_aging(as_of):
+    """Age loans and rebuild portfolio-at-risk aggregates (daily job)"""
+    from datetime import date
+    from app.services.aging import AgingService
+
+    with app.app_context():
+        result = AgingService.refresh(
+            as_of=date.fromisoformat(as_of) if as_of else None
+        )
+
+    click.echo(f"{result['changed']} of {result['loans']} loans re-aged as of {result['as_of']}")
+
+@cli.command()
+@click.option('--paths', default=10000, help='Number of simulated portfolio paths')
+@click.option('--weeks', default=12, help='Simulation horizon in weeks')
+@click.option('--workers', default=None, type=int, help='Process pool size (defaults to CPU count)')
+@click.option('--seed', default=None, type=int, help='Random seed for reproducible runs')
+@click.option('--output', default=None, help='Optional JSON output path')
+def simulate(paths, weeks, workers, seed, output):
+    """Monte Carlo simulation of portfolio defaults and collections (weekly job)"""
+    import json
+    from app.services.simulation import PortfolioSimulator
+
+    with app.app_context():
+        report = PortfolioSimulator(
+            paths=paths,
+            horizon_weeks=weeks,
+            workers=workers,
+            seed=seed
+        ).run()
+
+    if output:
+        with open(output, 'w') as f:
+            json.dump(report, f, indent=2)
+        click.echo(f"Simulation written to {output}")
+    else:
+        for week in report['weeks']:
+            click.echo(
+                f"W{week['week']:<3} collections {week['collections_p50']:>14,.2f} HTG "
+                f"[{week['collections_p5']:,.2f} - {week['collections_p95']:,.2f}]  "
+                f"cum. loss {week['cumulative_loss_p50']:>14,.2f} HTG (p95 {week['cumulative_loss_p95']:,.2f})"
+            )
+
+    click.echo(
+        f"{report['loans']} loans, {report['paths']} paths | Expected loss: {report['expected_loss']:,.2f} HTG | "
+        f"VaR 95%: {report['loss_var_95']:,.2f} HTG | VaR 99%: {report['loss_var_99']:,.2f} HTG"
+    )
+
+@cli.command()
+@click.option('--batch-size', default=500, help='Loans processed per transaction')
+def backfill_installments(batch_size):
+    """Create installment rows for loans approved before the installments table"""
+    from app.services.installments import InstallmentService
+
+    with app.app_context():
+        count = InstallmentService.backfill(batch_size=batch_size)
+
+    click.echo(f"Installments created for {count} loans")
+
+@cli.command()
+@click.option('--batch-size', default=None, type=int, help='Notifications per batch')
+@click.option('--once', is_flag=True, help='Drain the queue and exit')
+def webhook_worker(batch_size, once):
+    """Post queued payment webhooks in batches"""
+    from app.services.webhook_queue import WebhookBatchProcessor
+
+    with app.app_context():
+        stats = WebhookBatchProcessor(batch_size=batch_size).run(once=once)
+
+    click.echo(
+        f"{stats.get('messages', 0)} notifications, {stats.get('payments', 0)} payments on "
+        f"{stats.get('loans', 0)} loan updates, {stats.get('failed', 0)} failed"
+    )
+
+@cli.command()
+@click.option('--provider', required=True, type=click.Choice(['NATCOM_PAY', 'DIGICEL_PAY', 'UNIBANK']))
+@click.option('--file', 'path', required=True, type=click.Path(exists=True), help='Settlement file (CSV or XLSX)')
+@click.option('--date-from', required=True, help='First settled day (YYYY-MM-DD)')
+@click.option('--date-to', default=None, help='Last settled day (YYYY-MM-DD), defaults to --date-from')
+@click.option('--output-dir', default='reconciliation', help='Directory for discrepancy reports')
+@click.option('--chunk-size', default=50000, help='Rows read per chunk')
+def reconcile(provider, path, date_from, date_to, output_dir, chunk_size):
+    """Reconcile a provider settlement file against recorded payments"""
+    from datetime import date
+    from app.services.reconciliation import SettlementReconciler
+
+    date_from = date.fromisoformat(date_from)
+    date_to = date.fromisoformat(date_to) if date_to else date_from
+
+    with app.app_context():
+        stats = SettlementReconciler(provider, chunk_size=chunk_size).run(path, output_dir, date_from, date_to)
+
+    click.echo(
+        f"{stats['rows']} rows, {stats['matched']} matched | missing payment: {stats['missing_payment']} | "
+        f"missing settlement: {stats['missing_settlement']} | duplicates: {stats['duplicate']} | "
+        f"amount mismatches: {stats['amount_mismatch']}"
+    )
+    for name, report in stats['reports'].items():
+        click.echo(f"  {name}: {report}")
+
+@cli.command()
+@click.option('--file', 'path', required=True, type=click.Path(exists=True),
+              help='CSV with loan_id, amount, payment_date and optional receipt_number')
+@click.option('--method', default='CASH', help='Payment method recorded on each payment')
+@click.option('--chunk-size', default=500, help='Loans posted per transaction')
+def post_cash_payments(path, method, chunk_size):
+    """Back-post offline cash payments in a single batch"""
+    import csv
+    from datetime import datetime
+    from app.services.loan_ledger import LoanLedger
+
+    with open(path, newline='') as f:
+        rows = [
+            {
+                'loan_id': row['loan_id'].strip(),
+                'amount': row['amount'],
+                'payment_date': datetime.fromisoformat(row['payment_date']),
+                'receipt_number': (row.get('receipt_number') or '').strip() or None,
+                'payment_method': method
+            }
+            for row in csv.DictReader(f)
+        ]
+
+    with app.app_context():
+        result = LoanLedger.post_batch(rows, chunk_size=chunk_size)
+
+    for row in result['rejected']:
+        click.echo(f"Rejected {row['loan_id']} {row['amount']} ({row['payment_date']:%Y-%m-%d}): {row['reason']}")
+    for row in result['already_posted']:
+        click.echo(f"Skipped {row['loan_id']} {row['amount']} ({row['payment_date']:%Y-%m-%d}): "
+                   f"receipt {row['receipt_number']} already posted")
+    click.echo(
+        f"{result['payments']} payments posted on {result['loans']} loans, {len(result['rejected'])} rejected, "
+        f"{len(result['already_posted'])} already posted"
+    )
+
+@cli.command()
+@click.option('--provider', default=None, type=click.Choice(['NATCOM_PAY', 'DIGICEL_PAY', 'UNIBANK']),
+              help='Payout provider (defaults to DISBURSEMENT_PROVIDER)')
+@click.option('--loan-id', multiple=True, help='Restrict to the given loan(s)')
+@click.option('--limit', default=1000, help='Maximum payout requests sent')
+@click.option('--workers', default=None, type=int, help='Concurrent payout requests')
+@click.option('--endpoint-base', default=None,
+              help='Send every provider to <base>/payouts/<provider> (local stand-in)')
+@click.option('--wait', default=300, help='Seconds to wait for confirmations before applying them')
+def disburse(provider, loan_id, limit, workers, endpoint_base, wait):
+    """Disburse approved loans in bulk through the mobile-money providers"""
+    from app.services.disbursement import DisbursementEngine, PROVIDER_SECRETS
+
+    endpoints = None
+    if endpoint_base:
+        endpoints = {name: f"{endpoint_base.rstrip('/')}/payouts/{name}" for name in PROVIDER_SECRETS}
+
+    with app.app_context():
+        engine = DisbursementEngine(provider=provider, endpoints=endpoints, workers=workers)
+        result = engine.run(loan_ids=loan_id or None, limit=limit)
+        click.echo(
+            f"{result['created']} requests created, {result['rejected']} rejected (no client phone), "
+            f"{result['sent']} sent, {result['failed']} failed in {result['seconds']}s"
+        )
+        applied = engine.wait_and_apply(timeout=wait)
+
+    click.echo(f"Disbursement date set on {applied['applied']} loans, {applied['unconfirmed']} awaiting confirmation")
+
+@cli.command()
+@click.option('--date', 'approved_on', default=None, help='Approval day of the cohort (YYYY-MM-DD), defaults to today')
+@click.option('--loan-id', multiple=True, help='Generate for the given loan(s) instead of a cohort')
+@click.option('--output', default=None, help='ZIP path, split into <name>-001.zip, <name>-002.zip... packs')
+@click.option('--storage', is_flag=True, help='Store encrypted contracts in document storage instead of ZIP packs')
+@click.option('--per-archive', default=500, help='Contracts per ZIP pack')
+@click.option('--workers', default=None, type=int, help='Rendering processes (defaults to CPU count)')
+@click.option('--checkpoint', default=None, help='Resume file (defaults to <output>.checkpoint)')
+@click.option('--restart', is_flag=True, help='Ignore the checkpoint and regenerate every contract')
+def generate_contracts(approved_on, loan_id, output, storage, per_archive, workers, checkpoint, restart):
+    """Generate contract packs for a cohort of approved loans"""
+    from datetime import date
+    from app.services.contract_batch import Checkpoint, ContractBatch, StorageSink, ZipPackSink
+
+    approved_on = date.fromisoformat(approved_on) if approved_on else date.today()
+    if not storage and not output:
+        output = f"contracts/contracts_{approved_on:%Y%m%d}.zip"
+    if checkpoint is None:
+        checkpoint = f"contracts/storage_{approved_on:%Y%m%d}.checkpoint" if storage else f"{output}.checkpoint"
+    checkpoint = Checkpoint(checkpoint)
+    if restart:
+        checkpoint.clear()
+
+    with app.app_context():
+        sink = StorageSink() if storage else ZipPackSink(output, per_archive=per_archive)
+        batch = ContractBatch(sink, checkpoint, workers=workers)
+        cohort = batch.cohort(approved_on, loan_id or None)
+        with click.progressbar(length=len(cohort), label='Contracts', show_pos=True) as bar:
+            bar.update(len(checkpoint.load() & set(cohort)))
+            result = batch.run(approved_on, loan_id or None, progress=bar.update)
+
+    click.echo(
+        f"{result['generated']} contracts generated, {result['failed']} failed, "
+        f"{result['skipped']} already done out of {result['loans']} loans in {result['seconds']}s"
+    )
+    for path in getattr(sink, 'archives', []):
+        click.echo(f"  {path}")
+    if result['failed']:
+        click.echo(f"Re-run the same command to retry the failed contracts (checkpoint: {checkpoint.path})")
+
 if __name__ == '__main__':
     cli()
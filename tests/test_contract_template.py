@@ -0,0 +1,87 @@
+# KREDILAKAY/tests/test_contract_template.py
+"""
+Le contrat est signé: les valeurs trop longues pour leur zone sont reportées sur
+plusieurs lignes, jamais tronquées. Le contrat final (métadonnées, QR code) est
+écrit en une seule passe ReportLab.
+"""
+import re
+import unittest
+from decimal import Decimal
+from io import BytesIO
+
+from PyPDF2 import PdfReader
+from reportlab.lib.pagesizes import letter
+from reportlab.pdfgen import canvas
+
+from app.services.contract_template import ContractTemplate
+from app.services.pdf_utils import PDFGenerator
+
+LONG_ADDRESS = (
+    "Appartement 4B, Résidence Les Palmiers, 127 Route de Delmas prolongée, à l'angle de la "
+    "Rue Louverture et de l'Impasse Saint-Gérard, derrière la station Texaco, "
+    "Quartier Morne Calvaire, Pétion-Ville, Département de l'Ouest, Haïti HT6140"
+)
+LONG_NAME = "Marie-Carmelle Jean-Baptiste Desrosiers Saint-Fleur Augustin-Pierre Louis"
+LOAN = {'id': 'L-1', 'amount': Decimal('25000.00'), 'duration_days': 30, 'daily_interest_rate': 0.005}
+CLIENT = {'full_name': 'Jean Pierre', 'id': 'CIN-1', 'phone': '+509 3700 0000', 'address': 'Rue Capois'}
+
+
+def normalize(text: str) -> str:
+    return re.sub(r'\s+', '', text)
+
+
+class ContractTemplateTests(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.template = ContractTemplate()
+
+    def render_text(self, client_data: dict) -> str:
+        buffer = BytesIO()
+        c = canvas.Canvas(buffer, pagesize=letter)
+        self.template.render(c, LOAN, client_data)
+        c.save()
+        buffer.seek(0)
+        return ''.join(page.extract_text() for page in PdfReader(buffer).pages)
+
+    def test_long_values_are_not_truncated(self):
+        text = self.render_text({
+            'full_name': LONG_NAME,
+            'id': 'CIN-001-234-567-8',
+            'phone': '+509 3700 0000',
+            'address': LONG_ADDRESS
+        })
+        self.assertNotIn('…', text)
+        for value in (LONG_NAME, LONG_ADDRESS):
+            self.assertIn(normalize(value), normalize(text))
+
+    def test_unbroken_value_is_split(self):
+        address = 'Lakay' * 60
+        text = self.render_text({'full_name': 'Jean Pierre', 'id': '1', 'phone': '1', 'address': address})
+        self.assertIn(address, normalize(text))
+
+    def test_render_contract_single_pass(self):
+        buffer = PDFGenerator(renderer=object()).render_contract(LOAN, CLIENT, signature_img=None)
+        reader = PdfReader(buffer)
+        self.assertEqual(reader.metadata.title, 'Contrat KrediLakay L-1')
+        self.assertEqual(reader.metadata.author, 'Système KrediLakay')
+        self.assertEqual(reader.metadata.subject, 'Contrat de prêt L-1')
+        self.assertIn('L-1', reader.metadata['/Keywords'])
+        # Écrit par ReportLab seul: pas de réécriture PyPDF2
+        self.assertIn('ReportLab', reader.metadata.producer)
+        self.assertEqual(len(reader.pages), 2)
+        for page in reader.pages:
+            xobjects = page['/Resources']['/XObject']
+            self.assertIn('/FormXob.kredi_qr', xobjects)
+        self.assertIn('Rue Capois', reader.pages[0].extract_text())
+        self.assertIn('CONTRAT DE PRÊT', reader.pages[0].extract_text())
+
+    def test_template_needs_fresh_canvas(self):
+        c = canvas.Canvas(BytesIO(), pagesize=letter)
+        c.setFont('Courier', 10)
+        with self.assertRaises(ValueError):
+            self.template.render(c, LOAN, CLIENT)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+# KREDILAKAY/tests/test_forecast.py
+"""
+La prévision d'encaissements compte les échéances aux mêmes dates que
+l'échéancier persisté par InstallmentService (ScheduleRule.expand).
+"""
+import random
+import unittest
+from collections import Counter
+from contextlib import contextmanager
+from datetime import date, timedelta
+from decimal import Decimal
+from types import SimpleNamespace
+from unittest import mock
+
+from app.services.loan_service import LoanService
+from app.services.schedule import ScheduleRule
+
+SEED = 2024
+LOANS = 300
+HORIZON = 60
+
+
+class ForecastScheduleTests(unittest.TestCase):
+
+    def setUp(self):
+        self.rng = random.Random(SEED)
+        self.as_of = date(2026, 3, 1)
+
+    def random_loan(self, stored: bool):
+        amount = Decimal(self.rng.randint(500_00, 100_000_00)).scaleb(-2)
+        rate = Decimal(self.rng.randint(500, 3000)).scaleb(-4)
+        duration = self.rng.choice([7, 14, 30, 45, 90])
+        start = self.as_of + timedelta(days=self.rng.randint(-100, 30))
+        total_due = (amount + amount * rate * duration / Decimal(365)).quantize(Decimal('.01'))
+        loan = SimpleNamespace(
+            amount=amount, interest_rate=rate, duration_days=duration, start_date=start,
+            total_due=total_due, repayment_frequency='monthly', schedule_rule=None
+        )
+        if stored:
+            # Règle persistée à l'approbation, démarrant après la date de début du prêt
+            approved = start + timedelta(days=self.rng.randint(0, 3))
+            loan.schedule_rule = ScheduleRule.from_loan(loan, start=approved).to_dict()
+        return loan
+
+    def forecast(self, loans):
+        rows = [
+            (loan.amount, loan.interest_rate, loan.duration_days, loan.start_date, loan.schedule_rule, 0)
+            for loan in loans
+        ]
+        db = mock.MagicMock()
+        db.query.return_value.filter.return_value.all.return_value = rows
+
+        @contextmanager
+        def get_db():
+            yield db
+
+        # Requête simulée: les colonnes et fonctions SQL ne servent qu'à construire la requête
+        with mock.patch('app.services.loan_service.get_db', get_db), \
+                mock.patch('app.services.loan_service.Loan'), \
+                mock.patch('app.services.loan_service.func'):
+            return LoanService().forecast_collections(self.as_of, horizon_days=HORIZON)
+
+    def test_due_dates_match_persisted_installments(self):
+        loans = [self.random_loan(stored=i % 2 == 0) for i in range(LOANS)]
+        report = self.forecast(loans)
+
+        persisted = Counter()
+        window_end = self.as_of + timedelta(days=HORIZON - 1)
+        for loan in loans:
+            rule = ScheduleRule.from_dict(loan.schedule_rule) if loan.schedule_rule else ScheduleRule.from_loan(loan)
+            for _, due_date, _ in rule.expand(self.as_of, window_end):
+                persisted[due_date.isoformat()] += 1
+
+        forecast = {p['period_start']: p['installments_due'] for p in report['periods'] if p['installments_due']}
+        self.assertTrue(forecast)
+        self.assertEqual(forecast, dict(persisted))
+
+
+if __name__ == '__main__':
+    unittest.main()
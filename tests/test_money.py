@@ -0,0 +1,144 @@
+# KREDILAKAY/tests/test_money.py
+"""
+Propriétés du noyau monétaire en centimes: sur des échantillons aléatoires
+(graine fixe), les moteurs Money donnent au centime près le même résultat que
+les formules Decimal qu'ils remplacent.
+"""
+import random
+import unittest
+from collections import defaultdict
+from datetime import date, timedelta
+from decimal import Decimal
+from types import SimpleNamespace
+from unittest import mock
+
+from app.models import Loan
+from app.services.allocation import AllocationEngine
+from app.services.loan_ledger import LEDGER_FIELDS
+from app.services.loan_service import LoanService
+from app.services.money import Money
+from app.services.penalty_accrual import PenaltyAccrualEngine
+
+CENT = Decimal('.01')
+CASES = 5000
+SEED = 2024
+
+
+def random_amount(rng: random.Random) -> Decimal:
+    return Decimal(rng.randint(500_00, 1_000_000_00)).scaleb(-2)
+
+
+def random_rate(rng: random.Random) -> Decimal:
+    return Decimal(rng.randint(500, 3000)).scaleb(-4)
+
+
+class MoneyPropertyTests(unittest.TestCase):
+
+    def setUp(self):
+        self.rng = random.Random(SEED)
+
+    def test_calculate_loan_terms(self):
+        for _ in range(CASES):
+            amount, rate, days = random_amount(self.rng), random_rate(self.rng), self.rng.randint(1, 365)
+            total_interest = (amount * rate * days) / Decimal('365')
+            total_due = amount + total_interest
+            with mock.patch.object(LoanService, '_determine_interest_rate', return_value=rate):
+                terms = LoanService().calculate_loan_terms(amount, days, Decimal('0.5'))
+            with self.subTest(amount=amount, rate=rate, days=days):
+                self.assertEqual(terms['amount'], amount.quantize(CENT))
+                self.assertEqual(terms['total_interest'], total_interest.quantize(CENT))
+                self.assertEqual(terms['total_due'], total_due.quantize(CENT))
+                self.assertEqual(terms['daily_payment'], (total_due / days).quantize(CENT))
+
+    def test_quote_grid(self):
+        service = LoanService()
+        for _ in range(50):
+            score = Decimal(str(self.rng.random()))
+            amounts = [random_amount(self.rng) for _ in range(8)] + [Decimal('123456789012.345')]
+            durations = sorted(self.rng.sample(range(1, 366), 8))
+            grid = service.quote_grid(amounts, durations, score)
+            for i, amount in enumerate(amounts):
+                for j, days in enumerate(durations):
+                    terms = service.calculate_loan_terms(amount, days, score)
+                    with self.subTest(score=score, amount=amount, days=days):
+                        self.assertEqual(grid['interest_rate'], float(terms['interest_rate']))
+                        self.assertEqual(grid['total_interest'][i][j], float(terms['total_interest']))
+                        self.assertEqual(grid['total_due'][i][j], float(terms['total_due']))
+                        self.assertEqual(grid['daily_payment'][i][j], float(terms['daily_payment']))
+
+    def test_loan_total_interest(self):
+        for _ in range(CASES):
+            amount, rate, months = (
+                random_amount(self.rng), Decimal(self.rng.randint(500, 3000)).scaleb(-2), self.rng.randint(1, 24)
+            )
+            loan = SimpleNamespace(amount=amount, interest_rate=rate, duration=months)
+            monthly_rate = rate / Decimal(100) / Decimal(12)
+            with self.subTest(amount=amount, rate=rate, months=months):
+                self.assertEqual(Loan.total_interest.fget(loan), round(amount * monthly_rate * months, 2))
+
+    def test_loan_total_interest_ties(self):
+        # Demi-centimes exacts: arrondis au pair, là où l'ancien calcul Decimal suivait
+        # l'arrondi à 28 chiffres du taux mensuel (77370.37, 2404.55 et 96.47)
+        ties = [
+            (Decimal('610818.75'), Decimal('19.00'), 8, Decimal('77370.38')),
+            (Decimal('6792.50'), Decimal('23.60'), 18, Decimal('2404.54')),
+            (Decimal('1234.88'), Decimal('6.25'), 15, Decimal('96.48'))
+        ]
+        for amount, rate, months, expected in ties:
+            loan = SimpleNamespace(amount=amount, interest_rate=rate, duration=months)
+            with self.subTest(amount=amount, rate=rate, months=months):
+                self.assertEqual(Loan.total_interest.fget(loan), expected)
+
+    def test_allocation_waterfall(self):
+        engine = AllocationEngine('penalties,interest,principal')
+        for _ in range(CASES):
+            principal = random_amount(self.rng)
+            total_due = (principal * (1 + random_rate(self.rng))).quantize(CENT)
+            penalties = (principal * Decimal(self.rng.random() * 0.1)).quantize(CENT)
+            paid = ((total_due + penalties) * Decimal(self.rng.random() * 1.2)).quantize(CENT)
+
+            expected, left = {}, paid
+            for field, due in (
+                ('paid_penalties', penalties),
+                ('paid_interest', total_due - principal),
+                ('paid_principal', principal)
+            ):
+                expected[field] = min(left, due)
+                left -= expected[field]
+            expected['credit_balance'] = left
+            expected['outstanding_balance'] = total_due - expected['paid_principal'] - expected['paid_interest']
+
+            loan = SimpleNamespace(
+                total_due=total_due, amount=principal, accrued_penalties=penalties,
+                paid_penalties=0, paid_interest=0, paid_principal=0, credit_balance=0
+            )
+            engine.apply(loan, Money.from_decimal(paid))
+            with self.subTest(total_due=total_due, principal=principal, penalties=penalties, paid=paid):
+                self.assertEqual({field: getattr(loan, field) for field in LEDGER_FIELDS}, expected)
+
+    def test_daily_penalty(self):
+        # Ancienne formule: total_due * taux * jours, arrondie une seule fois (au pair)
+        for rate in (Decimal('0.02'), Decimal('0.015'), Decimal('0.0125')):
+            grace = self.rng.choice([0, 5])
+            engine = PenaltyAccrualEngine(daily_rate=rate, grace_period=grace)
+            as_of = date(2026, 3, 1)
+            rows = [
+                (i, date(2026, 1, 1) + timedelta(days=self.rng.randint(-60, 20)), 30, random_amount(self.rng), None)
+                for i in range(CASES)
+            ]
+            # Accrual en deux passes, reprise au lendemain de la première
+            checkpoint = as_of - timedelta(days=7)
+            first = engine._build_entries(rows, checkpoint)
+            resumed = [(i, start, days, total_due, checkpoint) for i, start, days, total_due, _ in rows]
+            accrued = defaultdict(Decimal)
+            for entry in first + engine._build_entries(resumed, as_of):
+                accrued[entry['loan_id']] += entry['amount']
+
+            for loan_id, start, duration, total_due, _ in rows:
+                days_late = max((as_of - start).days - duration - grace, 0)
+                with self.subTest(rate=rate, total_due=total_due, days_late=days_late):
+                    self.assertEqual(accrued[loan_id], (total_due * rate * days_late).quantize(CENT))
+
+
+if __name__ == '__main__':
+    unittest.main()